@@ -0,0 +1,121 @@
+"""
+Бенчмарк пропускной способности: синхронный send_message (последовательно
+и в пуле потоков) против асинхронного движка на одном цикле событий.
+
+Запуск: python -m benchmarks.async_throughput --requests 500 --latency 0.05
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src import database
+from benchmarks.mock_server import MockConfig, start_server
+
+MESSAGES = [{"role": "user", "content": "ping"}]
+
+
+def serve(latency, urls):
+    """Mock-сервер в отдельном процессе, чтобы не делить GIL с клиентом."""
+    _, base_url = start_server(MockConfig(latency=latency))
+    urls.put(base_url)
+    while True:
+        time.sleep(3600)
+
+
+def report(name, count, elapsed):
+    """Вывод пропускной способности."""
+    print(f"{name:<28} {count:5d} req in {elapsed:6.2f} s | {count / elapsed:8.1f} req/s")
+
+
+def main():
+    """Запуск бенчмарка."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, default=128)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        database.DB_PATH = os.path.join(tmp_dir, "bench.db")
+        database.init_database()
+
+        # pylint: disable=import-outside-toplevel
+        from src import api_client, async_client
+        from src.stats import flush_usage
+
+        urls = multiprocessing.Queue()
+        server = multiprocessing.Process(target=serve, args=(args.latency, urls), daemon=True)
+        server.start()
+        base_url = urls.get(timeout=10)
+        database.update_settings("bench-key", base_url, "bench-model")
+
+        # Прогрев: импорт openai и первое соединение
+        api_client.send_message(MESSAGES, "bench-model")
+
+        sequential = max(1, min(args.requests, int(2 / max(args.latency, 0.001))))
+        started = time.perf_counter()
+        for _ in range(sequential):
+            api_client.send_message(MESSAGES, "bench-model")
+        report("sync, sequential", sequential, time.perf_counter() - started)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as executor:
+            list(
+                executor.map(
+                    lambda _: api_client.send_message(MESSAGES, "bench-model"),
+                    range(args.requests),
+                )
+            )
+        report(f"sync, {args.threads} threads", args.requests, time.perf_counter() - started)
+
+        async def run_async():
+            semaphore = async_client.get_semaphore(base_url, args.concurrency)
+            assert semaphore is async_client.get_semaphore(base_url)
+            await async_client.send_message_async(MESSAGES, "bench-model")
+
+            started = time.perf_counter()
+            await asyncio.gather(
+                *(
+                    async_client.send_message_async(MESSAGES, "bench-model")
+                    for _ in range(args.requests)
+                )
+            )
+            elapsed = time.perf_counter() - started
+
+            # Отмена: запросы, не успевшие завершиться, не учитываются
+            tasks = [
+                asyncio.ensure_future(async_client.send_message_async(MESSAGES, "bench-model"))
+                for _ in range(10)
+            ]
+            await asyncio.sleep(args.latency / 2)
+            for task in tasks:
+                task.cancel()
+            cancelled = sum(
+                isinstance(result, asyncio.CancelledError)
+                for result in await asyncio.gather(*tasks, return_exceptions=True)
+            )
+
+            await async_client.close_async_clients()
+            return elapsed, cancelled
+
+        elapsed, cancelled = asyncio.run(run_async())
+        report(f"async, limit {args.concurrency}", args.requests, elapsed)
+        print(f"cancelled in flight: {cancelled}/10")
+
+        flush_usage()
+        expected = 1 + sequential + args.requests * 2 + 1
+        print(f"usage_stats requests: {database.get_all_time_stats()['requests']} (expected {expected})")
+
+        api_client.invalidate_clients()
+        server.terminate()
+        database.close_connection()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Бенчмарк задержки хода: новый клиент OpenAI на каждое сообщение
+против клиента из кэша api_client.
+
+Запуск: python -m benchmarks.client_reuse --turns 200
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from src import database
+from benchmarks.mock_server import MockConfig, start_server
+
+
+def measure(send, turns):
+    """Замер задержки каждого хода в миллисекундах."""
+    timings = []
+    for _ in range(turns):
+        started = time.perf_counter()
+        send()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def report(name, timings):
+    """Вывод сводки по замерам."""
+    print(
+        f"{name:<14} mean {statistics.mean(timings):7.2f} ms | "
+        f"median {statistics.median(timings):7.2f} ms | "
+        f"p95 {sorted(timings)[int(len(timings) * 0.95) - 1]:7.2f} ms"
+    )
+
+
+def main():
+    """Запуск бенчмарка."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        database.DB_PATH = os.path.join(tmp_dir, "bench.db")
+        database.init_database()
+
+        # pylint: disable=import-outside-toplevel
+        import openai
+        from src import api_client
+
+        server, base_url = start_server(MockConfig(latency=args.latency))
+        database.update_settings("bench-key", base_url, "bench-model")
+        messages = [{"role": "user", "content": "ping"}]
+
+        def fresh_client_turn():
+            client = openai.OpenAI(
+                api_key=database.get_api_key(), base_url=database.get_endpoint()
+            )
+            client.chat.completions.create(model="bench-model", messages=messages)
+            client.close()
+
+        def cached_client_turn():
+            api_client.send_message(messages, "bench-model")
+
+        # Прогрев: импорт ресурсов openai и первое соединение
+        fresh_client_turn()
+        cached_client_turn()
+
+        report("fresh client", measure(fresh_client_turn, args.turns))
+        report("cached client", measure(cached_client_turn, args.turns))
+
+        api_client.invalidate_clients()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
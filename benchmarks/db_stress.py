@@ -0,0 +1,81 @@
+"""
+Стресс-тест учета использования: несколько процессов одновременно
+увеличивают счетчики в одной базе. Проверяет, что ни одно увеличение
+не потеряно, и выводит число записей в секунду.
+
+Запуск: python -m benchmarks.db_stress --processes 8 --writes 500
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+from src import database
+
+MODELS = ["model-a", "model-b", "model-c"]
+
+
+def worker(db_path, writes, start_event):
+    """Процесс-писатель: writes вызовов update_usage."""
+    database.DB_PATH = db_path
+    start_event.wait()
+    for i in range(writes):
+        database.update_usage(10, 1, MODELS[i % len(MODELS)])
+    database.close_connection()
+
+
+def main():
+    """Запуск стресс-теста."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--processes", type=int, default=8)
+    parser.add_argument("--writes", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "stress.db")
+        database.DB_PATH = db_path
+        database.init_database()
+        database.close_connection()
+
+        start_event = multiprocessing.Event()
+        processes = [
+            multiprocessing.Process(
+                target=worker, args=(db_path, args.writes, start_event)
+            )
+            for _ in range(args.processes)
+        ]
+        for process in processes:
+            process.start()
+
+        started = time.perf_counter()
+        start_event.set()
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - started
+
+        stats = database.get_all_time_stats()
+        database.close_connection()
+
+    expected = args.processes * args.writes
+    print(
+        f"{args.processes} processes x {args.writes} writes: "
+        f"{expected / elapsed:.0f} writes/sec ({elapsed:.2f} s)"
+    )
+    print(
+        f"requests: {stats['requests']}/{expected} | "
+        f"input tokens: {stats['input_tokens']}/{expected * 10} | "
+        f"output tokens: {stats['output_tokens']}/{expected}"
+    )
+
+    lost = expected - stats["requests"]
+    if lost or stats["input_tokens"] != expected * 10:
+        print(f"FAILED: {lost} increments lost")
+        sys.exit(1)
+    print("OK: no lost increments")
+
+
+if __name__ == "__main__":
+    main()
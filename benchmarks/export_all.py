@@ -0,0 +1,103 @@
+"""
+Бенчмарк выгрузки всех чатов (main.py export-all): скорость в чатах в
+секунду и пик памяти основного процесса при разном числе рабочих процессов.
+
+Запуск: python -m benchmarks.export_all --conversations 5000 --messages 20
+"""
+
+import argparse
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from src import database
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Код дочернего процесса: выгрузка в отдельном процессе, чтобы пик памяти
+# (ru_maxrss) относился только к ней
+EXPORT_SNIPPET = """
+import resource, sys
+import src.database as database
+database.DB_PATH = sys.argv[1]
+from src.archive import main
+main(sys.argv[2:])
+print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+
+def populate(conversations, messages, message_kb):
+    """Заполнение базы синтетическими чатами."""
+    rng = random.Random(42)
+    words = "the quick brown fox jumps over lazy dog код ошибка запрос ответ".split()
+    for _ in range(conversations):
+        conversation_id = database.create_conversation(f"provider/model-{rng.randint(0, 9)}")
+        rows = []
+        for index in range(messages):
+            size = rng.randint(1, message_kb * 2) * 1024 // 6
+            content = " ".join(rng.choice(words) for _ in range(size))
+            rows.append({"role": ("user", "assistant")[index % 2], "content": content})
+        database.append_messages(conversation_id, rows)
+
+
+def run_export(db_path, args):
+    """Один запуск выгрузки. Возвращает (с, пик RSS в МБ, вывод)."""
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", EXPORT_SNIPPET, db_path, *args],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    elapsed = time.perf_counter() - started
+    return elapsed, int(result.stdout.strip()) / 1024, result.stderr.strip()
+
+
+def main():
+    """Запуск бенчмарка."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--conversations", type=int, default=5000)
+    parser.add_argument("--messages", type=int, default=20)
+    parser.add_argument("--message-kb", type=int, default=2)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "bench.db")
+        database.DB_PATH = db_path
+        database.init_database()
+        started = time.perf_counter()
+        populate(args.conversations, args.messages, args.message_kb)
+        database.close_connection()
+        size = os.path.getsize(db_path) / 1024 / 1024
+        print(
+            f"{args.conversations} conversations x {args.messages} messages, "
+            f"database {size:.0f} MB (generated in {time.perf_counter() - started:.1f} s)\n"
+        )
+
+        for archive, compress in (("tar", None), ("tar", "gz"), ("zip", None)):
+            for workers in args.workers:
+                output = os.path.join(tmp_dir, f"out.{archive}")
+                options = ["-o", output, "-w", str(workers)]
+                if compress:
+                    options += ["-c", compress]
+                elapsed, peak, _ = run_export(db_path, options)
+                label = f"{archive}{' + ' + compress if compress else ''}, {workers} workers"
+                print(
+                    f"{label:<24} {elapsed:6.2f} s | "
+                    f"{args.conversations / elapsed:8.0f} conversations/s | "
+                    f"main process peak RSS {peak:6.1f} MB"
+                )
+                os.unlink(output)
+
+    print(f"\nCPU count: {os.cpu_count()}; ru_maxrss of this process: "
+          f"{resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Бенчмарк экспорта большого чата: прежний экспорт (строка через += и
+json.dump целиком) против потоковой записи по сообщениям.
+
+Измеряет время и пик выделенной памяти (tracemalloc) для каждого формата.
+
+Запуск: python -m benchmarks.export_stream --messages 400 --message-kb 64
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from src import export
+
+
+def legacy_json(messages, filename):
+    """Экспорт JSON в прежнем виде."""
+    chat_data = {
+        "export_date": datetime.now().isoformat(),
+        "messages": messages,
+        "message_count": len(messages),
+    }
+    with open(filename, "w", encoding="utf-8") as f:
+        json.dump(chat_data, f, indent=2, ensure_ascii=False)
+
+
+def legacy_txt(messages, filename):
+    """Экспорт TXT в прежнем виде."""
+    chat_text = f"Экспорт чата от {datetime.now().strftime('%d.%m.%Y %H:%M:%S')}\n"
+    chat_text += "=" * 50 + "\n\n"
+    for message in messages:
+        label = export.TXT_ROLE_LABELS.get(message["role"])
+        chat_text += f"{label}: {message['content']}\n\n"
+    chat_text += "=" * 50 + "\n"
+    chat_text += f"Всего сообщений: {len(messages)}\n"
+    with open(filename, "w", encoding="utf-8") as f:
+        f.write(chat_text)
+
+
+def measure(func):
+    """Время в мс и пик памяти в МБ одного вызова."""
+    tracemalloc.start()
+    started = time.perf_counter()
+    func()
+    elapsed = (time.perf_counter() - started) * 1000
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1024 / 1024
+
+
+def main():
+    """Запуск бенчмарка."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=400)
+    parser.add_argument("--message-kb", type=int, default=64)
+    args = parser.parse_args()
+
+    # Вставленные логи и код: многострочный текст с кавычками и кириллицей
+    line = 'ERROR 2024-01-01 "request failed" путь=/var/log/app.log code=500\n'
+    content = line * (args.message_kb * 1024 // len(line.encode("utf-8")))
+    roles = ("user", "assistant")
+    messages = [
+        {"role": roles[index % 2], "content": content} for index in range(args.messages)
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        def path(name):
+            return os.path.join(tmp_dir, name)
+
+        checks = [
+            ("json, legacy", lambda: legacy_json(messages, path("legacy.json"))),
+            ("json, streaming", lambda: export.export_to_json(messages, path("a.json"))),
+            ("txt, legacy", lambda: legacy_txt(messages, path("legacy.txt"))),
+            ("txt, streaming", lambda: export.export_to_txt(messages, path("a.txt"))),
+            ("jsonl", lambda: export.export_to_jsonl(messages, path("a.jsonl"))),
+            ("md", lambda: export.export_to_markdown(messages, path("a.md"))),
+            ("jsonl + gz", lambda: export.export_to_jsonl(messages, path("a.jsonl"), "gz")),
+        ]
+        try:
+            import zstandard  # pylint: disable=import-outside-toplevel,unused-import
+
+            checks.append(
+                ("jsonl + zst", lambda: export.export_to_jsonl(messages, path("a.jsonl"), "zst"))
+            )
+        except ImportError:
+            pass
+
+        size = len(content.encode("utf-8")) * args.messages / 1024 / 1024
+        print(f"{args.messages} messages, {size:.1f} MB of content\n")
+        for name, func in checks:
+            elapsed, peak = measure(func)
+            print(f"{name:<18} {elapsed:8.1f} ms | peak memory {peak:8.1f} MB")
+
+        print("\nfile sizes:")
+        for name in sorted(os.listdir(tmp_dir)):
+            print(f"  {name:<16} {os.path.getsize(path(name)) / 1024 / 1024:8.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
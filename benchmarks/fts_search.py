@@ -0,0 +1,120 @@
+"""
+Бенчмарк полнотекстового поиска по истории чатов: генерирует
+синтетический корпус, замеряет построение индекса и задержку запросов.
+
+Запуск: python -m benchmarks.fts_search --messages 1000000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from src import database
+
+WORDS = (
+    "nginx config server proxy upstream timeout python import module error "
+    "docker compose volume network port database index query cache latency "
+    "token model stream request response header certificate kubernetes pod "
+    "deployment memory thread lock queue retry backoff linux kernel file "
+    "директория сервер запрос ответ ошибка конфигурация модель память поток"
+).split()
+
+QUERIES = ["nginx config", "docker volume", "timeout retry", "kubernetes pod", "сервер ошибка", "late"]
+
+# Размер синтетического словаря; частоты слов распределены по закону Ципфа
+VOCABULARY_SIZE = 50_000
+
+
+def build_vocabulary(rng):
+    """Словарь и накопленные веса: частые слова в начале, тематические - в хвосте."""
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    vocabulary = [
+        "".join(rng.choice(letters) for _ in range(rng.randint(3, 9)))
+        for _ in range(VOCABULARY_SIZE)
+    ]
+    # Тематические слова встречаются, как в жизни, редко
+    for i, word in enumerate(WORDS):
+        vocabulary[500 + i * 37] = word
+
+    cum_weights = []
+    total = 0.0
+    for rank in range(1, len(vocabulary) + 1):
+        total += 1.0 / rank
+        cum_weights.append(total)
+    return vocabulary, cum_weights
+
+
+def generate_rows(count, per_conversation, rng):
+    """Синтетические сообщения: (conversation_id, position, role, content, created_at)."""
+    vocabulary, cum_weights = build_vocabulary(rng)
+    for i in range(count):
+        length = rng.randint(8, 60)
+        content = " ".join(rng.choices(vocabulary, cum_weights=cum_weights, k=length))
+        role = "user" if i % 2 == 0 else "assistant"
+        yield (i // per_conversation + 1, i % per_conversation, role, content, "2026-01-01T00:00:00")
+
+
+def main():
+    """Запуск бенчмарка."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--per-conversation", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    rng = random.Random(42)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        database.DB_PATH = os.path.join(tmp_dir, "fts.db")
+        database.init_database()
+
+        conversations = (args.messages + args.per_conversation - 1) // args.per_conversation
+        with database.transaction() as cursor:
+            cursor.executemany(
+                """
+                INSERT INTO conversations (title, model_id, created_at, updated_at, message_count)
+                VALUES (?, 'bench-model', '2026-01-01T00:00:00', '2026-01-01T00:00:00', ?)
+                """,
+                ((f"chat {i}", args.per_conversation) for i in range(conversations)),
+            )
+
+        # Вставка с поддержкой индекса триггерами
+        started = time.perf_counter()
+        with database.transaction() as cursor:
+            cursor.executemany(
+                """
+                INSERT INTO messages (conversation_id, position, role, content, created_at)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                generate_rows(args.messages, args.per_conversation, rng),
+            )
+        insert_time = time.perf_counter() - started
+        print(
+            f"insert + incremental index: {args.messages} messages in {insert_time:.1f} s "
+            f"({args.messages / insert_time:.0f} msg/s)"
+        )
+
+        # Полная перестройка индекса
+        started = time.perf_counter()
+        with database.transaction() as cursor:
+            cursor.execute("INSERT INTO messages_fts (messages_fts) VALUES ('rebuild')")
+        print(f"full index rebuild: {time.perf_counter() - started:.1f} s")
+
+        for query in QUERIES:
+            timings = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                results = database.search_messages(query)
+                timings.append((time.perf_counter() - started) * 1000)
+            print(
+                f"query {query!r:<18} median {statistics.median(timings):7.2f} ms | "
+                f"max {max(timings):7.2f} ms | {len(results)} results"
+            )
+
+        database.close_connection()
+
+
+if __name__ == "__main__":
+    main()
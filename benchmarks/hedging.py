@@ -0,0 +1,102 @@
+"""
+Бенчмарк хвостовой задержки с дублирующими запросами.
+
+Основная модель mock-сервера изредка отвечает в десятки раз медленнее
+(slow_rate, slow_latency); запасная модель отвечает стабильно. Сравнивается
+TTFT потокового ответа без дублирования и с ним.
+
+Запуск: python -m benchmarks.hedging --requests 200 --slow-rate 0.05
+"""
+
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+
+from src import database
+from benchmarks.mock_server import MockConfig, start_server
+
+MESSAGES = [{"role": "user", "content": "ping"}]
+
+
+def percentile(values, fraction):
+    """Перцентиль по отсортированному списку."""
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def measure(api_client, count):
+    """TTFT и итоговое время потоковых ответов в миллисекундах."""
+    ttfts = []
+    served = {}
+    for _ in range(count):
+        started = time.perf_counter()
+        response = api_client.send_message(MESSAGES, "primary", stream=True)
+        for _ in response:
+            pass
+        ttfts.append((response.ttft or time.perf_counter() - started) * 1000)
+        served[response.served_model] = served.get(response.served_model, 0) + 1
+    return ttfts, served
+
+
+def report(name, ttfts, served):
+    """Вывод перцентилей."""
+    print(
+        f"{name:<18} p50 {statistics.median(ttfts):7.1f} ms | "
+        f"p95 {percentile(ttfts, 0.95):7.1f} ms | p99 {percentile(ttfts, 0.99):7.1f} ms | "
+        f"max {max(ttfts):7.1f} ms | served {served}"
+    )
+
+
+def main():
+    """Запуск бенчмарка."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--slow-rate", type=float, default=0.05)
+    parser.add_argument("--slow-latency", type=float, default=1.0)
+    parser.add_argument("--hedge-delay", type=float, default=0.15)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        database.DB_PATH = os.path.join(tmp_dir, "bench.db")
+        database.init_database()
+
+        # pylint: disable=import-outside-toplevel
+        from src import api_client, models, routing
+        from src.stats import flush_usage
+
+        models.MODELS_PATH = os.path.join(tmp_dir, "models.json")
+        with open(models.MODELS_PATH, "w", encoding="utf-8") as models_file:
+            json.dump(
+                {"models": [{"id": "primary", "name": "Primary", "hedge": "backup"}]}, models_file
+            )
+
+        primary = MockConfig(
+            latency=args.latency, slow_rate=args.slow_rate, slow_latency=args.slow_latency
+        )
+        backup = MockConfig(latency=args.latency * 1.5)
+        server, base_url = start_server(MockConfig(models={"primary": primary, "backup": backup}))
+        database.update_settings("bench-key", base_url, "primary")
+        measure(api_client, 3)
+
+        routing.HEDGE_REQUESTS = False
+        report("no hedging", *measure(api_client, args.requests))
+
+        routing.HEDGE_REQUESTS = True
+        api_client.HEDGE_DELAY = args.hedge_delay
+        report(f"hedge @ {args.hedge_delay * 1000:.0f} ms", *measure(api_client, args.requests))
+
+        flush_usage()
+        for model_id, model_stats in database.get_all_time_stats()["models"].items():
+            print(f"  {model_id}: {model_stats}")
+
+        api_client.invalidate_clients()
+        server.shutdown()
+        database.close_connection()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+"""
+Локальный mock-сервер, совместимый с OpenAI /v1/chat/completions.
+
+Запуск отдельно: python -m benchmarks.mock_server --port 8000 --latency 0.05
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MockConfig:
+    """Параметры поведения mock-сервера."""
+
+    def __init__(
+        self,
+        latency=0.0,
+        token_delay=0.0,
+        reply_tokens=20,
+        include_usage=True,
+        error_rate=0.0,
+        error_status=500,
+        retry_after=None,
+        slow_rate=0.0,
+        slow_latency=0.0,
+        models=None,
+        prefix_cache=False,
+        prefill_delay=0.0,
+        connect_delay=0.0,
+    ):
+        """Инициализация."""
+        self.latency = latency
+        self.token_delay = token_delay
+        self.reply_tokens = reply_tokens
+        self.include_usage = include_usage
+        self.error_rate = error_rate
+        self.error_status = error_status
+        # Значение заголовка Retry-After в ответах с ошибкой
+        self.retry_after = retry_after
+        # Доля "хвостовых" запросов с задержкой slow_latency вместо latency
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        # Отдельное поведение для моделей: model_id -> MockConfig
+        self.models = models or {}
+        # Кэш префиксов: совпадающее с прошлыми запросами начало не считается заново
+        self.prefix_cache = prefix_cache
+        # Задержка на каждый входной токен вне кэша (время prefill)
+        self.prefill_delay = prefill_delay
+        self.prefixes = set()
+        # Задержка на каждое новое соединение: имитация DNS, TCP и TLS до удаленного сервера
+        self.connect_delay = connect_delay
+        self.prefixes_lock = threading.Lock()
+
+
+def message_tokens(message):
+    """Грубая оценка токенов сообщения."""
+    content = message.get("content", "")
+    if isinstance(content, list):
+        content = "".join(part.get("text", "") for part in content)
+    return len(str(content)) // 4 + 4
+
+
+def cached_prefix_tokens(config, messages):
+    """Токены самого длинного начала запроса, уже встречавшегося раньше.
+
+    Запоминаются все начала запроса, как у провайдеров с кэшем префиксов.
+    Точки cache_control не влияют на результат: сравнивается только текст.
+    """
+    digest = hashlib.sha256()
+    cached = tokens = 0
+    with config.prefixes_lock:
+        for message in messages:
+            content = message.get("content", "")
+            if isinstance(content, list):
+                content = "".join(part.get("text", "") for part in content)
+            digest.update(json.dumps([message.get("role"), content]).encode("utf-8"))
+            key = digest.hexdigest()
+            tokens += message_tokens(message)
+            if key in config.prefixes:
+                cached = tokens
+            else:
+                config.prefixes.add(key)
+    return cached
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    """Обработчик запросов mock-сервера."""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    config = MockConfig()
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        """Отключение логирования запросов."""
+
+    def _send_json(self, status, payload, headers=None):
+        """Отправка JSON ответа."""
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_HEAD(self):  # pylint: disable=invalid-name
+        """Ответ на HEAD (прогрев соединения) без закрытия соединения."""
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """Обработка POST /v1/chat/completions."""
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+
+        model = request.get("model", "mock-model")
+        config = self.config.models.get(model, self.config)
+        if config.slow_rate and random.random() < config.slow_rate:
+            time.sleep(config.slow_latency)
+        else:
+            time.sleep(config.latency)
+
+        if config.error_rate and random.random() < config.error_rate:
+            message = "model not found" if config.error_status == 404 else "injected error"
+            self._send_json(
+                config.error_status,
+                {"error": {"message": message, "type": "server_error"}},
+                {"Retry-After": str(config.retry_after)} if config.retry_after is not None else None,
+            )
+            return
+
+        messages = request.get("messages", [])
+        prompt_tokens = sum(message_tokens(message) for message in messages)
+        cached = cached_prefix_tokens(config, messages) if config.prefix_cache else 0
+        time.sleep(config.prefill_delay * (prompt_tokens - cached))
+        words = [f"tok{i} " for i in range(config.reply_tokens)]
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(words),
+            "total_tokens": prompt_tokens + len(words),
+        }
+        if config.prefix_cache:
+            usage["prompt_tokens_details"] = {"cached_tokens": cached}
+
+        if request.get("stream"):
+            self._stream(model, words, usage, request, config)
+            return
+
+        payload = {
+            "id": "chatcmpl-mock",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(words)},
+                    "finish_reason": "stop",
+                }
+            ],
+        }
+        if config.include_usage:
+            payload["usage"] = usage
+        self._send_json(200, payload)
+
+    def _write_event(self, data):
+        """Отправка одного SSE события в chunked-кодировке."""
+        raw = f"data: {data}\n\n".encode("utf-8")
+        self.wfile.write(f"{len(raw):X}\r\n".encode("ascii") + raw + b"\r\n")
+        self.wfile.flush()
+
+    def _stream(self, model, words, usage, request, config):
+        """Отправка ответа в формате SSE."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        base = {
+            "id": "chatcmpl-mock",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+        }
+        for word in words:
+            time.sleep(config.token_delay)
+            delta = {"index": 0, "delta": {"content": word}, "finish_reason": None}
+            self._write_event(json.dumps(dict(base, choices=[delta])))
+
+        finish = {"index": 0, "delta": {}, "finish_reason": "stop"}
+        self._write_event(json.dumps(dict(base, choices=[finish])))
+
+        stream_options = request.get("stream_options") or {}
+        if config.include_usage and stream_options.get("include_usage"):
+            self._write_event(json.dumps(dict(base, choices=[], usage=usage)))
+
+        self._write_event("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+class MockServer(ThreadingHTTPServer):
+    """HTTP сервер с очередью подключений под параллельные бенчмарки."""
+
+    daemon_threads = True
+    request_queue_size = 1024
+    # Серверный ssl.SSLContext для HTTPS (задается в start_server)
+    ssl_context = None
+
+    def get_request(self):
+        """Прием соединения с задержкой установки и, для HTTPS, рукопожатием TLS."""
+        sock, address = super().get_request()
+        time.sleep(self.RequestHandlerClass.config.connect_delay)
+        if self.ssl_context is not None:
+            sock = self.ssl_context.wrap_socket(sock, server_side=True)
+        return sock, address
+
+    def handle_error(self, request, client_address):
+        """Клиент, отменивший запрос, - не ошибка сервера."""
+        if isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            return
+        super().handle_error(request, client_address)
+
+
+def start_server(config=None, host="127.0.0.1", port=0, ssl_context=None):
+    """Запуск mock-сервера в фоновом потоке. Возвращает (server, base_url).
+
+    ssl_context - серверный ssl.SSLContext для HTTPS.
+    """
+    handler = type(
+        "ConfiguredMockHandler", (MockHandler,), {"config": config or MockConfig()}
+    )
+    server = MockServer((host, port), handler)
+    server.ssl_context = ssl_context
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    scheme = "https" if ssl_context is not None else "http"
+    return server, f"{scheme}://{host}:{server.server_address[1]}/v1/"
+
+
+def main():
+    """Запуск mock-сервера из командной строки."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--token-delay", type=float, default=0.0)
+    parser.add_argument("--reply-tokens", type=int, default=20)
+    parser.add_argument("--no-usage", action="store_true")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--retry-after", type=float)
+    args = parser.parse_args()
+
+    config = MockConfig(
+        latency=args.latency,
+        token_delay=args.token_delay,
+        reply_tokens=args.reply_tokens,
+        include_usage=not args.no_usage,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        retry_after=args.retry_after,
+    )
+    server, base_url = start_server(config, args.host, args.port)
+    print(f"Mock server listening on {base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Микробенчмарк каталога моделей: прежнее чтение models.json на каждый вызов
+с поиском по списку против кэшированного каталога с индексом по ID.
+
+Запуск: python -m benchmarks.model_catalog --models 5000
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from src import models
+
+
+def legacy_get_model_by_id(model_id):
+    """Поиск модели в прежнем виде: чтение файла и проход по списку."""
+    with open(models.MODELS_PATH, "r", encoding="utf-8") as models_file:
+        for model in json.load(models_file).get("models", []):
+            if model.get("id") == model_id:
+                return model
+    return None
+
+
+def per_call(func, runs):
+    """Среднее время вызова в микросекундах."""
+    started = time.perf_counter()
+    for _ in range(runs):
+        func()
+    return (time.perf_counter() - started) / runs * 1e6
+
+
+def main():
+    """Запуск бенчмарка."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--models", type=int, default=5000)
+    parser.add_argument("--runs", type=int, default=20000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    catalog = [
+        {
+            "id": f"provider-{index % 40}/model-{index:05d}",
+            "name": f"Model {index}",
+            "context_length": rng.choice([8192, 32768, 131072]),
+            "pricing": {"input": rng.random(), "output": rng.random() * 3},
+            "capabilities": ["chat", "tools"][: rng.randint(1, 2)],
+            "fallback": [f"provider-0/model-{rng.randrange(args.models):05d}"],
+        }
+        for index in range(args.models)
+    ]
+    ids = [model["id"] for model in catalog]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        models.MODELS_PATH = os.path.join(tmp_dir, "models.json")
+        with open(models.MODELS_PATH, "w", encoding="utf-8") as models_file:
+            json.dump({"aggregator": "bench", "models": catalog}, models_file)
+        size = os.path.getsize(models.MODELS_PATH) / 1024
+        print(f"{args.models} models, models.json {size:.0f} KB\n")
+
+        legacy_runs = max(1, args.runs // 500)
+        results = [
+            (
+                "get_model_by_id, legacy",
+                per_call(lambda: legacy_get_model_by_id(rng.choice(ids)), legacy_runs),
+            ),
+            (
+                "get_model_by_id, catalog",
+                per_call(lambda: models.get_model_by_id(rng.choice(ids)), args.runs),
+            ),
+            (
+                "get_model_by_number",
+                per_call(lambda: models.get_model_by_number(rng.randint(1, args.models)), args.runs),
+            ),
+            (
+                "get_model_info",
+                per_call(lambda: models.get_model_info(rng.choice(ids)), args.runs),
+            ),
+        ]
+
+        # Перечитывание после изменения файла
+        def touch_and_get():
+            stat = os.stat(models.MODELS_PATH)
+            os.utime(models.MODELS_PATH, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+            models.get_model_by_id(ids[0])
+
+        results.append(("reload after mtime change", per_call(touch_and_get, legacy_runs)))
+
+        for name, micros in results:
+            print(f"{name:<28} {micros:10.2f} us/call")
+        print(f"\nspeedup by ID: {results[0][1] / results[1][1]:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
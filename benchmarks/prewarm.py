@@ -0,0 +1,96 @@
+"""
+Бенчмарк прогрева соединения: задержка первого хода чата без прогрева
+и с прогревом во время набора сообщения. Запросы идут к локальному
+HTTPS mock-серверу с задержкой установки соединения (--connect-delay),
+имитирующей DNS, TCP и TLS до удаленного API.
+
+Нужна утилита openssl для самоподписанного сертификата.
+
+Запуск: python -m benchmarks.prewarm --trials 10 --typing 1.0
+"""
+
+import argparse
+import os
+import ssl
+import statistics
+import subprocess
+import tempfile
+import time
+
+from src import database
+from benchmarks.mock_server import MockConfig, start_server
+
+
+def make_certificate(tmp_dir):
+    """Самоподписанный сертификат для 127.0.0.1. Возвращает (cert, key)."""
+    cert = os.path.join(tmp_dir, "cert.pem")
+    key = os.path.join(tmp_dir, "key.pem")
+    subprocess.run(
+        [
+            "openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes",
+            "-keyout", key, "-out", cert, "-days", "1",
+            "-subj", "/CN=127.0.0.1", "-addext", "subjectAltName=IP:127.0.0.1",
+        ],
+        check=True,
+        capture_output=True,
+    )
+    return cert, key
+
+
+def first_turn(api_client, typing, prewarm):
+    """Задержка первого хода в мс: новый клиент, набор сообщения, запрос."""
+    api_client.invalidate_clients()
+    if prewarm:
+        api_client.warm_connection()
+    time.sleep(typing)
+    if prewarm:
+        api_client.stop_warming()
+    started = time.perf_counter()
+    api_client.send_message([{"role": "user", "content": "ping"}], "bench-model")
+    return (time.perf_counter() - started) * 1000
+
+
+def main():
+    """Запуск бенчмарка."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--trials", type=int, default=10)
+    parser.add_argument("--typing", type=float, default=1.0, help="seconds before sending")
+    parser.add_argument("--connect-delay", type=float, default=0.1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cert, key = make_certificate(tmp_dir)
+        # Клиент доверяет самоподписанному сертификату
+        os.environ["SSL_CERT_FILE"] = cert
+        context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        context.load_cert_chain(cert, key)
+
+        database.DB_PATH = os.path.join(tmp_dir, "bench.db")
+        database.init_database()
+        # pylint: disable=import-outside-toplevel
+        from src import api_client
+
+        server, base_url = start_server(
+            MockConfig(connect_delay=args.connect_delay), ssl_context=context
+        )
+        database.update_settings("bench-key", base_url, "bench-model")
+        # Прогрев импорта openai, как preload() при открытии чата
+        first_turn(api_client, 0, False)
+
+        print(
+            f"{base_url} | connect delay {args.connect_delay * 1000:.0f} ms | "
+            f"typing {args.typing:.1f} s\n"
+        )
+        for name, prewarm in (("cold", False), ("prewarmed", True)):
+            timings = [first_turn(api_client, args.typing, prewarm) for _ in range(args.trials)]
+            print(
+                f"{name:<10} first turn median {statistics.median(timings):7.1f} ms | "
+                f"max {max(timings):7.1f} ms"
+            )
+
+        api_client.invalidate_clients()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Бенчмарк кэша префиксов: длинный чат с обрезкой истории под бюджет на
+mock-сервере, который, как провайдеры, не пересчитывает уже встречавшееся
+начало запроса. Сравнивает обрезку с запасом CONTEXT_TRIM_SLACK и без него
+(каждый ход сдвигает начало истории) по доле входных токенов из кэша,
+задержке хода и стоимости.
+
+Запуск: python -m benchmarks.prompt_cache --turns 120 --budget 6000
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from src import api_client, context, database
+from benchmarks.mock_server import MockConfig, start_server
+
+# Цена за миллион токенов для оценки стоимости
+BENCH_PRICING = {"input": 3.0, "output": 15.0, "cached_input": 0.3}
+
+
+def run_chat(slack, turns, budget, prefill_delay):
+    """Прогон чата. Возвращает (токенов на входе, из кэша, задержки хода в мс)."""
+    context.CONTEXT_TRIM_SLACK = slack
+    server, base_url = start_server(
+        MockConfig(prefix_cache=True, prefill_delay=prefill_delay, reply_tokens=60)
+    )
+    database.update_settings("bench-key", base_url, "bench-model")
+    api_client.invalidate_clients()
+
+    window = context.ContextWindow()
+    messages = [{"role": "system", "content": "You are a helpful assistant. " * 40}]
+    question = "Explain the next step of the deployment plan in detail, please. " * 12
+    input_tokens = cached = 0
+    timings = []
+    for turn in range(turns):
+        messages.append({"role": "user", "content": f"{turn}: {question}"})
+        request = window.build(messages, "bench-model", budget)
+        started = time.perf_counter()
+        completion = api_client.request_completion(request, "bench-model")
+        timings.append((time.perf_counter() - started) * 1000)
+        messages.append({"role": "assistant", "content": completion["answer"] * 4})
+        input_tokens += completion["input_tokens"]
+        cached += completion["cached_tokens"]
+
+    server.shutdown()
+    return input_tokens, cached, timings
+
+
+def main():
+    """Запуск бенчмарка."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=120)
+    parser.add_argument("--budget", type=int, default=6000)
+    parser.add_argument("--prefill-delay", type=float, default=0.00002)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        database.DB_PATH = os.path.join(tmp_dir, "bench.db")
+        database.init_database()
+        print(f"{args.turns} turns, history budget {args.budget} tokens\n")
+        for slack in (0.0, 0.2):
+            input_tokens, cached, timings = run_chat(
+                slack, args.turns, args.budget, args.prefill_delay
+            )
+            full = input_tokens * BENCH_PRICING["input"] / 1e6
+            cost = (
+                (input_tokens - cached) * BENCH_PRICING["input"]
+                + cached * BENCH_PRICING["cached_input"]
+            ) / 1e6
+            print(
+                f"slack {slack:.1f}: cached {cached / input_tokens:6.1%} of {input_tokens} input | "
+                f"turn median {statistics.median(timings):6.1f} ms, "
+                f"p95 {sorted(timings)[int(len(timings) * 0.95) - 1]:6.1f} ms | "
+                f"input cost ${cost:.4f} (uncached ${full:.4f})"
+            )
+
+
+if __name__ == "__main__":
+    main()
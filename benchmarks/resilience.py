@@ -0,0 +1,98 @@
+"""
+Проверка устойчивости запросов на mock-сервере с внедренными ошибками.
+
+Сценарии: доля ответов 429 с Retry-After, доля ответов 500 и недоступный
+эндпоинт (сравнение времени отказа с размыкателем цепи и без него).
+
+Запуск: python -m benchmarks.resilience --requests 100 --error-rate 0.3
+"""
+
+import argparse
+import os
+import socket
+import tempfile
+import time
+
+from src import database
+from benchmarks.mock_server import MockConfig, start_server
+
+MESSAGES = [{"role": "user", "content": "ping"}]
+
+
+def run_requests(api_client, count):
+    """Последовательные запросы. Возвращает (успешные, ошибки, секунды)."""
+    ok = errors = 0
+    started = time.perf_counter()
+    for _ in range(count):
+        try:
+            api_client.send_message(MESSAGES, "bench-model")
+            ok += 1
+        except api_client.api_errors() + (ConnectionError,):
+            errors += 1
+    return ok, errors, time.perf_counter() - started
+
+
+def report(name, ok, errors, elapsed, stats_before, stats_after):
+    """Вывод результатов сценария."""
+    delta = {key: stats_after[key] - stats_before[key] for key in stats_before if key != "circuits"}
+    print(
+        f"{name:<34} ok {ok:4d} | failed {errors:3d} | {elapsed:6.2f} s | "
+        f"retries {delta['retries']:3d} | backoff {delta['backoff_seconds']:5.2f} s | "
+        f"rejected {delta['rejected']:3d}"
+    )
+
+
+def free_port():
+    """Свободный TCP порт, на котором никто не слушает."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def main():
+    """Запуск сценариев."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--error-rate", type=float, default=0.3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        database.DB_PATH = os.path.join(tmp_dir, "bench.db")
+        database.init_database()
+
+        # pylint: disable=import-outside-toplevel
+        from src import api_client, resilience
+
+        scenarios = (
+            (
+                "429 + Retry-After: 0.05",
+                MockConfig(error_rate=args.error_rate, error_status=429, retry_after=0.05),
+            ),
+            ("500", MockConfig(error_rate=args.error_rate, error_status=500)),
+        )
+        for name, config in scenarios:
+            server, base_url = start_server(config)
+            database.update_settings("bench-key", base_url, "bench-model")
+            before = resilience.get_stats()
+            ok, errors, elapsed = run_requests(api_client, args.requests)
+            after = resilience.get_stats()
+            report(f"{name} ({args.error_rate:.0%})", ok, errors, elapsed, before, after)
+            server.shutdown()
+
+        # Недоступный эндпоинт: без размыкателя каждый запрос проходит все повторы
+        dead_url = f"http://127.0.0.1:{free_port()}/v1/"
+        database.update_settings("bench-key", dead_url, "bench-model")
+        for name, threshold in (("dead endpoint, no breaker", 10**9), ("dead endpoint, breaker", None)):
+            breaker = resilience.get_breaker(dead_url)
+            breaker.threshold = threshold or resilience.CIRCUIT_FAILURE_THRESHOLD
+            breaker.state, breaker.failures = "closed", 0
+            before = resilience.get_stats()
+            ok, errors, elapsed = run_requests(api_client, 10)
+            report(name, ok, errors, elapsed, before, resilience.get_stats())
+
+        api_client.invalidate_clients()
+        database.close_connection()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Бенчмарк холодного старта: время от запуска интерпретатора до готовности
+главного меню (импорт main и init_database) и разбор -X importtime.
+
+Запуск: python -m benchmarks.startup --runs 10 --budget-ms 100
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Код дочернего процесса: то же, что выполняется до показа главного меню
+STARTUP_SNIPPET = """
+import sys
+import src.database as database
+database.DB_PATH = sys.argv[1]
+import main
+database.init_database()
+print("openai" in sys.modules)
+"""
+
+
+def run_startup(db_path, extra_args=()):
+    """Один запуск дочернего процесса. Возвращает (мс, stdout, stderr)."""
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, *extra_args, "-c", STARTUP_SNIPPET, db_path],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return (time.perf_counter() - started) * 1000, result.stdout, result.stderr
+
+
+def parse_importtime(stderr, top):
+    """Самые медленные модули по накопленному времени импорта (мкс)."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), int(self_us), name.strip()))
+    rows.sort(reverse=True)
+    return rows[:top]
+
+
+def main():
+    """Запуск бенчмарка."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--budget-ms", type=float, default=100.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "startup.db")
+
+        # Первый запуск создает схему - это разовая стоимость
+        first_ms, _, _ = run_startup(db_path)
+        timings = [run_startup(db_path)[0] for _ in range(args.runs)]
+        _, openai_loaded, importtime = run_startup(db_path, ("-X", "importtime"))
+
+    median_ms = statistics.median(timings)
+    print(f"first run (schema creation): {first_ms:.1f} ms")
+    print(
+        f"menu ready: median {median_ms:.1f} ms | min {min(timings):.1f} ms | "
+        f"max {max(timings):.1f} ms ({args.runs} runs)"
+    )
+    print(f"openai imported at startup: {openai_loaded.strip()}")
+
+    print(f"\nslowest imports (cumulative, top {args.top}):")
+    for cumulative_us, self_us, name in parse_importtime(importtime, args.top):
+        print(f"  {cumulative_us / 1000:7.1f} ms (self {self_us / 1000:6.1f} ms)  {name}")
+
+    if median_ms > args.budget_ms or openai_loaded.strip() == "True":
+        print(f"\nFAILED: startup over {args.budget_ms:.0f} ms budget or openai imported eagerly")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
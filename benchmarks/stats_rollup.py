@@ -0,0 +1,164 @@
+"""
+Бенчмарк команды status на большой истории статистики.
+
+Генерирует usage_stats за несколько лет по сотням моделей (через обычный
+add_usage_batch, то есть со сводными таблицами на триггерах) и журнал
+запросов, затем измеряет запросы статистики: полные сканирования в старом
+виде против сводных таблиц и диапазонов дат.
+
+Запуск: python -m benchmarks.stats_rollup --years 3 --models 300
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from src import database
+
+# Бюджет на сбор данных для status, мс
+STATUS_BUDGET_MS = 10.0
+
+# Запросы статистики за все время до сводных таблиц
+LEGACY_ALL_TIME_SQL = (
+    """
+    SELECT COALESCE(SUM(requests), 0), COALESCE(SUM(input_tokens), 0),
+           COALESCE(SUM(output_tokens), 0)
+    FROM usage_stats
+    """,
+    """
+    SELECT model_id, SUM(requests), SUM(input_tokens), SUM(output_tokens),
+           SUM(hedged), SUM(hedge_wins), SUM(fallbacks), SUM(failures)
+    FROM usage_stats GROUP BY model_id
+    """,
+)
+
+
+def timed(func, runs):
+    """Медиана и максимум времени вызова в миллисекундах."""
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), max(samples)
+
+
+def populate(years, models, models_per_day, log_rows, today_requests):
+    """Заполнение базы синтетической историей."""
+    today = date.today()
+    model_ids = [f"provider/model-{index:03d}" for index in range(models)]
+    rng = random.Random(42)
+
+    rows = []
+    for offset in range(years * 365, -1, -1):
+        day = (today - timedelta(days=offset)).isoformat()
+        for model_id in rng.sample(model_ids, models_per_day):
+            requests = rng.randint(1, 50)
+            rows.append(
+                (day, model_id, requests, requests * 400, requests * 150, 0, 0, 0, 0, 0)
+            )
+        if len(rows) >= 50000:
+            database.add_usage_batch(rows)
+            rows = []
+    database.add_usage_batch(rows)
+
+    # Журнал пишется в порядке времени, как при реальной работе;
+    # today_requests записей - за последний час
+    now = time.time()
+    span = years * 365 * 24 * 60 * 60
+    timestamps = sorted(
+        now - rng.random() * (span if index >= today_requests else 3600)
+        for index in range(log_rows)
+    )
+    batch = []
+    for timestamp in timestamps:
+        latency = rng.lognormvariate(6.5, 0.6)
+        batch.append(
+            (timestamp, rng.choice(model_ids), "http://bench/v1/", 400, 150,
+             latency, latency * 0.3, 0, 0, None, 0)
+        )
+        if len(batch) >= 50000:
+            database.add_usage_batch([], batch)
+            batch = []
+    database.add_usage_batch([], batch)
+
+
+def main():
+    """Запуск бенчмарка."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--models", type=int, default=300)
+    parser.add_argument("--models-per-day", type=int, default=300)
+    parser.add_argument("--log-rows", type=int, default=500000)
+    parser.add_argument("--today-requests", type=int, default=500)
+    parser.add_argument("--runs", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        database.DB_PATH = os.path.join(tmp_dir, "bench.db")
+        database.init_database()
+
+        # pylint: disable=import-outside-toplevel
+        from src import stats
+
+        started = time.perf_counter()
+        populate(
+            args.years,
+            args.models,
+            min(args.models, args.models_per_day),
+            args.log_rows,
+            args.today_requests,
+        )
+        connection = database.get_connection()
+        usage_rows = connection.execute("SELECT COUNT(*) FROM usage_stats").fetchone()[0]
+        print(
+            f"usage_stats: {usage_rows} rows, request_log: {args.log_rows} rows, "
+            f"{args.today_requests} of them today "
+            f"(generated in {time.perf_counter() - started:.1f} s)\n"
+        )
+
+        today = date.today()
+
+        def legacy_all_time():
+            for sql in LEGACY_ALL_TIME_SQL:
+                connection.execute(sql).fetchall()
+
+        def status():
+            stats.get_today_stats()
+            stats.get_all_time_stats()
+            stats.get_latency_stats()
+
+        checks = [
+            ("all time, full scan (before)", legacy_all_time),
+            ("all time, usage_totals", stats.get_all_time_stats),
+            ("today", stats.get_today_stats),
+            ("last 7 days", lambda: stats.get_range_stats(today - timedelta(days=6), today)),
+            ("this month", lambda: stats.get_range_stats(today.replace(day=1), today)),
+            ("last 365 days", lambda: stats.get_range_stats(today - timedelta(days=364), today)),
+            ("latency percentiles, today", stats.get_latency_stats),
+            ("status (today + all time + latency)", status),
+        ]
+        results = {}
+        for name, func in checks:
+            median, worst = timed(func, args.runs)
+            results[name] = median
+            print(f"{name:<38} median {median:7.2f} ms | max {worst:7.2f} ms")
+
+        status_ms = results["status (today + all time + latency)"]
+        passed = status_ms < STATUS_BUDGET_MS
+        print(
+            f"\nstatus: {status_ms:.2f} ms "
+            f"({'OK' if passed else 'OVER'} budget {STATUS_BUDGET_MS:.0f} ms)"
+        )
+        database.close_connection()
+
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
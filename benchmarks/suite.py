@@ -0,0 +1,445 @@
+"""
+Сквозной набор бенчмарков на локальном mock-сервере: время запуска,
+задержка хода чата (обычного, потокового и с ошибками API), запросы
+статистики, скорость экспорта и записи в базу.
+
+Каждая группа запускается --repeat раз, в результат идет медиана и разброс.
+Результаты сохраняются в JSON; режим compare сравнивает два прогона и
+отмечает регрессии (код выхода 1): ухудшение больше порога плюс разброс
+обоих прогонов.
+
+Запуск: python -m benchmarks.suite run -o results.json [--quick] [--only turns,stats]
+        python -m benchmarks.suite compare base.json results.json --threshold 0.15
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from src import database
+from benchmarks import db_stress, export_all, stats_rollup, startup
+from benchmarks.mock_server import MockConfig, start_server
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Допустимое ухудшение метрики по умолчанию (доля) для режима compare
+DEFAULT_THRESHOLD = 0.15
+
+# Размеры нагрузки: полный прогон и быстрый (--quick)
+SIZES = {
+    "full": {
+        "startup_runs": 10,
+        "turns": 200,
+        "stream_turns": 100,
+        "error_turns": 100,
+        "stats_years": 2,
+        "stats_models": 100,
+        "stats_log_rows": 100000,
+        "stats_runs": 30,
+        "export_messages": 400,
+        "export_message_kb": 32,
+        "archive_conversations": 1000,
+        "db_writes": 2000,
+        "db_processes": 4,
+    },
+    "quick": {
+        "startup_runs": 3,
+        "turns": 50,
+        "stream_turns": 30,
+        "error_turns": 30,
+        "stats_years": 1,
+        "stats_models": 30,
+        "stats_log_rows": 10000,
+        "stats_runs": 10,
+        "export_messages": 100,
+        "export_message_kb": 16,
+        "archive_conversations": 200,
+        "db_writes": 500,
+        "db_processes": 2,
+    },
+}
+
+
+def metric(value, unit, better="lower"):
+    """Запись метрики: значение, единицы и направление улучшения."""
+    return {"value": value, "unit": unit, "better": better}
+
+
+def percentile(values, share):
+    """Перцентиль по ближайшему рангу."""
+    ordered = sorted(values)
+    return ordered[max(0, int(len(ordered) * share + 0.5) - 1)]
+
+
+def use_database(tmp_dir, name):
+    """Переключение на новую пустую базу во временном каталоге."""
+    database.close_connection()
+    database.DB_PATH = os.path.join(tmp_dir, name)
+    # Базы прошлого повтора удаляются вместе с журналом WAL
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(database.DB_PATH + suffix):
+            os.unlink(database.DB_PATH + suffix)
+    database.init_database()
+    return database.DB_PATH
+
+
+def bench_startup(tmp_dir, size):
+    """Холодный старт до главного меню (отдельный процесс)."""
+    db_path = os.path.join(tmp_dir, "startup.db")
+    startup.run_startup(db_path)
+    timings = [startup.run_startup(db_path)[0] for _ in range(size["startup_runs"])]
+    return {"startup_ms": metric(statistics.median(timings), "ms")}
+
+
+def bench_turns(tmp_dir, size):
+    """Ход чата как в main: окно контекста, запрос к mock-серверу, сохранение хода."""
+    # pylint: disable=import-outside-toplevel
+    from src import api_client, resilience
+    from src.context import ContextWindow
+
+    use_database(tmp_dir, "turns.db")
+    results = {}
+
+    def chat(config, turns, stream=False):
+        """Прогон чата. Возвращает (задержки хода в мс, TTFT в мс, неудачных ходов)."""
+        server, base_url = start_server(config)
+        database.update_settings("bench-key", base_url, "bench-model")
+        api_client.invalidate_clients()
+        conversation_id = database.create_conversation("bench-model")
+        window = ContextWindow()
+        messages = [{"role": "system", "content": "You are a helpful assistant."}]
+        timings, ttfts, failed = [], [], 0
+        for turn in range(turns):
+            messages.append({"role": "user", "content": f"question {turn}: " + "word " * 50})
+            started = time.perf_counter()
+            try:
+                request = window.build(messages, "bench-model")
+                if stream:
+                    response = api_client.send_message(request, "bench-model", stream=True)
+                    for _ in response:
+                        pass
+                    answer = response.answer
+                    ttfts.append((response.ttft or 0) * 1000)
+                else:
+                    answer, _ = api_client.send_message(request, "bench-model")
+                messages.append({"role": "assistant", "content": answer})
+                database.append_messages(conversation_id, messages[-2:], "bench-model")
+            except (ConnectionError, *api_client.api_errors()):
+                messages.pop()
+                failed += 1
+            timings.append((time.perf_counter() - started) * 1000)
+        server.shutdown()
+        return timings, ttfts, failed
+
+    # Прогрев: импорт openai и первое соединение
+    chat(MockConfig(), 3)
+
+    timings, _, _ = chat(MockConfig(latency=0.005), size["turns"])
+    results["turn_p50_ms"] = metric(statistics.median(timings), "ms")
+    results["turn_p95_ms"] = metric(percentile(timings, 0.95), "ms")
+
+    # Фрагменты идут без пауз: измеряется разбор потока клиентом, а не таймер сервера
+    timings, ttfts, _ = chat(
+        MockConfig(latency=0.005, reply_tokens=200),
+        size["stream_turns"],
+        stream=True,
+    )
+    results["stream_ttft_p50_ms"] = metric(statistics.median(ttfts), "ms")
+    results["stream_turn_p50_ms"] = metric(statistics.median(timings), "ms")
+
+    # Ошибки API: часть запросов отвечает 429 и повторяется после Retry-After.
+    # Ошибки и паузы случайные, поэтому последовательность фиксируется
+    random.seed(42)
+    retries_before = resilience.get_stats()["retries"]
+    timings, _, failed = chat(
+        MockConfig(latency=0.005, error_rate=0.2, error_status=429, retry_after=0),
+        size["error_turns"],
+    )
+    results["error_turn_p50_ms"] = metric(statistics.median(timings), "ms")
+    results["error_turn_success"] = metric(
+        1 - failed / size["error_turns"], "share", "higher"
+    )
+    results["error_turn_retries"] = metric(
+        resilience.get_stats()["retries"] - retries_before, "retries"
+    )
+
+    api_client.invalidate_clients()
+    return results
+
+
+def bench_stats(tmp_dir, size):
+    """Запросы статистики для status на синтетической истории."""
+    # pylint: disable=import-outside-toplevel
+    from src import stats
+
+    use_database(tmp_dir, "stats.db")
+    stats_rollup.populate(
+        size["stats_years"],
+        size["stats_models"],
+        size["stats_models"],
+        size["stats_log_rows"],
+        500,
+    )
+    results = {}
+    checks = (
+        ("stats_today_ms", stats.get_today_stats),
+        ("stats_all_time_ms", stats.get_all_time_stats),
+        ("stats_latency_ms", stats.get_latency_stats),
+    )
+    for name, func in checks:
+        median_ms, _ = stats_rollup.timed(func, size["stats_runs"])
+        results[name] = metric(median_ms, "ms")
+    return results
+
+
+def bench_export(tmp_dir, size):
+    """Экспорт большого чата по форматам и выгрузка всех чатов в архив."""
+    # pylint: disable=import-outside-toplevel
+    from src import archive, export
+
+    line = 'ERROR 2024-01-01 "request failed" путь=/var/log/app.log code=500\n'
+    content = line * (size["export_message_kb"] * 1024 // len(line.encode("utf-8")))
+    messages = [
+        {"role": ("user", "assistant")[index % 2], "content": content}
+        for index in range(size["export_messages"])
+    ]
+    megabytes = len(content.encode("utf-8")) * len(messages) / 1024 / 1024
+
+    results = {}
+    for format_type in ("json", "jsonl", "md"):
+        filename = os.path.join(tmp_dir, f"export.{format_type}")
+        started = time.perf_counter()
+        export.export_chat(messages, format_type, filename)
+        elapsed = time.perf_counter() - started
+        results[f"export_{format_type}_mb_s"] = metric(megabytes / elapsed, "MB/s", "higher")
+        os.unlink(filename)
+
+    use_database(tmp_dir, "archive.db")
+    export_all.populate(size["archive_conversations"], 10, 1)
+    output = os.path.join(tmp_dir, "archive.tar")
+    started = time.perf_counter()
+    with open(output, "wb") as raw:
+        sink = archive.TarSink(raw)
+        count, _, _ = archive.export_all(
+            sink, database.iter_conversations(), "json", workers=1
+        )
+        sink.close()
+    results["export_all_conv_s"] = metric(
+        count / (time.perf_counter() - started), "conversations/s", "higher"
+    )
+    os.unlink(output)
+    return results
+
+
+def bench_database(tmp_dir, size):
+    """Скорость записи: учет использования, журнал запросов, сохранение ходов."""
+    # pylint: disable=import-outside-toplevel
+    from src import stats
+
+    results = {}
+    use_database(tmp_dir, "writes.db")
+    writes = size["db_writes"]
+
+    started = time.perf_counter()
+    for index in range(writes):
+        stats.update_usage(100, 20, f"model-{index % 5}")
+        stats.log_request(f"model-{index % 5}", "http://bench/v1/", 0.1, 100, 20, 0.02)
+    stats.flush_usage()
+    results["db_usage_writes_s"] = metric(
+        writes / (time.perf_counter() - started), "writes/s", "higher"
+    )
+
+    conversation_id = database.create_conversation("bench-model")
+    started = time.perf_counter()
+    for index in range(writes):
+        database.append_messages(
+            conversation_id,
+            [
+                {"role": "user", "content": f"question {index}"},
+                {"role": "assistant", "content": f"answer {index} " * 20},
+            ],
+            "bench-model",
+        )
+    results["db_turn_appends_s"] = metric(
+        writes / (time.perf_counter() - started), "turns/s", "higher"
+    )
+
+    # Одновременная запись из нескольких процессов (как у нескольких CLI)
+    db_path = use_database(tmp_dir, "stress.db")
+    database.close_connection()
+    start_event = multiprocessing.Event()
+    per_process = writes // size["db_processes"]
+    processes = [
+        multiprocessing.Process(
+            target=db_stress.worker, args=(db_path, per_process, start_event)
+        )
+        for _ in range(size["db_processes"])
+    ]
+    for process in processes:
+        process.start()
+    started = time.perf_counter()
+    start_event.set()
+    for process in processes:
+        process.join()
+    results["db_concurrent_writes_s"] = metric(
+        per_process * size["db_processes"] / (time.perf_counter() - started),
+        "writes/s",
+        "higher",
+    )
+    return results
+
+
+# Группы бенчмарков в порядке запуска
+BENCHMARKS = {
+    "startup": bench_startup,
+    "turns": bench_turns,
+    "stats": bench_stats,
+    "export": bench_export,
+    "database": bench_database,
+}
+
+
+def git_revision():
+    """Текущий коммит (или None вне git)."""
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def run(args):
+    """Прогон бенчмарков и сохранение результатов в JSON."""
+    names = args.only.split(",") if args.only else list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        sys.exit(f"unknown benchmarks: {', '.join(unknown)} (available: {', '.join(BENCHMARKS)})")
+    size = SIZES["quick" if args.quick else "full"]
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "size": "quick" if args.quick else "full",
+            "repeat": args.repeat,
+        },
+        "metrics": {},
+    }
+    samples = {}
+    units = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name in names:
+            for repeat in range(args.repeat):
+                started = time.perf_counter()
+                for metric_name, result in BENCHMARKS[name](tmp_dir, size).items():
+                    samples.setdefault(metric_name, []).append(result["value"])
+                    units[metric_name] = result
+                print(
+                    f"[{name} {repeat + 1}/{args.repeat}] {time.perf_counter() - started:.1f} s",
+                    file=sys.stderr,
+                )
+        database.close_connection()
+
+    # Итог - медиана повторов; разброс (max - min) / медиана учитывается в compare
+    for metric_name, values in samples.items():
+        value = statistics.median(values)
+        result = dict(units[metric_name], value=round(value, 4))
+        result["spread"] = round((max(values) - min(values)) / value, 4) if value else 0.0
+        report["metrics"][metric_name] = result
+        print(
+            f"  {metric_name:<26} {value:12.2f} {result['unit']:<16} "
+            f"spread {result['spread']:6.1%}"
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"results saved to {args.output}", file=sys.stderr)
+    return 0
+
+
+def compare_reports(base, current, threshold):
+    """Сравнение прогонов: список (метрика, было, стало, изменение, регрессия ли)."""
+    rows = []
+    for name, result in current["metrics"].items():
+        previous = base["metrics"].get(name)
+        if previous is None:
+            continue
+        before, after = previous["value"], result["value"]
+        change = (after - before) / before if before else 0.0
+        worse = change if result["better"] == "lower" else -change
+        # Порог расширяется на измеренный разброс обоих прогонов
+        tolerance = threshold + previous.get("spread", 0.0) + result.get("spread", 0.0)
+        rows.append((name, previous, result, change, worse > tolerance))
+    return rows
+
+
+def compare(args):
+    """Режим сравнения двух файлов результатов."""
+    with open(args.base, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.current, encoding="utf-8") as f:
+        current = json.load(f)
+
+    print(
+        f"base {base['meta'].get('revision')} ({base['meta']['timestamp']}) -> "
+        f"current {current['meta'].get('revision')} ({current['meta']['timestamp']})\n"
+    )
+    rows = compare_reports(base, current, args.threshold)
+    for name, previous, result, change, regression in rows:
+        print(
+            f"{'REGRESSION' if regression else 'ok':<10} {name:<26} "
+            f"{previous['value']:12.2f} -> {result['value']:12.2f} {result['unit']:<16} "
+            f"{change:+7.1%}"
+        )
+    missing = sorted(set(base["metrics"]) - set(current["metrics"]))
+    if missing:
+        print(f"\nnot measured in current run: {', '.join(missing)}")
+
+    regressions = sum(1 for row in rows if row[4])
+    print(f"\n{regressions} regression(s) beyond {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+def main():
+    """Точка входа."""
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run benchmarks")
+    run_parser.add_argument("-o", "--output", help="JSON file for results")
+    run_parser.add_argument("--only", help=f"comma-separated subset of: {', '.join(BENCHMARKS)}")
+    run_parser.add_argument("--quick", action="store_true", help="smaller workloads")
+    run_parser.add_argument("--repeat", type=int, default=3, help="runs per benchmark group")
+
+    compare_parser = commands.add_parser("compare", help="compare two result files")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+
+    args = parser.parse_args()
+    sys.exit(run(args) if args.command == "run" else compare(args))
+
+
+if __name__ == "__main__":
+    main()
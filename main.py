@@ -6,14 +6,20 @@ ChatAI CLI - Интерфейс командной строки для взаи
 import sys
 import time
 import os
-import openai
+import sqlite3
+from datetime import date, datetime, timedelta
 from colorama import Fore, Style
 
-from src.api_client import send_message
+from src.api_client import send_message, api_errors, preload, warm_connection, stop_warming
 from src.ui import (
     Loader,
     display_main_menu,
+    display_conversations,
+    display_resumed_chat,
+    display_search_results,
     display_settings_menu,
+    display_transport_settings,
+    TRANSPORT_MENU,
     display_chat_start,
     display_assistant_response,
     display_error,
@@ -25,16 +31,61 @@ from src.ui import (
     display_export_success,
     display_export_error,
 )
-from src.stats import get_today_stats, get_all_time_stats
-from src.models import get_current_model, change_model, load_models
-from src.export import export_to_json, export_to_txt
-from config.config import get_system_message, get_model_id
+from src.stats import (
+    get_today_stats,
+    get_all_time_stats,
+    get_range_stats,
+    get_latency_stats,
+    flush_usage,
+    usage_failure,
+)
+from src.models import get_current_model, change_model, get_model_by_number
+from src.export import EXPORT_FORMATS, COMPRESSIONS, export_chat
+from src.database import (
+    create_conversation,
+    append_messages,
+    list_conversations,
+    get_conversation_messages,
+    search_messages,
+)
+from src.context import ContextWindow
+from src.commands import COMMANDS, suggest_commands
+from src import response_cache, resilience, transport
+from src.memory import RollingMemory
+from config.config import (
+    get_system_message,
+    get_system_prompt_savings,
+    get_model_id,
+    STREAM_RESPONSES,
+    ROLLING_MEMORY,
+)
+
+# Количество чатов на странице истории
+HISTORY_PAGE_SIZE = 20
+
+# Единицы окна статистики для команды status: 30m, 6h, 7d, 2w (или month)
+STATUS_WINDOW_UNITS = {"m": 60, "h": 60 * 60, "d": 24 * 60 * 60, "w": 7 * 24 * 60 * 60}
 
-# Загружаем модели глобально
-models = load_models()
 
+def parse_window(text):
+    """Начало окна статистики вида 30m/6h/7d/2w/month (datetime) или None."""
+    text = text.strip().lower()
+    now = datetime.now()
+    if text == "month":
+        return now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    if len(text) < 2 or text[-1] not in STATUS_WINDOW_UNITS or not text[:-1].isdigit():
+        return None
+    return now - timedelta(seconds=int(text[:-1]) * STATUS_WINDOW_UNITS[text[-1]])
 
-def handle_command(user_input, messages):
+
+def report_usage_failure():
+    """Однократное предупреждение, если пачку статистики не удалось записать."""
+    failure = usage_failure()
+    if failure:
+        display_error("stats", failure)
+
+
+def handle_command(user_input, messages, context=None):
     """Обработка специальных команд."""
     parts = user_input.strip().split()
 
@@ -44,41 +95,63 @@ def handle_command(user_input, messages):
 
     command = parts[0].lower()
 
-    available_commands = {
-        "exit": "end the chat",
-        "status": "show token statistics",
-        "export": "export the chat",
-        "model": "change the model",
-        "help": "show help",
-    }
-
-    if command in available_commands:
+    if command in COMMANDS:
         if command == "exit":
             return False
 
         elif command == "status":
+            latency_stats = [("today", get_latency_stats())]
+            range_stats = None
+            if len(parts) > 1:
+                since = parse_window(parts[1])
+                if since is None:
+                    print("Usage: status [30m|6h|7d|2w|month]")
+                    input("Press Enter to continue...")
+                    return True
+
+                label = "This month" if parts[1].lower() == "month" else f"Last {parts[1].lower()}"
+                latency_stats.append((label.lower(), get_latency_stats(since.timestamp())))
+                # Статистика использования хранится по дням
+                if since.date() < date.today():
+                    range_stats = (label, get_range_stats(since.date(), date.today()))
+
             today_stats = get_today_stats()
             all_time_stats = get_all_time_stats()
-            display_status(today_stats, all_time_stats)
+            context_stats = context.stats() if context else None
+            cache_stats = response_cache.get_stats() if response_cache.is_enabled() else None
+            retry_stats = resilience.get_stats()
+            display_status(
+                today_stats,
+                all_time_stats,
+                context_stats,
+                cache_stats,
+                retry_stats,
+                latency_stats,
+                range_stats,
+            )
+            report_usage_failure()
             return True
 
         elif command == "export":
             if len(parts) < 2:
-                print("Usage: export [json|txt]")
+                print("Usage: export [json|jsonl|txt|md] [gz|zst]")
                 input("Press Enter to continue...")
                 return True
 
             format_type = parts[1].lower()
-            if format_type not in ["json", "txt"]:
-                print("Format must be 'json' or 'txt'")
+            if format_type not in EXPORT_FORMATS:
+                print("Format must be 'json', 'jsonl', 'txt' or 'md'")
+                input("Press Enter to continue...")
+                return True
+
+            compression = parts[2].lower() if len(parts) > 2 else None
+            if compression and compression not in COMPRESSIONS:
+                print("Compression must be 'gz' or 'zst'")
                 input("Press Enter to continue...")
                 return True
 
             try:
-                if format_type == "json":
-                    file_path = export_to_json(messages)
-                else:
-                    file_path = export_to_txt(messages)
+                file_path = export_chat(messages, format_type, compression=compression)
 
                 display_export_success(file_path)
                 input("Press Enter to continue...")
@@ -92,8 +165,10 @@ def handle_command(user_input, messages):
             current_model = get_current_model()
 
             if len(parts) > 1:
-                # Если указан ID модели напрямую
+                # Указан номер модели в списке или ее ID
                 model_id = parts[1]
+                if model_id.isdigit() and get_model_by_number(int(model_id)):
+                    model_id = get_model_by_number(int(model_id))["id"]
                 _, message = change_model(model_id)
                 print(message)
                 input("Press Enter to continue...")
@@ -127,9 +202,8 @@ def handle_command(user_input, messages):
                 if model_input:
                     # Проверяем, является ли ввод числом (выбор из списка)
                     try:
-                        model_index = int(model_input) - 1
-                        if 0 <= model_index < len(models):
-                            selected_model = models[model_index]
+                        selected_model = get_model_by_number(int(model_input))
+                        if selected_model:
                             _, message = change_model(selected_model["id"])
                             print(message)
                         else:
@@ -141,29 +215,64 @@ def handle_command(user_input, messages):
 
                     input("Press Enter to continue...")
 
-        elif command == "help":
-            display_help()
             return True
 
-    for cmd, description in available_commands.items():
-        if cmd.startswith(command) or command.startswith(cmd):
-            if len(command) >= 2:
-                print(f"Did you mean '{cmd}'? With it you can {description}.")
+        elif command == "search":
+            query = user_input.strip()[len(parts[0]):].strip()
+            if not query:
+                print("Usage: search <query>")
+                input("Press Enter to continue...")
                 return True
 
-        if len(command) >= 3 and abs(len(command) - len(cmd)) <= 2:
-            common_chars = sum(1 for a, b in zip(command, cmd) if a == b)
-            if common_chars >= len(command) - 1:
-                print(f"Did you mean '{cmd}'? With it you can {description}.")
-                return True
+            search_history(query)
+            return True
+
+        elif command == "help":
+            display_help()
+            return True
+
+    # Опечатки в командах распознаются локально, без запроса к модели
+    suggestions = suggest_commands(user_input)
+    if len(suggestions) == 1:
+        cmd = suggestions[0]
+        print(f"Did you mean '{cmd}'? With it you can {COMMANDS[cmd]}.")
+        return True
+    if suggestions:
+        print(f"Did you mean {' or '.join(repr(cmd) for cmd in suggestions)}?")
+        return True
 
     return False
 
 
-def start_new_chat():
-    """Начало нового чата."""
-    display_chat_start()
+def start_new_chat(conversation_id=None):
+    """Начало нового чата или продолжение сохраненного."""
+    # openai загружается в фоне, пока пользователь набирает первое сообщение
+    preload()
     messages = [get_system_message()]
+    if conversation_id is None:
+        display_chat_start()
+    else:
+        messages.extend(get_conversation_messages(conversation_id))
+        display_resumed_chat(messages)
+    context = ContextWindow(RollingMemory() if ROLLING_MEMORY else None)
+    saved_tokens = get_system_prompt_savings()
+    # Сообщения до этого индекса уже записаны в историю
+    saved_count = len(messages)
+
+    def save_turns(model_id):
+        """Дозапись несохраненных ходов в историю.
+
+        Ошибка базы (например, "database is locked") не прерывает чат: ходы
+        остаются в памяти и дописываются вместе со следующим.
+        """
+        nonlocal conversation_id, saved_count
+        try:
+            if conversation_id is None:
+                conversation_id = create_conversation(model_id)
+            append_messages(conversation_id, messages[saved_count:], model_id)
+            saved_count = len(messages)
+        except sqlite3.Error as e:
+            display_error("storage", str(e))
 
     def show_chat_info_if_empty():
         """Показать информацию о чате, если в нем нет сообщений."""
@@ -173,12 +282,17 @@ def start_new_chat():
             )
             print(
                 f"{Fore.LIGHTBLACK_EX}Available commands: status, export, model, "
-                f"help{Style.RESET_ALL}\n"
+                f"search, help{Style.RESET_ALL}\n"
             )
 
     while True:
         try:
-            user_input = get_user_input()
+            # Соединение с API прогревается, пока пользователь набирает сообщение
+            warm_connection()
+            try:
+                user_input = get_user_input()
+            finally:
+                stop_warming()
 
             # Проверяем, что ввод не пустой
             if not user_input.strip():
@@ -187,7 +301,7 @@ def start_new_chat():
             if user_input.lower() == "exit":
                 break
 
-            if handle_command(user_input, messages):
+            if handle_command(user_input, messages, context):
                 show_chat_info_if_empty()
                 continue
 
@@ -195,15 +309,30 @@ def start_new_chat():
             loader = Loader()
             try:
                 loader.start()
-                answer, tokens_used = send_message(messages, get_model_id())
+                model_id = get_model_id()
+                request_messages = context.build(messages, model_id)
+                if STREAM_RESPONSES:
+                    response = send_message(request_messages, model_id, stream=True)
+                    display_assistant_response(
+                        response, loader=loader, saved_tokens=saved_tokens
+                    )
+                    messages.append({"role": "assistant", "content": response.answer})
+                else:
+                    answer, tokens_used = send_message(request_messages, model_id)
+                    loader.stop()
+                    messages.append({"role": "assistant", "content": answer})
+                    display_assistant_response(answer, tokens_used, saved_tokens=saved_tokens)
+                # Ход сохраняется дозаписью, без перезаписи всего чата
+                save_turns(model_id)
+                report_usage_failure()
+                # Пока пользователь печатает, история может сжиматься в фоне
+                context.on_reply(messages, model_id)
+            except KeyboardInterrupt:
+                # Прерывание генерации ответа не завершает чат
                 loader.stop()
-                messages.append({"role": "assistant", "content": answer})
-                display_assistant_response(answer, tokens_used)
-            except (
-                openai.APIError,
-                openai.RateLimitError,
-                openai.AuthenticationError,
-            ) as e:
+                display_error("cancelled", "")
+                messages.pop()
+            except api_errors() as e:
                 loader.stop()
                 display_error("api", str(e))
                 messages.pop()
@@ -220,6 +349,58 @@ def start_new_chat():
             break
 
 
+def search_history(query=None):
+    """Полнотекстовый поиск по сохраненным чатам.
+
+    Без query (из главного меню) запрос вводится пользователем, и найденный
+    чат можно продолжить.
+    """
+    allow_resume = query is None
+    if query is None:
+        query = input(f"{Fore.LIGHTBLACK_EX}Search:{Style.RESET_ALL} ").strip()
+        if not query:
+            return
+
+    started = time.perf_counter()
+    try:
+        results = search_messages(query)
+    except sqlite3.OperationalError as e:
+        display_error("processing", str(e))
+        input("Press Enter to continue...")
+        return
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    choice = display_search_results(query, results, elapsed_ms, allow_resume)
+    if choice.isdigit() and 1 <= int(choice) <= len(results):
+        start_new_chat(results[int(choice) - 1]["conversation_id"])
+
+
+def chat_history():
+    """Список сохраненных чатов с возможностью продолжить любой из них."""
+    # Ключи начала каждой открытой страницы, для перехода назад
+    page_keys = [None]
+
+    while True:
+        conversations = list_conversations(HISTORY_PAGE_SIZE + 1, page_keys[-1])
+        has_next = len(conversations) > HISTORY_PAGE_SIZE
+        conversations = conversations[:HISTORY_PAGE_SIZE]
+
+        choice = display_conversations(conversations, len(page_keys), has_next)
+
+        if choice == "0":
+            break
+        elif choice.lower() == "n" and has_next:
+            last = conversations[-1]
+            page_keys.append((last["updated_at"], last["id"]))
+        elif choice.lower() == "p" and len(page_keys) > 1:
+            page_keys.pop()
+        elif choice.isdigit() and 1 <= int(choice) <= len(conversations):
+            start_new_chat(conversations[int(choice) - 1]["id"])
+            break
+        else:
+            display_invalid_option()
+
+
 def settings():
     """Меню настроек."""
     from src.database import get_settings, update_settings
@@ -334,12 +515,54 @@ def settings():
                     ),
                 )
                 print(f"{Fore.GREEN}Endpoint updated successfully{Style.RESET_ALL}")
+        elif choice == "4":
+            transport_settings()
         elif choice == "0":
             break
         else:
             display_invalid_option()
 
 
+def transport_settings():
+    """Просмотр и изменение настроек HTTP-транспорта."""
+    while True:
+        current = transport.get_settings()
+        choice = display_transport_settings(current).strip()
+
+        if choice == "0":
+            break
+        if not choice.isdigit() or not 1 <= int(choice) <= len(TRANSPORT_MENU):
+            display_invalid_option()
+            continue
+
+        field, label, _ = TRANSPORT_MENU[int(choice) - 1]
+        hint = {
+            "http2": "on or off",
+            "proxy": "URL such as http://proxy:8080, '-' to use environment settings",
+            "max_connections": "0 for no limit",
+            "max_keepalive_connections": "0 for no limit",
+            "total_timeout": "seconds, 0 for no limit",
+        }.get(field, "seconds")
+        print(
+            f"\n{Fore.LIGHTBLACK_EX}Enter new value for {label} ({hint}) "
+            f"or press Enter to cancel:{Style.RESET_ALL}"
+        )
+        value = input().strip()
+        if not value:
+            continue
+
+        try:
+            current[field] = transport.parse_value(field, value)
+            transport.save_settings(current)
+        except ValueError as e:
+            print(f"{Fore.RED}Invalid value: {e}{Style.RESET_ALL}")
+        else:
+            print(
+                f"{Fore.GREEN}{label} updated, applies to the next request{Style.RESET_ALL}"
+            )
+        input("Press Enter to continue...")
+
+
 def show_main_menu():
     """Главное меню."""
     while True:
@@ -349,8 +572,14 @@ def show_main_menu():
             if choice == "1":
                 start_new_chat()
             elif choice == "2":
-                settings()
+                chat_history()
             elif choice == "3":
+                search_history()
+            elif choice == "4":
+                settings()
+            elif choice == "5":
+                flush_usage()
+                report_usage_failure()
                 display_goodbye()
                 sys.exit(0)
             else:
@@ -361,16 +590,27 @@ def show_main_menu():
                 time.sleep(5)
             except KeyboardInterrupt:
                 print("Exiting...")
+                flush_usage()
                 sys.exit(0)
 
 
 if __name__ == "__main__":
-    # Инициализируем базу данных
-    from src.database import init_database, migrate_settings_from_json
+    # Инициализируем базу данных (схема и перенос настроек из JSON
+    # выполняются один раз и отмечаются версией схемы)
+    from src.database import init_database
 
     init_database()
 
-    # Мигрируем настройки из JSON в базу данных
-    migrate_settings_from_json()
+    # Неинтерактивный пакетный режим: python main.py batch prompts.jsonl
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        from src.batch import main as batch_main
+
+        sys.exit(batch_main(sys.argv[2:]))
+
+    # Выгрузка всех сохраненных чатов: python main.py export-all -o chats.tar
+    if len(sys.argv) > 1 and sys.argv[1] == "export-all":
+        from src.archive import main as export_all_main
+
+        sys.exit(export_all_main(sys.argv[2:]))
 
     show_main_menu()
@@ -2,29 +2,559 @@
 Модуль для работы с API.
 """
 
-import openai
-from .stats import update_usage
-from .database import get_api_key, get_endpoint
+import importlib
+import queue
+import threading
+import time
+from config.config import (
+    HEDGE_DELAY,
+    PREWARM_CONNECTION,
+    PREWARM_INTERVAL,
+    PREWARM_MIN_INTERVAL,
+    PREWARM_WINDOW,
+    get_model_id,
+)
+from .stats import update_usage, record_routing, log_request
+from .database import get_api_key, get_endpoint, add_settings_listener
+from .tokens import estimate_tokens, estimate_messages_tokens
+from . import response_cache
+from .prompt_cache import prepare_request, cached_tokens
+from .resilience import call_with_retry, client_timeout, CircuitOpenError
+from .transport import get_http_client, close_http_client, get_settings as get_transport
+from .routing import model_chain, model_endpoint, hedge_model, can_fall_back, with_fallback
 
+# Кэш клиентов на процесс: (api_key, endpoint, httpx.Client) -> openai.OpenAI.
+# Все клиенты работают через общий транспорт (см. transport) с пулом
+# keep-alive соединений, который переиспользуется между сообщениями и чатами.
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def preload():
+    """Фоновый импорт openai (сотни мс), пока пользователь набирает сообщение."""
+    threading.Thread(
+        target=importlib.import_module, args=("openai",), daemon=True
+    ).start()
+
+
+# Поддержка прогретого соединения: работает ли поток и до какого момента (time.monotonic())
+_warm = {"running": False, "deadline": 0.0}
+_warm_stop = threading.Event()
+_warm_lock = threading.Lock()
+
+
+def warm_connection():
+    """Фоновый прогрев соединения с эндпоинтом текущей модели на время ожидания ввода.
+
+    Соединение из пула клиента поддерживается открытым легкими запросами HEAD
+    каждые PREWARM_INTERVAL секунд (чаще, чем истекает keepalive_expiry
+    транспорта, но не чаще раза в PREWARM_MIN_INTERVAL), пока не вызван
+    stop_warming() или не прошло PREWARM_WINDOW секунд, и первый запрос идет
+    по готовому соединению. При keepalive_expiry = 0 пул не хранит
+    соединения, и прогрев не выполняется.
+    """
+    if not PREWARM_CONNECTION or _warm_interval() is None:
+        return
+    with _warm_lock:
+        _warm["deadline"] = time.monotonic() + PREWARM_WINDOW
+        _warm_stop.clear()
+        if not _warm["running"]:
+            _warm["running"] = True
+            threading.Thread(target=_keep_warm, daemon=True).start()
+
+
+def stop_warming():
+    """Остановка прогрева: ввод получен, дальше соединение использует запрос."""
+    _warm_stop.set()
+
+
+def _warming():
+    """Продолжать ли прогрев. Поток отмечается завершенным под блокировкой,
+    чтобы повторный warm_connection() запустил новый поток."""
+    with _warm_lock:
+        if _warm_stop.is_set() or time.monotonic() >= _warm["deadline"]:
+            _warm["running"] = False
+        return _warm["running"]
+
+
+def _warm_interval():
+    """Период прогрева в секундах или None, если пул не хранит соединения."""
+    expiry = get_transport()["keepalive_expiry"]
+    if expiry <= 0:
+        return None
+    return max(PREWARM_MIN_INTERVAL, min(PREWARM_INTERVAL, expiry * 0.8))
+
+
+def _keep_warm():
+    """Цикл прогрева соединения."""
+    while _warming():
+        try:
+            client = get_client(model_endpoint(get_model_id()))
+            # Любой ответ (в том числе 404/405) оставляет соединение в пуле клиента
+            client._client.head(  # pylint: disable=protected-access
+                str(client.base_url), timeout=PREWARM_INTERVAL
+            )
+        except Exception:  # pylint: disable=broad-except
+            # Прогрев необязателен: ошибки сети проявятся при самом запросе
+            with _warm_lock:
+                _warm["running"] = False
+            return
+        interval = _warm_interval()
+        if interval is None:
+            # Время жизни соединений обнулено в настройках во время прогрева
+            with _warm_lock:
+                _warm["running"] = False
+            return
+        _warm_stop.wait(interval)
+
+
+def api_errors():
+    """Классы ошибок API для except. openai импортируется только при первом обращении."""
+    import openai
+
+    return (openai.APIError, openai.RateLimitError, openai.AuthenticationError)
+
+
+def get_client(endpoint=None):
+    """Получение клиента OpenAI с текущими настройками.
+
+    endpoint - эндпоинт модели, если он отличается от эндпоинта из настроек.
+    """
+    import openai
 
-def get_client():
-    """Получение клиента OpenAI с текущими настройками."""
     api_key = get_api_key()
-    endpoint = get_endpoint()
+    endpoint = endpoint or get_endpoint()
+    http_client = get_http_client()
+    key = (api_key, endpoint, http_client)
+
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            # Клиенты на транспорте с прежними настройками больше не нужны
+            for stale in [key for key in _clients if key[2] is not http_client]:
+                del _clients[stale]
+            # Повторы выполняет resilience, встроенные повторы SDK отключены
+            client = openai.OpenAI(
+                api_key=api_key,
+                base_url=endpoint,
+                timeout=client_timeout(),
+                max_retries=0,
+                http_client=http_client,
+            )
+            _clients[key] = client
+
+    return client
+
+
+def invalidate_clients(api_key=None, endpoint=None):
+    """Сброс кэшированных клиентов, не совпадающих с (api_key, endpoint).
+
+    Клиенты не закрываются: close() закрыл бы общий транспорт. Без
+    аргументов сбрасывает все клиенты и закрывает транспорт с его соединениями.
+    """
+    with _clients_lock:
+        stale = [key for key in _clients if key[:2] != (api_key, endpoint)]
+        for key in stale:
+            del _clients[key]
+    if api_key is None and endpoint is None:
+        close_http_client()
+
+
+def _on_settings_changed(api_key, endpoint, _model):
+    """Сброс клиентов при смене API ключа или эндпоинта."""
+    invalidate_clients(api_key, endpoint)
+
+
+add_settings_listener(_on_settings_changed)
+
+
+def new_trace():
+    """Сведения о запросе для журнала: время начала и число повторов."""
+    return {"started": time.perf_counter(), "retries": 0}
+
+
+def log_completion(trace, model_id, completion=None, ttft=None, error=None, endpoint=None):
+    """Запись завершенного или неудачного запроса в журнал запросов.
+
+    endpoint - эндпоинт по умолчанию, если он уже известен вызывающему.
+    """
+    completion = completion or {}
+    log_request(
+        model_id,
+        model_endpoint(model_id, endpoint),
+        time.perf_counter() - trace["started"],
+        completion.get("input_tokens", 0),
+        completion.get("output_tokens", 0),
+        ttft,
+        trace["retries"],
+        completion.get("cached", False),
+        error,
+        completion.get("cached_tokens", 0),
+    )
+
+
+def open_stream(messages, model_id, endpoint=None, trace=None):
+    """Открытие потокового ответа с повторами при временных ошибках."""
+    endpoint = endpoint or get_endpoint()
+    client = get_client(endpoint)
+    messages, options = prepare_request(messages, model_id)
+    return call_with_retry(
+        lambda timeout: client.chat.completions.create(
+            model=model_id,
+            messages=messages,
+            stream=True,
+            stream_options={"include_usage": True},
+            timeout=timeout,
+            **options,
+        ),
+        endpoint,
+        trace,
+    )
+
+
+def iter_stream(stream):
+    """События потока: ("delta", текст) и ("usage", usage)."""
+    for chunk in stream:
+        # Последний фрагмент с include_usage приходит без choices
+        if getattr(chunk, "usage", None):
+            yield "usage", chunk.usage
+        if not chunk.choices:
+            continue
+
+        delta = chunk.choices[0].delta.content
+        if delta:
+            yield "delta", delta
+
+
+class _StreamWorker(threading.Thread):
+    """Фоновое чтение одного потокового ответа в общую очередь событий."""
+
+    def __init__(self, messages, model_id, endpoint, events, trace=None):
+        """Инициализация."""
+        super().__init__(daemon=True)
+        self.messages = messages
+        self.model_id = model_id
+        self.endpoint = endpoint
+        self.events = events
+        self.trace = trace
+        self.stream = None
+        self.cancelled = False
 
-    return openai.OpenAI(api_key=api_key, base_url=endpoint)
+    def run(self):
+        """Чтение потока; события кладутся в очередь как (worker, kind, payload)."""
+        try:
+            self.stream = open_stream(self.messages, self.model_id, self.endpoint, self.trace)
+            if self.cancelled:
+                self.stream.close()
+                return
+            for kind, payload in iter_stream(self.stream):
+                if self.cancelled:
+                    return
+                self.events.put((self, kind, payload))
+            self.events.put((self, "done", None))
+        except Exception as e:  # pylint: disable=broad-except
+            # Ошибка отмененного запроса никому не нужна
+            if not self.cancelled:
+                self.events.put((self, "error", e))
 
+    def cancel(self):
+        """Отмена запроса: закрытие потока прерывает HTTP ответ."""
+        self.cancelled = True
+        stream = self.stream
+        if stream is not None:
+            stream.close()
 
-def send_message(messages, model_id):
-    """Отправка сообщения и получение ответа."""
-    client = get_client()
-    response = client.chat.completions.create(model=model_id, messages=messages)
 
+class StreamedResponse:
+    """Потоковый ответ модели: итерация возвращает фрагменты текста."""
+
+    def __init__(self, messages, model_id, cache_key=None, cached=None):
+        """Инициализация.
+
+        cache_key - ключ для сохранения ответа в кэш, cached - готовый
+        ответ из кэша (тогда запрос к API не выполняется).
+        """
+        self.messages = messages
+        self.model_id = model_id
+        # Модель, которая фактически ответила (запасная или дублирующая)
+        self.served_model = model_id
+        self.cache_key = cache_key
+        self.cached = cached
+        self.answer = ""
+        self.tokens_used = None
+        self.input_tokens = 0
+        self.output_tokens = 0
+        # Входные токены из кэша префиксов провайдера
+        self.cached_tokens = 0
+        self.ttft = None
+        self.tokens_per_sec = None
+        self.started_at = None
+        self.finished_at = None
+        self.trace = None
+
+    def __iter__(self):
+        """Запрос к API и выдача фрагментов ответа по мере поступления."""
+        self.trace = new_trace()
+        if self.cached:
+            yield from self._replay_cached()
+            return
+
+        self.started_at = self.trace["started"]
+        parts = []
+        first_token_at = None
+        usage = None
+        try:
+            for kind, payload in self._events():
+                if kind == "usage":
+                    usage = payload
+                    continue
+
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                    self.ttft = first_token_at - self.started_at
+                parts.append(payload)
+                yield payload
+        except (Exception, KeyboardInterrupt) as e:
+            log_completion(self.trace, self.served_model, ttft=self.ttft, error=type(e).__name__)
+            raise
+
+        self.finished_at = time.perf_counter()
+        self.answer = "".join(parts)
+        self._record_usage(usage)
+        cache_key = served_cache_key(
+            self.cache_key, self.messages, self.model_id, self.served_model
+        )
+        if cache_key:
+            response_cache.store(
+                cache_key,
+                self.served_model,
+                self.answer,
+                self.input_tokens,
+                self.output_tokens,
+            )
+
+        generation_time = self.finished_at - (first_token_at or self.finished_at)
+        if self.output_tokens and generation_time > 0:
+            self.tokens_per_sec = self.output_tokens / generation_time
+
+        log_completion(
+            self.trace,
+            self.served_model,
+            {
+                "input_tokens": self.input_tokens,
+                "output_tokens": self.output_tokens,
+                "cached_tokens": self.cached_tokens,
+            },
+            self.ttft,
+        )
+
+    def _events(self):
+        """События ответа с переходом на запасную модель до первого фрагмента."""
+        import openai
+
+        chain = model_chain(self.model_id)
+        for index, model in enumerate(chain):
+            self.served_model = model
+            endpoint = model_endpoint(model)
+            backup = hedge_model(model) if index == 0 else None
+            started = False
+            try:
+                if backup:
+                    events = self._hedged_events(model, endpoint, backup)
+                else:
+                    events = self._direct_events(model, endpoint)
+                for kind, payload in events:
+                    started = started or kind == "delta"
+                    yield kind, payload
+            except (openai.APIError, CircuitOpenError) as e:
+                # После первого фрагмента ответ уже показан - переход невозможен
+                if started or not can_fall_back(chain, index, e):
+                    raise
+                continue
+
+            if index:
+                record_routing(model, "fallbacks")
+            return
+
+    def _direct_events(self, model_id, endpoint):
+        """События одного потокового запроса."""
+        stream = open_stream(self.messages, model_id, endpoint, self.trace)
+        try:
+            yield from iter_stream(stream)
+        finally:
+            stream.close()
+
+    def _hedged_events(self, model_id, endpoint, backup):
+        """События запроса с дублированием.
+
+        Если первый фрагмент не пришел за HEDGE_DELAY секунд, тот же запрос
+        отправляется запасной модели. Ответ берется у того, кто ответил
+        первым, второй запрос отменяется.
+        """
+        events = queue.Queue()
+        workers = [_StreamWorker(self.messages, model_id, endpoint, events, self.trace)]
+        workers[0].start()
+        deadline = time.monotonic() + HEDGE_DELAY
+        hedged = False
+        winner = None
+
+        try:
+            while True:
+                timeout = None
+                if winner is None and not hedged:
+                    timeout = max(deadline - time.monotonic(), 0)
+                try:
+                    worker, kind, payload = events.get(timeout=timeout)
+                except queue.Empty:
+                    hedged = True
+                    record_routing(model_id, "hedged")
+                    hedge = _StreamWorker(
+                        self.messages, backup, model_endpoint(backup), events, self.trace
+                    )
+                    hedge.start()
+                    workers.append(hedge)
+                    continue
+
+                if winner is None:
+                    if kind == "error":
+                        # Ждем второй запрос, если он еще идет
+                        workers.remove(worker)
+                        if workers:
+                            continue
+                        raise payload
+
+                    winner = worker
+                    self.served_model = worker.model_id
+                    for other in workers:
+                        if other is not winner:
+                            other.cancel()
+                    if hedged:
+                        record_routing(winner.model_id, "hedge_wins")
+
+                if worker is not winner:
+                    continue
+                if kind == "done":
+                    return
+                if kind == "error":
+                    raise payload
+                yield kind, payload
+        finally:
+            for worker in workers:
+                worker.cancel()
+
+    def _replay_cached(self):
+        """Выдача ответа из кэша целиком, без учета в статистике запросов."""
+        self.started_at = self.trace["started"]
+        self.answer = self.cached["answer"]
+        self.input_tokens = self.cached["input_tokens"]
+        self.output_tokens = self.cached["output_tokens"]
+        self.tokens_used = self.output_tokens
+        self.finished_at = time.perf_counter()
+        self.ttft = self.finished_at - self.started_at
+        log_completion(self.trace, self.model_id, cached_result(self.cached), self.ttft)
+        yield self.answer
+
+    def _record_usage(self, usage):
+        """Учет токенов по данным провайдера или по локальной оценке."""
+        if usage:
+            self.input_tokens = getattr(usage, "prompt_tokens", 0) or 0
+            self.output_tokens = getattr(usage, "completion_tokens", 0) or 0
+            self.cached_tokens = cached_tokens(usage)
+            self.tokens_used = getattr(usage, "completion_tokens", None)
+            if self.tokens_used is None:
+                self.tokens_used = getattr(usage, "total_tokens", None)
+        else:
+            # Провайдер не прислал usage - оцениваем локально
+            self.input_tokens = estimate_messages_tokens(self.messages)
+            self.output_tokens = estimate_tokens(self.answer)
+            self.tokens_used = self.output_tokens
+
+        update_usage(
+            self.input_tokens, self.output_tokens, self.served_model, self.cached_tokens
+        )
+
+
+def cache_key_for(messages, model_id):
+    """Ключ кэша ответов для модели и эндпоинта, на который уходит ее запрос."""
+    return response_cache.make_key(model_id, model_endpoint(model_id), messages)
+
+
+def served_cache_key(cache_key, messages, model_id, served_model):
+    """Ключ для сохранения ответа в кэш.
+
+    Ответ запасной или дублирующей модели кэшируется под ее моделью и
+    эндпоинтом, а не под запрошенными.
+    """
+    if cache_key and served_model != model_id:
+        return cache_key_for(messages, served_model)
+    return cache_key
+
+
+def cache_lookup(messages, model_id):
+    """Ключ и запись кэша ответов (None, None, если кэш выключен)."""
+    if not response_cache.is_enabled():
+        return None, None
+    cache_key = cache_key_for(messages, model_id)
+    return cache_key, response_cache.lookup(cache_key)
+
+
+def request_completion(messages, model_id):
+    """Непотоковый запрос к модели с подробным результатом.
+
+    Возвращает словарь: answer, tokens_used, input_tokens, output_tokens,
+    cached и, если ответ не из кэша, model - модель, которая ответила,
+    и cached_tokens - входные токены из кэша префиксов провайдера.
+    """
+    trace = new_trace()
+    cache_key, cached = cache_lookup(messages, model_id)
+    if cached:
+        completion = cached_result(cached)
+        log_completion(trace, model_id, completion)
+        return completion
+
+    def request(model, endpoint):
+        """Запрос к одной модели цепочки."""
+        client = get_client(endpoint)
+        request_messages, options = prepare_request(messages, model)
+        return call_with_retry(
+            lambda timeout: client.chat.completions.create(
+                model=model, messages=request_messages, timeout=timeout, **options
+            ),
+            endpoint,
+            trace,
+        )
+
+    try:
+        response, served_model = with_fallback(model_id, request)
+    except (Exception, KeyboardInterrupt) as e:
+        log_completion(trace, model_id, error=type(e).__name__)
+        raise
+
+    cache_key = served_cache_key(cache_key, messages, model_id, served_model)
+    completion = completion_result(response, served_model, cache_key)
+    log_completion(trace, served_model, completion)
+    return completion
+
+
+def cached_result(cached):
+    """Результат запроса, взятый из кэша ответов."""
+    return {
+        "answer": cached["answer"],
+        "tokens_used": cached["output_tokens"],
+        "input_tokens": cached["input_tokens"],
+        "output_tokens": cached["output_tokens"],
+        "cached": True,
+    }
+
+
+def completion_result(response, model_id, cache_key=None):
+    """Разбор ответа API: учет использования, запись в кэш, итоговый словарь."""
     answer = response.choices[0].message.content
     usage = getattr(response, "usage", None)
     tokens_used = None
     input_tokens = 0
     output_tokens = 0
+    cached_input = cached_tokens(usage)
 
     if usage:
         tokens_used = getattr(usage, "completion_tokens", None)
@@ -34,6 +564,31 @@ def send_message(messages, model_id):
         input_tokens = getattr(usage, "prompt_tokens", 0)
         output_tokens = getattr(usage, "completion_tokens", 0)
 
-        update_usage(input_tokens, output_tokens, model_id)
+        update_usage(input_tokens, output_tokens, model_id, cached_input)
+
+    if cache_key:
+        response_cache.store(cache_key, model_id, answer, input_tokens, output_tokens)
+
+    return {
+        "answer": answer,
+        "tokens_used": tokens_used,
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "cached_tokens": cached_input,
+        "cached": False,
+        "model": model_id,
+    }
+
+
+def send_message(messages, model_id, stream=False):
+    """Отправка сообщения и получение ответа.
+
+    При stream=True возвращает StreamedResponse, который нужно проитерировать.
+    Если включен кэш ответов, попадания возвращаются без запроса к API
+    и не учитываются в статистике запросов.
+    """
+    if stream:
+        return StreamedResponse(messages, model_id, *cache_lookup(messages, model_id))
 
-    return answer, tokens_used
+    completion = request_completion(messages, model_id)
+    return completion["answer"], completion["tokens_used"]
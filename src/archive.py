@@ -0,0 +1,204 @@
+"""
+Модуль для выгрузки всех сохраненных чатов в архив (python main.py export-all).
+
+Чаты читаются из базы потоково, по одному, и сериализуются (а при
+необходимости сжимаются) пулом процессов; основной процесс только
+дописывает готовые файлы в архив tar/zip или в дерево каталогов.
+В работе держится не больше workers * 2 пачек чатов, поэтому память не
+зависит от объема истории.
+
+Структура архива: conversations/<дата создания>/<id>.<формат>[.gz|.zst]
+"""
+
+import argparse
+import io
+import os
+import sys
+import tarfile
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+
+from .database import iter_conversations
+from .export import COMPRESSIONS, EXPORT_FORMATS, atomic_file, export_bytes
+
+# Виды архива
+ARCHIVE_KINDS = ("tar", "zip", "dir")
+
+# Количество рабочих процессов по умолчанию
+DEFAULT_WORKERS = max(1, min(8, os.cpu_count() or 1))
+
+# Сколько чатов передается процессу за одну задачу
+CHUNK_SIZE = 32
+
+
+def member_name(conversation, format_type, compression=None):
+    """Путь файла чата внутри архива."""
+    day = (conversation["created_at"] or "unknown")[:10]
+    suffix = COMPRESSIONS[compression] if compression else ""
+    return f"conversations/{day}/{conversation['id']}.{EXPORT_FORMATS[format_type]}{suffix}"
+
+
+def serialize_chunk(conversations, format_type, compression=None):
+    """Сериализация пачки чатов в рабочем процессе: список (имя, байты, сообщений)."""
+    return [
+        (
+            member_name(conversation, format_type, compression),
+            export_bytes(conversation["messages"], format_type, compression),
+            len(conversation["messages"]),
+        )
+        for conversation in conversations
+    ]
+
+
+def chunked(conversations, size):
+    """Разбиение потока чатов на пачки."""
+    chunk = []
+    for conversation in conversations:
+        chunk.append(conversation)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class TarSink:
+    """Запись файлов в tar."""
+
+    def __init__(self, raw):
+        """Инициализация."""
+        self.archive = tarfile.open(fileobj=raw, mode="w")
+        self.mtime = time.time()
+
+    def add(self, name, data):
+        """Добавление файла."""
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = self.mtime
+        self.archive.addfile(info, io.BytesIO(data))
+
+    def close(self):
+        """Завершение архива."""
+        self.archive.close()
+
+
+class ZipSink:
+    """Запись файлов в zip. Уже сжатые файлы хранятся без повторного сжатия."""
+
+    def __init__(self, raw, compressed):
+        """Инициализация."""
+        method = zipfile.ZIP_STORED if compressed else zipfile.ZIP_DEFLATED
+        self.archive = zipfile.ZipFile(raw, mode="w", compression=method)
+
+    def add(self, name, data):
+        """Добавление файла."""
+        self.archive.writestr(name, data)
+
+    def close(self):
+        """Завершение архива."""
+        self.archive.close()
+
+
+class DirSink:
+    """Запись файлов в дерево каталогов, каждый файл - атомарно."""
+
+    def __init__(self, root):
+        """Инициализация."""
+        self.root = root
+        self.directories = set()
+
+    def add(self, name, data):
+        """Добавление файла."""
+        path = os.path.join(self.root, *name.split("/"))
+        directory = os.path.dirname(path)
+        if directory not in self.directories:
+            os.makedirs(directory, exist_ok=True)
+            self.directories.add(directory)
+        with atomic_file(path) as f:
+            f.write(data)
+
+    def close(self):
+        """Завершение записи."""
+
+
+def export_all(sink, conversations, format_type, compression=None, workers=DEFAULT_WORKERS):
+    """Выгрузка чатов в sink пулом процессов. Возвращает (чатов, сообщений, байт)."""
+    totals = [0, 0, 0]
+    pending = deque()
+
+    def drain(limit):
+        """Запись готовых пачек по порядку, пока в работе больше limit пачек."""
+        while len(pending) > limit:
+            for name, data, message_count in pending.popleft().result():
+                sink.add(name, data)
+                totals[0] += 1
+                totals[1] += message_count
+                totals[2] += len(data)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for chunk in chunked(conversations, CHUNK_SIZE):
+            pending.append(executor.submit(serialize_chunk, chunk, format_type, compression))
+            drain(workers * 2)
+        drain(0)
+
+    return tuple(totals)
+
+
+def archive_filename(kind):
+    """Имя архива по умолчанию: chat_archive_<время>[.tar|.zip]."""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return f"chat_archive_{timestamp}" + ("" if kind == "dir" else f".{kind}")
+
+
+def main(argv=None):
+    """Точка входа: python main.py export-all [-o archive.tar] [--since DATE] ..."""
+    parser = argparse.ArgumentParser(
+        prog="main.py export-all",
+        description="Export all saved conversations into a tar/zip archive or a directory.",
+    )
+    parser.add_argument("-o", "--output", help="archive file or directory")
+    parser.add_argument("-a", "--archive", choices=ARCHIVE_KINDS, help="default: from -o, else tar")
+    parser.add_argument("-f", "--format", choices=tuple(EXPORT_FORMATS), default="json")
+    parser.add_argument("-c", "--compress", choices=tuple(COMPRESSIONS), help="compress each file")
+    parser.add_argument(
+        "--since", type=date.fromisoformat, help="last updated on or after (YYYY-MM-DD)"
+    )
+    parser.add_argument(
+        "--until", type=date.fromisoformat, help="last updated on or before (YYYY-MM-DD)"
+    )
+    parser.add_argument("-m", "--model", help="only conversations with this model ID")
+    parser.add_argument("-w", "--workers", type=int, default=DEFAULT_WORKERS)
+    args = parser.parse_args(argv)
+
+    kind = args.archive
+    if kind is None:
+        extension = os.path.splitext(args.output or "")[1].lstrip(".")
+        kind = extension if extension in ("tar", "zip") else ("dir" if args.output else "tar")
+    output = args.output or archive_filename(kind)
+
+    conversations = iter_conversations(args.since, args.until, args.model)
+    started = time.perf_counter()
+    if kind == "dir":
+        totals = export_all(
+            DirSink(output), conversations, args.format, args.compress, max(1, args.workers)
+        )
+    else:
+        with atomic_file(output) as raw:
+            sink = TarSink(raw) if kind == "tar" else ZipSink(raw, args.compress is not None)
+            totals = export_all(
+                sink, conversations, args.format, args.compress, max(1, args.workers)
+            )
+            sink.close()
+    elapsed = time.perf_counter() - started
+
+    count, messages, size = totals
+    print(
+        f"{count} conversations ({messages} messages, {size / 1024 / 1024:.1f} MB) "
+        f"in {elapsed:.1f} s | {count / elapsed if elapsed else 0:.1f} conversations/s "
+        f"-> {os.path.abspath(output)}",
+        file=sys.stderr,
+    )
+    return 0
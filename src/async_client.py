@@ -0,0 +1,185 @@
+"""
+Модуль для асинхронной работы с API.
+
+Асинхронный аналог send_message на AsyncOpenAI: один пул соединений на
+эндпоинт и цикл событий, ограничение параллельности семафором и тот же
+учет использования и кэш ответов, что и в синхронном api_client.
+
+Настройки (ключ, эндпоинт, транспорт) читаются из базы один раз на цикл
+событий, то есть на пакет запросов; изменения настроек в этом процессе
+приходят через add_settings_listener, настройки транспорта - со следующим
+циклом. Чтение и запись кэша ответов идут в потоке, чтобы работа с SQLite
+не останавливала цикл событий.
+"""
+
+import asyncio
+
+from config.config import ASYNC_CONCURRENCY_LIMIT
+from .database import get_settings, add_settings_listener
+from . import response_cache, transport
+from .api_client import (
+    cache_lookup,
+    cached_result,
+    completion_result,
+    served_cache_key,
+    new_trace,
+    log_completion,
+)
+from .prompt_cache import prepare_request
+from .resilience import call_with_retry_async, client_timeout
+from .routing import with_fallback_async
+from .transport import get_async_http_client, close_async_http_client
+
+# Клиенты и семафоры привязаны к циклу событий, в котором созданы:
+# (loop, api_key, endpoint, httpx.AsyncClient) -> AsyncOpenAI, (loop, endpoint) -> Semaphore
+_clients = {}
+_semaphores = {}
+
+# Снимки настроек по циклам событий: loop -> {"api_key", "endpoint", "transport"}
+_sessions = {}
+
+
+def get_session():
+    """Снимок настроек текущего цикла событий; из базы читается один раз на цикл."""
+    loop = asyncio.get_running_loop()
+    session = _sessions.get(loop)
+    if session is None:
+        for closed in [key for key in _sessions if key.is_closed()]:
+            del _sessions[closed]
+        settings = get_settings()
+        session = {
+            "api_key": settings["api_key"],
+            "endpoint": settings["endpoint"],
+            "transport": transport.get_settings(),
+        }
+        _sessions[loop] = session
+    return session
+
+
+def get_async_client(endpoint=None):
+    """Получение AsyncOpenAI для текущих настроек и текущего цикла событий."""
+    import openai
+
+    loop = asyncio.get_running_loop()
+    session = get_session()
+    api_key = session["api_key"]
+    endpoint = endpoint or session["endpoint"]
+    http_client = get_async_http_client(session["transport"])
+    key = (loop, api_key, endpoint, http_client)
+
+    client = _clients.get(key)
+    if client is None:
+        # Клиенты на транспорте с прежними настройками и закрытых циклов больше не нужны
+        for stale in [
+            key for key in _clients
+            if key[0].is_closed() or (key[0] is loop and key[3] is not http_client)
+        ]:
+            del _clients[stale]
+        client = openai.AsyncOpenAI(
+            api_key=api_key,
+            base_url=endpoint,
+            timeout=client_timeout(session["transport"]),
+            max_retries=0,
+            http_client=http_client,
+        )
+        _clients[key] = client
+    return client
+
+
+def get_semaphore(endpoint, limit=None):
+    """Семафор, ограничивающий число одновременных запросов к эндпоинту."""
+    key = (asyncio.get_running_loop(), endpoint)
+    semaphore = _semaphores.get(key)
+    if semaphore is None:
+        for closed in [key for key in _semaphores if key[0].is_closed()]:
+            del _semaphores[closed]
+        semaphore = asyncio.Semaphore(limit or ASYNC_CONCURRENCY_LIMIT)
+        _semaphores[key] = semaphore
+    return semaphore
+
+
+async def close_async_clients():
+    """Закрытие клиентов, созданных в текущем цикле событий."""
+    loop = asyncio.get_running_loop()
+    # Клиенты делят транспорт цикла событий, он закрывается один раз
+    for key in [key for key in _clients if key[0] is loop]:
+        del _clients[key]
+    await close_async_http_client()
+    for key in [key for key in _semaphores if key[0] is loop]:
+        del _semaphores[key]
+    _sessions.pop(loop, None)
+
+
+def _on_settings_changed(api_key, endpoint, _model):
+    """Обновляем снимки настроек и забываем клиенты со старым ключом или эндпоинтом."""
+    for session in _sessions.values():
+        session.update(api_key=api_key, endpoint=endpoint)
+    for key in [key for key in _clients if key[1:3] != (api_key, endpoint)]:
+        del _clients[key]
+
+
+def _store_response(cache_key, messages, model_id, completion):
+    """Сохранение ответа в кэш (выполняется в потоке, см. request_completion_async)."""
+    served_model = completion["model"]
+    response_cache.store(
+        served_cache_key(cache_key, messages, model_id, served_model),
+        served_model,
+        completion["answer"],
+        completion["input_tokens"],
+        completion["output_tokens"],
+    )
+
+
+add_settings_listener(_on_settings_changed)
+
+
+async def request_completion_async(messages, model_id):
+    """Асинхронный запрос к модели. Результат как у api_client.request_completion.
+
+    Отмена задачи (task.cancel(), asyncio.wait_for) прерывает HTTP запрос,
+    освобождает место в семафоре и не попадает в статистику использования
+    (в журнале запросов отмечается как CancelledError).
+    """
+    trace = new_trace()
+    session = get_session()
+    cache_key = cached = None
+    if response_cache.is_enabled():
+        cache_key, cached = await asyncio.to_thread(cache_lookup, messages, model_id)
+    if cached:
+        completion = cached_result(cached)
+        log_completion(trace, model_id, completion, endpoint=session["endpoint"])
+        return completion
+
+    async def request(model, endpoint):
+        """Запрос к одной модели цепочки."""
+        client = get_async_client(endpoint)
+        request_messages, options = prepare_request(messages, model)
+
+        # Место в семафоре не занимается на время паузы между повторами
+        async def attempt(timeout):
+            async with get_semaphore(endpoint):
+                return await client.chat.completions.create(
+                    model=model, messages=request_messages, timeout=timeout, **options
+                )
+
+        return await call_with_retry_async(attempt, endpoint, trace, session["transport"])
+
+    try:
+        response, served_model = await with_fallback_async(
+            model_id, request, session["endpoint"]
+        )
+    except (Exception, asyncio.CancelledError) as e:
+        log_completion(trace, model_id, error=type(e).__name__, endpoint=session["endpoint"])
+        raise
+
+    completion = completion_result(response, served_model)
+    if cache_key:
+        await asyncio.to_thread(_store_response, cache_key, messages, model_id, completion)
+    log_completion(trace, served_model, completion, endpoint=session["endpoint"])
+    return completion
+
+
+async def send_message_async(messages, model_id):
+    """Асинхронная отправка сообщения. Возвращает (answer, tokens_used)."""
+    completion = await request_completion_async(messages, model_id)
+    return completion["answer"], completion["tokens_used"]
@@ -0,0 +1,206 @@
+"""
+Модуль для пакетного (неинтерактивного) режима.
+
+Читает запросы из JSONL (файл или stdin), отправляет их параллельно через
+тот же send_message/учет использования и пишет результаты в JSONL.
+
+Формат входной строки:
+    {"id": "q1", "prompt": "текст"}
+    {"id": "q2", "messages": [{"role": "user", "content": "..."}], "model": "..."}
+"""
+
+import argparse
+import json
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from config.config import get_system_message, get_model_id
+from .api_client import request_completion, api_errors
+from .stats import flush_usage, usage_failure
+
+# Количество рабочих потоков по умолчанию
+DEFAULT_WORKERS = 8
+
+
+def messages_error(messages):
+    """Описание ошибки в списке сообщений задания или None, если он корректен."""
+    if not isinstance(messages, list) or not messages:
+        return "'messages' must be a non-empty list"
+    for index, message in enumerate(messages):
+        if not isinstance(message, dict):
+            return f"messages[{index}] must be an object"
+        if not isinstance(message.get("role"), str):
+            return f"messages[{index}] has no string 'role'"
+        if not isinstance(message.get("content"), str):
+            return f"messages[{index}] has no string 'content'"
+    return None
+
+
+def read_items(lines, with_system=True):
+    """Разбор строк JSONL в задания с ID и списком сообщений."""
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+
+        try:
+            data = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield {"id": number, "error": f"invalid JSON: {e}"}
+            continue
+
+        if isinstance(data, str):
+            data = {"prompt": data}
+        elif not isinstance(data, dict):
+            yield {"id": number, "error": "line must be a JSON object or string"}
+            continue
+
+        item_id = data.get("id", number)
+        if "messages" in data:
+            messages = data["messages"]
+            error = messages_error(messages)
+            if error:
+                yield {"id": item_id, "error": error}
+                continue
+        elif "prompt" in data:
+            if not isinstance(data["prompt"], str):
+                yield {"id": item_id, "error": "'prompt' must be a string"}
+                continue
+            messages = [{"role": "user", "content": data["prompt"]}]
+            if with_system:
+                messages.insert(0, get_system_message())
+        else:
+            yield {"id": item_id, "error": "line has neither 'prompt' nor 'messages'"}
+            continue
+
+        yield {"id": item_id, "messages": messages, "model": data.get("model")}
+
+
+def process_item(item, model_id):
+    """Выполнение одного задания. Ошибки попадают в результат, а не наружу."""
+    result = {"id": item["id"]}
+    if "error" in item:
+        result["error"] = item["error"]
+        return result
+
+    model_id = item.get("model") or model_id
+    result["model"] = model_id
+    started = time.perf_counter()
+    try:
+        completion = request_completion(item["messages"], model_id)
+        result.update(
+            answer=completion["answer"],
+            input_tokens=completion["input_tokens"],
+            output_tokens=completion["output_tokens"],
+            cached_tokens=completion.get("cached_tokens", 0),
+            cached=completion["cached"],
+        )
+        # Ответ мог прийти от запасной модели
+        result["model"] = completion.get("model", model_id)
+    except api_errors() + (ConnectionError, TimeoutError) as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    except (AttributeError, TypeError, ValueError, IndexError, KeyError) as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+
+def run_batch(items, model_id, workers, write, ordered=True):
+    """Параллельное выполнение заданий с записью результатов по мере готовности.
+
+    В работе держится не больше workers * 2 заданий, поэтому входной файл
+    любого размера читается потоково. При ordered=True результаты пишутся
+    в порядке входа, иначе - по мере завершения (с тегом id).
+    """
+    window = workers * 2
+    pending = deque()
+
+    def drain(limit):
+        """Запись готовых результатов, пока в работе больше limit заданий."""
+        while len(pending) > limit:
+            if ordered:
+                future = pending.popleft()
+            else:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                future = done.pop()
+                pending.remove(future)
+            write(future.result())
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for item in items:
+            pending.append(executor.submit(process_item, item, model_id))
+            drain(window)
+        drain(0)
+
+
+def main(argv=None):
+    """Точка входа: python main.py batch [input.jsonl] [-o output.jsonl]."""
+    parser = argparse.ArgumentParser(
+        prog="main.py batch", description="Run prompts from a JSONL file concurrently."
+    )
+    parser.add_argument("input", nargs="?", default="-", help="JSONL file or '-' for stdin")
+    parser.add_argument("-o", "--output", default="-", help="JSONL file or '-' for stdout")
+    parser.add_argument("-w", "--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("-m", "--model", help="model ID (default: current model)")
+    parser.add_argument(
+        "--unordered", action="store_true", help="write results as they complete"
+    )
+    parser.add_argument(
+        "--no-system", action="store_true", help="do not prepend the system message"
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        source = sys.stdin if args.input == "-" else open(args.input, "r", encoding="utf-8")
+    except OSError as e:
+        print(f"Cannot read input file: {e}", file=sys.stderr)
+        return 2
+    try:
+        target = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    except OSError as e:
+        print(f"Cannot write output file: {e}", file=sys.stderr)
+        if source is not sys.stdin:
+            source.close()
+        return 2
+    counters = {"total": 0, "errors": 0, "input_tokens": 0, "output_tokens": 0}
+
+    def write(result):
+        counters["total"] += 1
+        counters["errors"] += "error" in result
+        counters["input_tokens"] += result.get("input_tokens", 0)
+        counters["output_tokens"] += result.get("output_tokens", 0)
+        target.write(json.dumps(result, ensure_ascii=False) + "\n")
+        target.flush()
+
+    started = time.perf_counter()
+    try:
+        run_batch(
+            read_items(source, with_system=not args.no_system),
+            args.model or get_model_id(),
+            max(1, args.workers),
+            write,
+            ordered=not args.unordered,
+        )
+    except UnicodeDecodeError as e:
+        print(f"Cannot read input file: not UTF-8 text ({e})", file=sys.stderr)
+        return 2
+    finally:
+        flush_usage()
+        failure = usage_failure()
+        if failure:
+            print(f"Usage statistics were not saved: {failure}", file=sys.stderr)
+        if source is not sys.stdin:
+            source.close()
+        if target is not sys.stdout:
+            target.close()
+
+    elapsed = time.perf_counter() - started
+    print(
+        f"{counters['total']} requests ({counters['errors']} errors) in {elapsed:.1f} s "
+        f"| {counters['total'] / elapsed if elapsed else 0:.1f} req/s "
+        f"| ↑{counters['input_tokens']} ↓{counters['output_tokens']}",
+        file=sys.stderr,
+    )
+    return 1 if counters["errors"] else 0
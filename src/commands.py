@@ -0,0 +1,95 @@
+"""
+Модуль для локального распознавания команд чата с опечатками.
+
+Индекс строится один раз при импорте: префиксы имен команд и варианты
+имен с удаленными символами (как в SymSpell). Поиск подсказки - несколько
+обращений к словарю и проверка расстояния Дамерау-Левенштейна только для
+найденных кандидатов, без запроса к API.
+"""
+
+from itertools import combinations
+
+# Команды чата и их описание для подсказки "Did you mean ...?"
+COMMANDS = {
+    "exit": "end the chat",
+    "status": "show token statistics and latency",
+    "export": "export the chat",
+    "model": "change the model",
+    "search": "search all saved chats",
+    "help": "show help",
+}
+
+# Минимальная длина префикса, по которому подсказывается команда
+MIN_PREFIX_LENGTH = 2
+
+# Допустимое число опечаток: одна для коротких слов, две начиная с этой длины
+LONG_WORD_LENGTH = 6
+
+# Ввод длиннее этого числа слов считается обычным сообщением, а не командой
+MAX_COMMAND_WORDS = 3
+
+
+def _deletes(word, max_distance):
+    """Варианты слова без 0..max_distance символов."""
+    variants = {word}
+    for count in range(1, min(max_distance, len(word) - 1) + 1):
+        for positions in combinations(range(len(word)), count):
+            variants.add("".join(c for i, c in enumerate(word) if i not in positions))
+    return variants
+
+
+def _build_index():
+    """Индексы префиксов и удалений по реестру команд."""
+    prefixes, deletes = {}, {}
+    for command in COMMANDS:
+        for length in range(MIN_PREFIX_LENGTH, len(command)):
+            prefixes.setdefault(command[:length], []).append(command)
+        for variant in _deletes(command, 2):
+            deletes.setdefault(variant, []).append(command)
+    return prefixes, deletes
+
+
+_PREFIXES, _DELETES = _build_index()
+
+
+def edit_distance(a, b):
+    """Расстояние Дамерау-Левенштейна (с перестановкой соседних символов)."""
+    previous2, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        previous2, previous = previous, current
+    return previous[len(b)]
+
+
+def suggest_commands(user_input):
+    """Команды, которые пользователь, вероятно, имел в виду, по первому слову ввода.
+
+    Пустой список - ввод не похож на команду. Точные имена команд здесь
+    не обрабатываются, их выполняет handle_command.
+    """
+    words = user_input.lower().split()
+    if not words or len(words) > MAX_COMMAND_WORDS:
+        return []
+    word = words[0]
+    if word in COMMANDS or len(word) < MIN_PREFIX_LENGTH:
+        return []
+
+    if word in _PREFIXES:
+        return list(_PREFIXES[word])
+
+    max_distance = 2 if len(word) >= LONG_WORD_LENGTH else 1
+    candidates = set()
+    for variant in _deletes(word, max_distance):
+        candidates.update(_DELETES.get(variant, ()))
+
+    matches = []
+    for command in candidates:
+        distance = edit_distance(word, command)
+        if distance <= max_distance:
+            matches.append((distance, list(COMMANDS).index(command), command))
+    return [command for _, _, command in sorted(matches)]
@@ -0,0 +1,131 @@
+"""
+Модуль для управления окном контекста чата.
+"""
+
+from config.config import (
+    DEFAULT_CONTEXT_LENGTH,
+    CONTEXT_BUDGET_RATIO,
+    CONTEXT_BUDGET_TOKENS,
+    CONTEXT_TRIM_SLACK,
+)
+from .models import get_model_info
+from .tokens import estimate_message_tokens
+
+
+def get_context_length(model_id):
+    """Размер контекста модели из models.json или значение по умолчанию."""
+    return get_model_info(model_id)["context_length"] or DEFAULT_CONTEXT_LENGTH
+
+
+def get_context_budget(model_id):
+    """Бюджет токенов истории для запроса к модели."""
+    if CONTEXT_BUDGET_TOKENS:
+        return CONTEXT_BUDGET_TOKENS
+    return int(get_context_length(model_id) * CONTEXT_BUDGET_RATIO)
+
+
+class ContextWindow:
+    """Окно контекста: подсчет токенов истории и обрезка под бюджет.
+
+    Системные сообщения закреплены и отправляются всегда, из остальной
+    истории в запрос попадают самые свежие сообщения, умещающиеся в бюджет.
+    Начало истории сохраняется между ходами, пока она помещается в бюджет,
+    а при обрезке сдвигается с запасом CONTEXT_TRIM_SLACK: префикс запроса
+    меняется редко и читается из кэша провайдера.
+    """
+
+    def __init__(self, memory=None):
+        """Инициализация.
+
+        memory - необязательная скользящая память (RollingMemory).
+        """
+        self.memory = memory
+        # Пары (сообщение, токены) в порядке истории
+        self._counted = []
+        self.history_tokens = 0
+        self.sent_tokens = 0
+        self.trimmed_messages = 0
+        self.tokens_saved = 0
+        # Первое сообщение истории в прошлом запросе
+        self._first = None
+
+    def _sync(self, messages):
+        """Инкрементальный пересчет токенов для новых и измененных сообщений."""
+        for index, message in enumerate(messages):
+            if index < len(self._counted) and self._counted[index][0] is message:
+                continue
+
+            # История изменилась начиная с index (например, после messages.pop())
+            del self._counted[index:]
+            for new_message in messages[index:]:
+                self._counted.append((new_message, estimate_message_tokens(new_message)))
+            break
+        else:
+            del self._counted[len(messages):]
+
+        self.history_tokens = sum(tokens for _, tokens in self._counted)
+
+    def build(self, messages, model_id, budget=None):
+        """Список сообщений для запроса, умещающийся в бюджет токенов."""
+        if self.memory:
+            messages = self.memory.apply(messages)
+        self._sync(messages)
+        if budget is None:
+            budget = get_context_budget(model_id)
+
+        pinned = [pair for pair in self._counted if pair[0].get("role") == "system"]
+        used = sum(tokens for _, tokens in pinned)
+
+        history = [pair for pair in self._counted if pair[0].get("role") != "system"]
+
+        # Вся история или история с того же начала, что и в прошлом запросе,
+        # если она помещается в бюджет
+        start = next(
+            (index for index, (message, _) in enumerate(history) if message is self._first), 0
+        )
+        if used + sum(tokens for _, tokens in history) <= budget:
+            start = 0
+        kept = history[start:]
+        kept_tokens = sum(tokens for _, tokens in kept)
+        if used + kept_tokens <= budget:
+            used += kept_tokens
+        else:
+            # Набираем историю с конца с запасом под следующие ходы.
+            # Последнее сообщение (текущий вопрос) отправляется всегда.
+            limit = used + (budget - used) * (1 - CONTEXT_TRIM_SLACK)
+            kept = []
+            for message, tokens in reversed(history):
+                if kept and used + tokens > limit:
+                    break
+                kept.append((message, tokens))
+                used += tokens
+            kept.reverse()
+
+        # Не начинаем историю с ответа ассистента без вопроса
+        while len(kept) > 1 and kept[0][0].get("role") == "assistant":
+            used -= kept.pop(0)[1]
+
+        self._first = kept[0][0] if kept else None
+        self.sent_tokens = used
+        self.trimmed_messages = len(history) - len(kept)
+        self.tokens_saved += self.history_tokens - used
+
+        kept_ids = {id(message) for message, _ in pinned + kept}
+        return [message for message in messages if id(message) in kept_ids]
+
+    def on_reply(self, messages, model_id):
+        """Обработка завершенного хода: запуск фонового сжатия истории."""
+        if self.memory:
+            self.memory.maybe_start(messages, model_id)
+
+    def stats(self):
+        """Статистика окна контекста для команды status."""
+        stats = {
+            "history_tokens": self.history_tokens,
+            "sent_tokens": self.sent_tokens,
+            "trimmed_messages": self.trimmed_messages,
+            "tokens_saved": self.tokens_saved,
+        }
+        if self.memory:
+            stats.update(self.memory.stats())
+        return stats
@@ -4,19 +4,200 @@
 
 import os
 import sqlite3
-from datetime import date
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
 
 
 DB_PATH = os.path.join(
     os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "usage_stats.db"
 )
 
+# Сколько миллисекунд ждать снятия блокировки другим процессом
+BUSY_TIMEOUT_MS = 5000
+
+# Общее соединение процесса. sqlite3 кэширует подготовленные выражения
+# на уровне соединения, поэтому SQL ниже вынесен в константы и
+# переиспользуется без повторной компиляции.
+_conn = None
+_conn_path = None
+_conn_lock = threading.RLock()
+
+# Снимок строки настроек в памяти и data_version, с которой он снят
+_settings_snapshot = None
+_settings_version = None
+
+# Обработчики, вызываемые после изменения настроек
+_settings_listeners = []
+
+# Снимок строки настроек транспорта (None - строки нет) и data_version снимка
+_transport_snapshot = None
+_transport_version = None
+
+# Колонки таблицы transport_settings в порядке UPSERT_TRANSPORT_SQL
+TRANSPORT_FIELDS = (
+    "http2",
+    "max_connections",
+    "max_keepalive_connections",
+    "keepalive_expiry",
+    "connect_timeout",
+    "read_timeout",
+    "total_timeout",
+    "proxy",
+)
+
+# Счетчики маршрутизации в usage_stats: запущен дублирующий запрос,
+# выигран дублирующий запрос, ответ получен как запасная модель, отказ модели
+ROUTING_COUNTERS = ("hedged", "hedge_wins", "fallbacks", "failures")
+
+# Все счетчики usage_stats и сводных таблиц usage_totals/usage_monthly в порядке
+# колонок; cached_tokens - входные токены, прочитанные из кэша префиксов провайдера
+USAGE_COUNTERS = ("requests", "input_tokens", "output_tokens") + ROUTING_COUNTERS + (
+    "cached_tokens",
+)
+USAGE_COLUMNS_SQL = ", ".join(USAGE_COUNTERS)
+USAGE_SUMS_SQL = ", ".join(f"SUM({column})" for column in USAGE_COUNTERS)
+
+UPSERT_USAGE_SQL = f"""
+    INSERT INTO usage_stats (date, model_id, {USAGE_COLUMNS_SQL})
+    VALUES (?, ?, {", ".join("?" for _ in USAGE_COUNTERS)})
+    ON CONFLICT(date, model_id) DO UPDATE SET
+        {", ".join(f"{column} = {column} + excluded.{column}" for column in USAGE_COUNTERS)}
+"""
+
+INSERT_REQUEST_LOG_SQL = """
+    INSERT INTO request_log (
+        timestamp, model_id, endpoint, input_tokens, output_tokens,
+        latency_ms, ttft_ms, retries, cache_hit, error, cached_tokens
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Перцентили задержки по моделям (ближайший ранг) за период, без ошибок
+# и попаданий в кэш. Скорость генерации - по времени после первого токена.
+# TTFT отдельно для запросов с префиксом из кэша провайдера и без него.
+LATENCY_STATS_SQL = """
+    WITH ranked AS (
+        SELECT model_id, latency_ms, ttft_ms, output_tokens, cached_tokens,
+               ROW_NUMBER() OVER (PARTITION BY model_id ORDER BY latency_ms) AS position,
+               COUNT(*) OVER (PARTITION BY model_id) AS total
+        FROM request_log
+        WHERE timestamp >= ? AND error IS NULL AND cache_hit = 0
+    )
+    SELECT model_id, total,
+           MIN(CASE WHEN position >= 0.50 * total THEN latency_ms END),
+           MIN(CASE WHEN position >= 0.95 * total THEN latency_ms END),
+           MIN(CASE WHEN position >= 0.99 * total THEN latency_ms END),
+           AVG(ttft_ms),
+           SUM(output_tokens) * 1000.0 / NULLIF(SUM(latency_ms - COALESCE(ttft_ms, 0)), 0),
+           AVG(CASE WHEN cached_tokens > 0 THEN ttft_ms END),
+           AVG(CASE WHEN cached_tokens = 0 THEN ttft_ms END)
+    FROM ranked
+    GROUP BY model_id
+"""
+
+UPSERT_SETTINGS_SQL = """
+    INSERT INTO settings (id, api_key, endpoint, model) VALUES (1, ?, ?, ?)
+    ON CONFLICT(id) DO UPDATE SET
+        api_key = excluded.api_key,
+        endpoint = excluded.endpoint,
+        model = excluded.model
+"""
+
+UPSERT_TRANSPORT_SQL = f"""
+    INSERT INTO transport_settings (id, {", ".join(TRANSPORT_FIELDS)})
+    VALUES (1, {", ".join("?" for _ in TRANSPORT_FIELDS)})
+    ON CONFLICT(id) DO UPDATE SET
+        {", ".join(f"{field} = excluded.{field}" for field in TRANSPORT_FIELDS)}
+"""
+
+
+def add_settings_listener(listener):
+    """Регистрация обработчика изменения настроек.
+
+    Обработчик вызывается с аргументами (api_key, endpoint, model).
+    """
+    _settings_listeners.append(listener)
+
+
+def get_connection():
+    """Получение общего соединения с базой данных (WAL, busy_timeout)."""
+    global _conn, _conn_path
+
+    with _conn_lock:
+        if _conn is not None and _conn_path == DB_PATH:
+            return _conn
+
+        close_connection()
+        os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+
+        conn = sqlite3.connect(
+            DB_PATH, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False
+        )
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+        # В режиме WAL NORMAL сохраняет целостность и не делает fsync на каждый commit
+        conn.execute("PRAGMA synchronous = NORMAL")
+        _migrate(conn)
+
+        _conn = conn
+        _conn_path = DB_PATH
+        return _conn
+
+
+def close_connection():
+    """Закрытие общего соединения."""
+    global _conn, _conn_path, _settings_snapshot, _transport_version
+
+    with _conn_lock:
+        if _conn is not None:
+            _conn.close()
+        _conn = None
+        _conn_path = None
+        _settings_snapshot = None
+        _transport_version = None
+
+
+@contextmanager
+def transaction():
+    """Курсор общего соединения внутри транзакции (commit/rollback)."""
+    with _conn_lock:
+        conn = get_connection()
+        with conn:
+            yield conn.cursor()
+
 
 def init_database():
-    """Инициализация базы данных."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    """Инициализация базы данных.
+
+    Схема создается и обновляется миграциями при первом подключении,
+    поэтому повторный вызов стоит одного чтения PRAGMA user_version.
+    """
+    get_connection()
+
+
+def _migrate(conn):
+    """Применение недостающих миграций. Версия схемы хранится в user_version."""
+    if conn.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+        return
+
+    # IMMEDIATE: несколько одновременно запущенных CLI мигрируют по очереди
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        cursor = conn.cursor()
+        for number, migration in enumerate(MIGRATIONS[version:], version + 1):
+            migration(cursor)
+            cursor.execute(f"PRAGMA user_version = {number}")
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
 
+def _create_schema(cursor):
+    """Миграция 1: таблицы статистики, настроек, истории чатов и кэша."""
     cursor.execute(
         """
     CREATE TABLE IF NOT EXISTS usage_stats (
@@ -43,162 +224,641 @@ def init_database():
     """
     )
 
-    conn.commit()
-    conn.close()
+    # Сохраненные чаты: в списке читаются только эти строки, без текстов сообщений
+    cursor.execute(
+        """
+    CREATE TABLE IF NOT EXISTS conversations (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT,
+        model_id TEXT NOT NULL,
+        created_at TEXT NOT NULL,
+        updated_at TEXT NOT NULL,
+        message_count INTEGER DEFAULT 0
+    )
+    """
+    )
+    cursor.execute(
+        """
+    CREATE INDEX IF NOT EXISTS idx_conversations_updated
+    ON conversations (updated_at DESC, id DESC)
+    """
+    )
 
+    cursor.execute(
+        """
+    CREATE TABLE IF NOT EXISTS messages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        conversation_id INTEGER NOT NULL REFERENCES conversations (id),
+        position INTEGER NOT NULL,
+        role TEXT NOT NULL,
+        content TEXT NOT NULL,
+        created_at TEXT NOT NULL,
+        UNIQUE (conversation_id, position)
+    )
+    """
+    )
 
-def update_usage(input_tokens, output_tokens, model_id):
-    """Обновление статистики использования."""
-    today = date.today().isoformat()
+    _init_search_index(cursor)
+
+    # Кэш ответов: ключ - хэш модели, эндпоинта и истории сообщений
+    cursor.execute(
+        """
+    CREATE TABLE IF NOT EXISTS response_cache (
+        key TEXT PRIMARY KEY,
+        model_id TEXT NOT NULL,
+        answer TEXT NOT NULL,
+        input_tokens INTEGER DEFAULT 0,
+        output_tokens INTEGER DEFAULT 0,
+        created_at REAL NOT NULL,
+        last_used REAL NOT NULL,
+        hits INTEGER DEFAULT 0
+    )
+    """
+    )
+    cursor.execute(
+        """
+    CREATE INDEX IF NOT EXISTS idx_response_cache_last_used
+    ON response_cache (last_used)
+    """
+    )
+    cursor.execute(
+        """
+    CREATE TABLE IF NOT EXISTS response_cache_stats (
+        date TEXT PRIMARY KEY,
+        hits INTEGER DEFAULT 0,
+        misses INTEGER DEFAULT 0,
+        tokens_saved INTEGER DEFAULT 0
+    )
+    """
+    )
 
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
 
+def _init_search_index(cursor):
+    """Создание полнотекстового индекса FTS5 по сообщениям.
+
+    Индекс хранит только токены (content='messages'), тексты берутся из
+    таблицы messages; триггеры поддерживают его при каждой вставке.
+    """
     cursor.execute(
-        "SELECT requests, input_tokens, output_tokens FROM usage_stats "
-        "WHERE date = ? AND model_id = ?",
-        (today, model_id),
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'messages_fts'"
     )
-    result = cursor.fetchone()
+    exists = cursor.fetchone() is not None
 
-    if result:
-        requests, input_tok, output_tok = result
+    cursor.execute(
+        """
+    CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+        content,
+        content = 'messages',
+        content_rowid = 'id',
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """
+    )
+    cursor.execute(
+        """
+    CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+        INSERT INTO messages_fts (rowid, content) VALUES (new.id, new.content);
+    END
+    """
+    )
+    cursor.execute(
+        """
+    CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+        INSERT INTO messages_fts (messages_fts, rowid, content)
+        VALUES ('delete', old.id, old.content);
+    END
+    """
+    )
+
+    if not exists:
+        # Сообщения, сохраненные до появления индекса, индексируются один раз
+        cursor.execute("INSERT INTO messages_fts (messages_fts) VALUES ('rebuild')")
+
+
+def update_usage(input_tokens, output_tokens, model_id, cached_tokens=0):
+    """Обновление статистики использования (атомарный UPSERT)."""
+    today = date.today().isoformat()
+    counters = dict.fromkeys(USAGE_COUNTERS, 0)
+    counters.update(
+        requests=1,
+        input_tokens=input_tokens,
+        output_tokens=output_tokens,
+        cached_tokens=cached_tokens,
+    )
+    add_usage_batch([(today, model_id, *counters.values())])
+
+
+def add_usage_batch(rows, log_rows=()):
+    """Добавление пачки счетчиков и записей журнала запросов одной транзакцией.
+
+    rows - итерируемое из (date, model_id, *USAGE_COUNTERS), log_rows - строки
+    request_log в порядке колонок INSERT_REQUEST_LOG_SQL.
+    """
+    with transaction() as cursor:
+        cursor.executemany(UPSERT_USAGE_SQL, rows)
+        cursor.executemany(INSERT_REQUEST_LOG_SQL, log_rows)
+
+
+def get_latency_stats(since):
+    """Задержка и скорость по моделям для запросов с timestamp >= since.
+
+    Возвращает {model_id: {requests, errors, p50, p95, p99, ttft, tokens_per_sec,
+    ttft_cached, ttft_uncached}}, времена в миллисекундах.
+    """
+    with transaction() as cursor:
+        cursor.execute(LATENCY_STATS_SQL, (since,))
+        rows = cursor.fetchall()
         cursor.execute(
             """
-            UPDATE usage_stats 
-            SET requests = ?, input_tokens = ?, output_tokens = ?
-            WHERE date = ? AND model_id = ?
+            SELECT model_id, COUNT(*) FROM request_log
+            WHERE timestamp >= ? AND error IS NOT NULL
+            GROUP BY model_id
             """,
-            (
-                requests + 1,
-                input_tok + input_tokens,
-                output_tok + output_tokens,
-                today,
-                model_id,
-            ),
+            (since,),
         )
+        errors = dict(cursor.fetchall())
+
+    stats = {
+        model_id: {
+            "requests": total,
+            "errors": errors.pop(model_id, 0),
+            "p50": p50,
+            "p95": p95,
+            "p99": p99,
+            "ttft": ttft,
+            "tokens_per_sec": tokens_per_sec,
+            "ttft_cached": ttft_cached,
+            "ttft_uncached": ttft_uncached,
+        }
+        for (
+            model_id, total, p50, p95, p99, ttft, tokens_per_sec, ttft_cached, ttft_uncached
+        ) in rows
+    }
+    # Модели, у которых за период были только ошибки
+    for model_id, count in errors.items():
+        stats[model_id] = {
+            "requests": 0,
+            "errors": count,
+            "p50": None,
+            "p95": None,
+            "p99": None,
+            "ttft": None,
+            "tokens_per_sec": None,
+            "ttft_cached": None,
+            "ttft_uncached": None,
+        }
+    return stats
+
+
+def _usage_summary(rows):
+    """Итоги и разбивка по моделям из строк (model_id, *USAGE_COUNTERS)."""
+    models_stats = {}
+    totals = dict.fromkeys(("requests", "input_tokens", "output_tokens", "cached_tokens"), 0)
+    for model_id, *counters in rows:
+        model_stats = dict(zip(USAGE_COUNTERS, counters))
+        models_stats[model_id] = model_stats
+        for key in totals:
+            totals[key] += model_stats[key]
+
+    totals["total_tokens"] = totals["input_tokens"] + totals["output_tokens"]
+    totals["models"] = models_stats
+    return totals
+
+
+def get_today_stats():
+    """Получение статистики за сегодня."""
+    today = date.today().isoformat()
+
+    with transaction() as cursor:
+        cursor.execute(
+            f"SELECT model_id, {USAGE_COLUMNS_SQL} FROM usage_stats WHERE date = ?",
+            (today,),
+        )
+        rows = cursor.fetchall()
+
+    return {"date": today, **_usage_summary(rows)}
+
+
+def get_all_time_stats():
+    """Получение статистики за все время из сводной таблицы usage_totals."""
+    with transaction() as cursor:
+        cursor.execute(f"SELECT model_id, {USAGE_COLUMNS_SQL} FROM usage_totals")
+        rows = cursor.fetchall()
+
+    return _usage_summary(rows)
+
+
+def _month_bounds(start, end):
+    """Первый и последний полные месяцы внутри [start, end] или None."""
+    first = start
+    if start.day != 1:
+        first = (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    last = end
+    if (end + timedelta(days=1)).day != 1:
+        last = end.replace(day=1) - timedelta(days=1)
+    if first > last:
+        return None
+    return first, last
+
+
+def get_usage_range(start, end):
+    """Статистика за даты с start по end включительно с разбивкой по моделям.
+
+    start и end - date или строки YYYY-MM-DD. Полные месяцы диапазона
+    читаются из usage_monthly, остальные дни - из usage_stats по индексу даты.
+    """
+    if isinstance(start, str):
+        start = date.fromisoformat(start)
+    if isinstance(end, str):
+        end = date.fromisoformat(end)
+
+    # (таблица, колонка, от, до): пустой диапазон '1'..'0' ничего не выбирает
+    months = _month_bounds(start, end)
+    if months:
+        first, last = months
+        parts = [
+            ("usage_stats", "date", start, first - timedelta(days=1)),
+            ("usage_monthly", "month", first.isoformat()[:7], last.isoformat()[:7]),
+            ("usage_stats", "date", last + timedelta(days=1), end),
+        ]
     else:
+        parts = [("usage_stats", "date", start, end)]
+
+    queries = []
+    params = []
+    for table, column, low, high in parts:
+        queries.append(
+            f"SELECT model_id, {USAGE_COLUMNS_SQL} FROM {table} WHERE {column} BETWEEN ? AND ?"
+        )
+        params.extend(str(value) for value in (low, high))
+
+    with transaction() as cursor:
+        cursor.execute(
+            f"""
+            SELECT model_id, {USAGE_SUMS_SQL}
+            FROM ({" UNION ALL ".join(queries)})
+            GROUP BY model_id
+            """,
+            params,
+        )
+        rows = cursor.fetchall()
+
+    return {"start": start.isoformat(), "end": end.isoformat(), **_usage_summary(rows)}
+
+
+def create_conversation(model_id, title=None):
+    """Создание сохраненного чата. Возвращает его ID."""
+    now = datetime.now().isoformat(timespec="seconds")
+
+    with transaction() as cursor:
+        cursor.execute(
+            """
+            INSERT INTO conversations (title, model_id, created_at, updated_at)
+            VALUES (?, ?, ?, ?)
+            """,
+            (title, model_id, now, now),
+        )
+        return cursor.lastrowid
+
+
+def append_messages(conversation_id, messages, model_id=None):
+    """Дозапись сообщений в конец сохраненного чата одной транзакцией."""
+    now = datetime.now().isoformat(timespec="seconds")
+
+    with transaction() as cursor:
         cursor.execute(
+            "SELECT message_count, title FROM conversations WHERE id = ?",
+            (conversation_id,),
+        )
+        position, title = cursor.fetchone()
+
+        rows = []
+        for message in messages:
+            content = message.get("content") or ""
+            if title is None and message.get("role") == "user":
+                # Заголовок чата - начало первого вопроса пользователя
+                title = " ".join(content.split())[:80]
+            rows.append((conversation_id, position, message["role"], content, now))
+            position += 1
+
+        cursor.executemany(
             """
-            INSERT INTO usage_stats (date, model_id, requests, input_tokens, output_tokens)
+            INSERT INTO messages (conversation_id, position, role, content, created_at)
             VALUES (?, ?, ?, ?, ?)
             """,
-            (today, model_id, 1, input_tokens, output_tokens),
+            rows,
+        )
+        cursor.execute(
+            """
+            UPDATE conversations
+            SET message_count = ?, title = ?, updated_at = ?,
+                model_id = COALESCE(?, model_id)
+            WHERE id = ?
+            """,
+            (position, title, now, model_id, conversation_id),
         )
 
-    conn.commit()
-    conn.close()
 
+def list_conversations(limit=20, before=None):
+    """Страница сохраненных чатов, от последних к старым.
 
-def get_today_stats():
-    """Получение статистики за сегодня."""
-    today = date.today().isoformat()
+    before - ключ (updated_at, id) последнего чата предыдущей страницы.
+    Пагинация по ключу использует индекс и не зависит от номера страницы.
+    """
+    with transaction() as cursor:
+        if before is None:
+            cursor.execute(
+                """
+                SELECT id, title, model_id, updated_at, message_count
+                FROM conversations
+                ORDER BY updated_at DESC, id DESC
+                LIMIT ?
+                """,
+                (limit,),
+            )
+        else:
+            cursor.execute(
+                """
+                SELECT id, title, model_id, updated_at, message_count
+                FROM conversations
+                WHERE (updated_at, id) < (?, ?)
+                ORDER BY updated_at DESC, id DESC
+                LIMIT ?
+                """,
+                (before[0], before[1], limit),
+            )
+        rows = cursor.fetchall()
 
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    return [
+        {
+            "id": conversation_id,
+            "title": title or "(untitled)",
+            "model_id": model_id,
+            "updated_at": updated_at,
+            "message_count": message_count,
+        }
+        for conversation_id, title, model_id, updated_at, message_count in rows
+    ]
 
-    cursor.execute(
-        """
-        SELECT 
-            COALESCE(SUM(requests), 0) as total_requests,
-            COALESCE(SUM(input_tokens), 0) as total_input_tokens,
-            COALESCE(SUM(output_tokens), 0) as total_output_tokens
-        FROM usage_stats
-        WHERE date = ?
-        """,
-        (today,),
-    )
-    result = cursor.fetchone()
-    total_requests, total_input_tokens, total_output_tokens = result
 
-    cursor.execute(
-        """
-        SELECT model_id, requests, input_tokens, output_tokens
-        FROM usage_stats
-        WHERE date = ?
-        """,
-        (today,),
+def get_conversation_messages(conversation_id):
+    """Сообщения сохраненного чата в исходном порядке."""
+    with transaction() as cursor:
+        cursor.execute(
+            """
+            SELECT role, content FROM messages
+            WHERE conversation_id = ?
+            ORDER BY position
+            """,
+            (conversation_id,),
+        )
+        rows = cursor.fetchall()
+
+    return [{"role": role, "content": content} for role, content in rows]
+
+
+def iter_conversations(since=None, until=None, model_id=None):
+    """Потоковое чтение сохраненных чатов с сообщениями, по одному чату за раз.
+
+    since/until - даты последнего изменения чата (включительно), model_id -
+    модель чата. Чтение идет через отдельное соединение только для чтения:
+    в режиме WAL оно видит согласованный снимок и не держит общую блокировку
+    между итерациями.
+    """
+    conditions, params = [], []
+    if since is not None:
+        conditions.append("c.updated_at >= ?")
+        params.append(since.isoformat())
+    if until is not None:
+        conditions.append("c.updated_at < ?")
+        params.append((until + timedelta(days=1)).isoformat())
+    if model_id is not None:
+        conditions.append("c.model_id = ?")
+        params.append(model_id)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    get_connection()
+    conn = sqlite3.connect(
+        f"file:{DB_PATH}?mode=ro", uri=True, timeout=BUSY_TIMEOUT_MS / 1000
     )
-    models_results = cursor.fetchall()
+    try:
+        rows = conn.execute(
+            f"""
+            SELECT c.id, c.title, c.model_id, c.created_at, c.updated_at,
+                   m.role, m.content, m.created_at
+            FROM conversations c
+            JOIN messages m ON m.conversation_id = c.id
+            {where}
+            ORDER BY c.id, m.position
+            """,
+            params,
+        )
+        conversation = None
+        for conversation_id, title, model, created_at, updated_at, *message in rows:
+            if conversation is None or conversation["id"] != conversation_id:
+                if conversation is not None:
+                    yield conversation
+                conversation = {
+                    "id": conversation_id,
+                    "title": title,
+                    "model_id": model,
+                    "created_at": created_at,
+                    "updated_at": updated_at,
+                    "messages": [],
+                }
+            role, content, message_created_at = message
+            conversation["messages"].append(
+                {"role": role, "content": content, "created_at": message_created_at}
+            )
+        if conversation is not None:
+            yield conversation
+    finally:
+        conn.close()
 
-    models_stats = {}
-    for model_id, requests, input_tokens, output_tokens in models_results:
-        models_stats[model_id] = {
-            "requests": requests,
-            "input_tokens": input_tokens,
-            "output_tokens": output_tokens,
+
+def _fts_query(query):
+    """Преобразование пользовательского запроса в безопасный запрос FTS5.
+
+    Каждое слово берется в кавычки (точки, дефисы и прочее не ломают
+    синтаксис), последнее слово ищется по префиксу.
+    """
+    terms = ['"' + term.replace('"', '""') + '"' for term in query.split()]
+    if terms:
+        terms[-1] += "*"
+    return " ".join(terms)
+
+
+def search_messages(query, limit=20):
+    """Полнотекстовый поиск по сообщениям, результаты по релевантности."""
+    match = _fts_query(query)
+    if not match:
+        return []
+
+    with transaction() as cursor:
+        cursor.execute(
+            """
+            SELECT m.conversation_id, c.title, m.role, c.updated_at, f.snippet
+            FROM (
+                SELECT rowid, rank,
+                       snippet(messages_fts, 0, '[', ']', '...', 12) AS snippet
+                FROM messages_fts
+                WHERE messages_fts MATCH ?
+                ORDER BY rank
+                LIMIT ?
+            ) f
+            JOIN messages m ON m.id = f.rowid
+            JOIN conversations c ON c.id = m.conversation_id
+            ORDER BY f.rank
+            """,
+            (match, limit),
+        )
+        rows = cursor.fetchall()
+
+    return [
+        {
+            "conversation_id": conversation_id,
+            "title": title or "(untitled)",
+            "role": role,
+            "updated_at": updated_at,
+            "snippet": " ".join(snippet.split()),
         }
+        for conversation_id, title, role, updated_at, snippet in rows
+    ]
+
 
-    conn.close()
+CACHE_LOOKUP_SQL = """
+    INSERT INTO response_cache_stats (date, hits, misses, tokens_saved)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT(date) DO UPDATE SET
+        hits = hits + excluded.hits,
+        misses = misses + excluded.misses,
+        tokens_saved = tokens_saved + excluded.tokens_saved
+"""
+
+
+def get_cached_response(key, ttl):
+    """Поиск ответа в кэше. Устаревшая запись удаляется и считается промахом.
+
+    Возвращает словарь с answer, input_tokens, output_tokens или None.
+    Попадание и промах учитываются в response_cache_stats.
+    """
+    now = time.time()
+    today = date.today().isoformat()
+
+    with transaction() as cursor:
+        cursor.execute(
+            """
+            SELECT answer, input_tokens, output_tokens, created_at
+            FROM response_cache WHERE key = ?
+            """,
+            (key,),
+        )
+        row = cursor.fetchone()
+
+        if row and now - row[3] > ttl:
+            cursor.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+            row = None
+
+        if row is None:
+            cursor.execute(CACHE_LOOKUP_SQL, (today, 0, 1, 0))
+            return None
+
+        answer, input_tokens, output_tokens, _ = row
+        cursor.execute(
+            "UPDATE response_cache SET last_used = ?, hits = hits + 1 WHERE key = ?",
+            (now, key),
+        )
+        cursor.execute(CACHE_LOOKUP_SQL, (today, 1, 0, input_tokens + output_tokens))
 
     return {
-        "date": today,
-        "requests": total_requests,
-        "input_tokens": total_input_tokens,
-        "output_tokens": total_output_tokens,
-        "total_tokens": total_input_tokens + total_output_tokens,
-        "models": models_stats,
+        "answer": answer,
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
     }
 
 
-def get_all_time_stats():
-    """Получение статистики за все время."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+def store_cached_response(
+    key, model_id, answer, input_tokens, output_tokens, ttl, max_bytes
+):
+    """Сохранение ответа в кэш с вытеснением устаревших и давно не используемых записей.
 
-    cursor.execute(
-        """
-        SELECT 
-            COALESCE(SUM(requests), 0) as total_requests,
-            COALESCE(SUM(input_tokens), 0) as total_input_tokens,
-            COALESCE(SUM(output_tokens), 0) as total_output_tokens
-        FROM usage_stats
-        """
-    )
-    result = cursor.fetchone()
-    total_requests, total_input_tokens, total_output_tokens = result
+    max_bytes - предел суммарного размера ответов в кэше (UTF-8).
+    """
+    now = time.time()
+    size = len(answer.encode("utf-8"))
 
-    cursor.execute(
-        """
-        SELECT model_id, 
-               SUM(requests) as total_requests,
-               SUM(input_tokens) as total_input_tokens,
-               SUM(output_tokens) as total_output_tokens
-        FROM usage_stats
-        GROUP BY model_id
-        """
-    )
-    models_results = cursor.fetchall()
+    with transaction() as cursor:
+        cursor.execute(
+            """
+            INSERT OR REPLACE INTO response_cache
+                (key, model_id, answer, input_tokens, output_tokens, created_at, last_used, size)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (key, model_id, answer, input_tokens, output_tokens, now, now, size),
+        )
+        # Записи, не использованные дольше TTL, гарантированно устарели
+        cursor.execute("DELETE FROM response_cache WHERE last_used < ?", (now - ttl,))
+        # LRU: удаляются записи, которые не помещаются в лимит вслед за более
+        # свежими. Накопленный размер считается по индексу (last_used, key, size)
+        cursor.execute(
+            """
+            DELETE FROM response_cache WHERE key IN (
+                SELECT key FROM (
+                    SELECT key, SUM(size) OVER (ORDER BY last_used DESC, key DESC) AS kept
+                    FROM response_cache
+                )
+                WHERE kept > ?
+            )
+            """,
+            (max_bytes,),
+        )
 
-    models_stats = {}
-    for model_id, requests, input_tokens, output_tokens in models_results:
-        models_stats[model_id] = {
-            "requests": requests,
-            "input_tokens": input_tokens,
-            "output_tokens": output_tokens,
-        }
 
-    conn.close()
+def get_response_cache_stats():
+    """Статистика кэша ответов за сегодня и за все время."""
+    today = date.today().isoformat()
+
+    with transaction() as cursor:
+        cursor.execute(
+            """
+            SELECT COALESCE(SUM(hits), 0), COALESCE(SUM(misses), 0),
+                   COALESCE(SUM(tokens_saved), 0)
+            FROM response_cache_stats
+            """
+        )
+        hits, misses, tokens_saved = cursor.fetchone()
+        cursor.execute(
+            "SELECT hits, misses, tokens_saved FROM response_cache_stats WHERE date = ?",
+            (today,),
+        )
+        today_row = cursor.fetchone() or (0, 0, 0)
+        cursor.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM response_cache")
+        entries, size = cursor.fetchone()
 
     return {
-        "requests": total_requests,
-        "input_tokens": total_input_tokens,
-        "output_tokens": total_output_tokens,
-        "total_tokens": total_input_tokens + total_output_tokens,
-        "models": models_stats,
+        "entries": entries,
+        "size": size,
+        "today": _cache_summary(*today_row),
+        "all_time": _cache_summary(hits, misses, tokens_saved),
     }
 
 
-def get_settings():
-    """Получение настроек из базы данных."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+def _cache_summary(hits, misses, tokens_saved):
+    """Сводка по попаданиям в кэш."""
+    lookups = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": hits / lookups if lookups else 0.0,
+        "tokens_saved": tokens_saved,
+    }
+
 
+def _load_settings(cursor):
+    """Чтение строки настроек из базы данных."""
     cursor.execute("SELECT api_key, endpoint, model FROM settings WHERE id = 1")
     result = cursor.fetchone()
 
-    conn.close()
-
     if result:
         api_key, endpoint, model = result
         return {"api_key": api_key, "endpoint": endpoint, "model": model}
@@ -211,34 +871,70 @@ def get_settings():
     }
 
 
+def get_settings():
+    """Получение настроек из снимка в памяти.
+
+    PRAGMA data_version меняется только при коммитах других соединений,
+    поэтому строка настроек перечитывается, лишь когда базу изменил
+    другой экземпляр CLI.
+    """
+    global _settings_snapshot, _settings_version
+
+    with transaction() as cursor:
+        version = cursor.execute("PRAGMA data_version").fetchone()[0]
+        if _settings_snapshot is None or version != _settings_version:
+            _settings_snapshot = _load_settings(cursor)
+            _settings_version = version
+
+        return dict(_settings_snapshot)
+
+
 def update_settings(api_key, endpoint, model):
     """Обновление настроек в базе данных."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    global _settings_snapshot
 
-    # Проверяем, существуют ли уже настройки
-    cursor.execute("SELECT COUNT(*) FROM settings WHERE id = 1")
-    count = cursor.fetchone()[0]
+    with transaction() as cursor:
+        cursor.execute(UPSERT_SETTINGS_SQL, (api_key, endpoint, model))
+        # Запись сквозная: снимок обновляется сразу, без повторного чтения
+        _settings_snapshot = {"api_key": api_key, "endpoint": endpoint, "model": model}
 
-    if count > 0:
-        # Обновляем существующие настройки
-        cursor.execute(
-            "UPDATE settings SET api_key = ?, endpoint = ?, model = ? WHERE id = 1",
-            (api_key, endpoint, model),
-        )
-    else:
-        # Вставляем новые настройки
-        cursor.execute(
-            "INSERT INTO settings (id, api_key, endpoint, model) VALUES (1, ?, ?, ?)",
-            (api_key, endpoint, model),
-        )
-
-    conn.commit()
-    conn.close()
+    for listener in _settings_listeners:
+        listener(api_key, endpoint, model)
 
     return True
 
 
+def get_transport_settings():
+    """Настройки HTTP-транспорта из снимка в памяти или None, если они не сохранялись.
+
+    Как и get_settings, строка перечитывается только после изменения
+    базы другим экземпляром CLI.
+    """
+    global _transport_snapshot, _transport_version
+
+    with transaction() as cursor:
+        version = cursor.execute("PRAGMA data_version").fetchone()[0]
+        if _transport_version is None or version != _transport_version:
+            cursor.execute(
+                f"SELECT {', '.join(TRANSPORT_FIELDS)} FROM transport_settings WHERE id = 1"
+            )
+            row = cursor.fetchone()
+            _transport_snapshot = dict(zip(TRANSPORT_FIELDS, row)) if row else None
+            _transport_version = version
+
+        return dict(_transport_snapshot) if _transport_snapshot else None
+
+
+def update_transport_settings(settings):
+    """Сохранение настроек HTTP-транспорта (словарь со всеми TRANSPORT_FIELDS)."""
+    global _transport_snapshot
+
+    row = tuple(settings[field] for field in TRANSPORT_FIELDS)
+    with transaction() as cursor:
+        cursor.execute(UPSERT_TRANSPORT_SQL, row)
+        _transport_snapshot = dict(zip(TRANSPORT_FIELDS, row))
+
+
 def get_api_key():
     """Получение API ключа из базы данных."""
     settings = get_settings()
@@ -257,10 +953,9 @@ def get_model():
     return settings.get("model", "meta-llama/Llama-3.2-90B-Vision-Instruct")
 
 
-def migrate_settings_from_json():
-    """Миграция настроек из JSON файла в базу данных."""
+def _read_legacy_settings():
+    """Чтение настроек из config/settings.json и config/.env (старый формат)."""
     import json
-    from dotenv import load_dotenv
 
     # Путь к файлу настроек
     settings_path = os.path.join(
@@ -277,8 +972,10 @@ def migrate_settings_from_json():
     endpoint = "https://api.intelligence.io.solutions/api/v1/"
     model = "meta-llama/Llama-3.2-90B-Vision-Instruct"
 
-    # Пытаемся загрузить API ключ из .env
+    # Пытаемся загрузить API ключ из .env (dotenv нужен только если файл есть)
     if os.path.exists(env_path):
+        from dotenv import load_dotenv
+
         load_dotenv(env_path)
         api_key = os.getenv("IOINTELLIGENCE_API_KEY", "")
 
@@ -291,7 +988,210 @@ def migrate_settings_from_json():
         except (json.JSONDecodeError, IOError):
             pass
 
-    # Обновляем настройки в базе данных
-    update_settings(api_key, endpoint, model)
+    return api_key, endpoint, model
+
+
+def migrate_settings_from_json():
+    """Миграция настроек из JSON файла в базу данных."""
+    update_settings(*_read_legacy_settings())
 
     return True
+
+
+def _import_legacy_settings(cursor):
+    """Миграция 2: перенос настроек из JSON/.env, если в базе их еще нет."""
+    cursor.execute("SELECT 1 FROM settings WHERE id = 1")
+    if cursor.fetchone() is None:
+        cursor.execute(UPSERT_SETTINGS_SQL, _read_legacy_settings())
+
+
+def _add_routing_counters(cursor):
+    """Миграция 3: счетчики дублирующих запросов и запасных моделей в usage_stats."""
+    for column in ROUTING_COUNTERS:
+        cursor.execute(f"ALTER TABLE usage_stats ADD COLUMN {column} INTEGER DEFAULT 0")
+
+
+def _create_request_log(cursor):
+    """Миграция 4: журнал запросов к API для перцентилей задержки."""
+    cursor.execute(
+        """
+    CREATE TABLE IF NOT EXISTS request_log (
+        id INTEGER PRIMARY KEY,
+        timestamp REAL NOT NULL,
+        model_id TEXT NOT NULL,
+        endpoint TEXT,
+        input_tokens INTEGER DEFAULT 0,
+        output_tokens INTEGER DEFAULT 0,
+        latency_ms REAL NOT NULL,
+        ttft_ms REAL,
+        retries INTEGER DEFAULT 0,
+        cache_hit INTEGER DEFAULT 0,
+        error TEXT
+    )
+    """
+    )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_request_log_timestamp ON request_log(timestamp)"
+    )
+
+
+def _create_rollup_triggers(cursor, columns):
+    """Триггеры usage_stats, прибавляющие изменения columns к сводным таблицам."""
+    names = ", ".join(columns)
+
+    # Прибавка к сводным счетчикам для каждого события: строка-источник ключа и значения
+    deltas = {
+        "insert": ("NEW", ", ".join(f"NEW.{column}" for column in columns)),
+        "update": ("NEW", ", ".join(f"NEW.{column} - OLD.{column}" for column in columns)),
+        "delete": ("OLD", ", ".join(f"-OLD.{column}" for column in columns)),
+    }
+    updates = ", ".join(f"{column} = {column} + excluded.{column}" for column in columns)
+
+    for event, (row, values) in deltas.items():
+        cursor.execute(
+            f"""
+        CREATE TRIGGER IF NOT EXISTS usage_stats_rollup_{event}
+        AFTER {event.upper()} ON usage_stats BEGIN
+            INSERT INTO usage_totals (model_id, {names})
+            VALUES ({row}.model_id, {values})
+            ON CONFLICT(model_id) DO UPDATE SET {updates};
+            INSERT INTO usage_monthly (month, model_id, {names})
+            VALUES (substr({row}.date, 1, 7), {row}.model_id, {values})
+            ON CONFLICT(month, model_id) DO UPDATE SET {updates};
+        END
+        """
+        )
+
+
+def _create_usage_rollups(cursor):
+    """Миграция 5: сводные таблицы статистики и индекс по дате.
+
+    usage_totals (за все время) и usage_monthly (по месяцам) поддерживаются
+    триггерами на usage_stats, поэтому status не сканирует всю историю.
+    """
+    columns = (
+        "requests",
+        "input_tokens",
+        "output_tokens",
+        "hedged",
+        "hedge_wins",
+        "fallbacks",
+        "failures",
+    )
+    definitions = ", ".join(f"{column} INTEGER DEFAULT 0" for column in columns)
+    names = ", ".join(columns)
+
+    cursor.execute(
+        f"CREATE TABLE IF NOT EXISTS usage_totals (model_id TEXT PRIMARY KEY, {definitions})"
+    )
+    cursor.execute(
+        f"""
+    CREATE TABLE IF NOT EXISTS usage_monthly (
+        month TEXT NOT NULL,
+        model_id TEXT NOT NULL,
+        {definitions},
+        PRIMARY KEY (month, model_id)
+    )
+    """
+    )
+    # Покрывающий индекс: выборка диапазона дат не читает саму таблицу
+    cursor.execute(
+        f"CREATE INDEX IF NOT EXISTS idx_usage_stats_date ON usage_stats(date, model_id, {names})"
+    )
+
+    _create_rollup_triggers(cursor, columns)
+
+    # Сводные итоги по уже накопленной статистике
+    cursor.execute(
+        f"""
+        INSERT INTO usage_totals (model_id, {names})
+        SELECT model_id, {", ".join(f"SUM({column})" for column in columns)}
+        FROM usage_stats GROUP BY model_id
+        """
+    )
+    cursor.execute(
+        f"""
+        INSERT INTO usage_monthly (month, model_id, {names})
+        SELECT substr(date, 1, 7), model_id, {", ".join(f"SUM({column})" for column in columns)}
+        FROM usage_stats GROUP BY substr(date, 1, 7), model_id
+        """
+    )
+
+
+def _add_cached_tokens(cursor):
+    """Миграция 6: входные токены из кэша префиксов провайдера (cached_tokens).
+
+    Колонка добавляется в usage_stats, сводные таблицы и журнал запросов;
+    триггеры сводных таблиц и покрывающий индекс пересоздаются с ней.
+    """
+    for table in ("usage_stats", "usage_totals", "usage_monthly", "request_log"):
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN cached_tokens INTEGER DEFAULT 0")
+
+    columns = (
+        "requests",
+        "input_tokens",
+        "output_tokens",
+        "hedged",
+        "hedge_wins",
+        "fallbacks",
+        "failures",
+        "cached_tokens",
+    )
+    for event in ("insert", "update", "delete"):
+        cursor.execute(f"DROP TRIGGER IF EXISTS usage_stats_rollup_{event}")
+    _create_rollup_triggers(cursor, columns)
+
+    cursor.execute("DROP INDEX IF EXISTS idx_usage_stats_date")
+    cursor.execute(
+        f"CREATE INDEX idx_usage_stats_date ON usage_stats(date, model_id, {', '.join(columns)})"
+    )
+
+
+def _create_transport_settings(cursor):
+    """Миграция 7: настройки HTTP-транспорта рядом с таблицей settings.
+
+    Пока строки нет, действуют значения по умолчанию из config.
+    """
+    cursor.execute(
+        """
+    CREATE TABLE IF NOT EXISTS transport_settings (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        http2 INTEGER NOT NULL,
+        max_connections INTEGER NOT NULL,
+        max_keepalive_connections INTEGER NOT NULL,
+        keepalive_expiry REAL NOT NULL,
+        connect_timeout REAL NOT NULL,
+        read_timeout REAL NOT NULL,
+        total_timeout REAL NOT NULL,
+        proxy TEXT NOT NULL DEFAULT ''
+    )
+    """
+    )
+
+
+def _add_response_cache_size(cursor):
+    """Миграция 8: размер ответа в response_cache для лимита кэша в байтах.
+
+    Индекс по last_used заменяется покрывающим (last_used, key, size), по
+    которому считается накопленный размер при вытеснении.
+    """
+    cursor.execute("ALTER TABLE response_cache ADD COLUMN size INTEGER NOT NULL DEFAULT 0")
+    cursor.execute("UPDATE response_cache SET size = length(CAST(answer AS BLOB))")
+    cursor.execute("DROP INDEX IF EXISTS idx_response_cache_last_used")
+    cursor.execute(
+        "CREATE INDEX idx_response_cache_lru ON response_cache(last_used, key, size)"
+    )
+
+
+# Миграции схемы по порядку; номер последней примененной хранится в user_version
+MIGRATIONS = [
+    _create_schema,
+    _import_legacy_settings,
+    _add_routing_counters,
+    _create_request_log,
+    _create_usage_rollups,
+    _add_cached_tokens,
+    _create_transport_settings,
+    _add_response_cache_size,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
@@ -1,53 +1,244 @@
 """
 Модуль для экспорта чатов в различные форматы.
+
+Сообщения записываются в файл по одному, поэтому messages может быть
+любым итерируемым объектом, в том числе генератором строк из базы.
+Экспорт пишется во временный файл рядом с целевым и переименовывается
+только после успешной записи: при сбое не остается полузаписанного файла.
 """
 
-import os
+import io
 import json
+import os
+import tempfile
+from contextlib import contextmanager
 from datetime import datetime
 
+# Расширения файлов по форматам экспорта
+EXPORT_FORMATS = {"json": "json", "jsonl": "jsonl", "txt": "txt", "md": "md"}
 
-def export_to_json(messages, filename=None):
-    """Экспорт чата в формат JSON."""
-    if not filename:
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"chat_export_{timestamp}.json"
+# Расширения файлов по видам сжатия
+COMPRESSIONS = {"gz": ".gz", "zst": ".zst"}
 
-    chat_data = {
-        "export_date": datetime.now().isoformat(),
-        "messages": messages,
-        "message_count": len(messages)
-    }
+# Типы значений, которые json.dumps пишет одной строкой
+SCALAR_TYPES = (str, int, float, bool, type(None))
 
-    with open(filename, "w", encoding="utf-8") as f:
-        json.dump(chat_data, f, indent=2, ensure_ascii=False)
+# Метки ролей в текстовом экспорте
+TXT_ROLE_LABELS = {
+    "system": "[СИСТЕМА]",
+    "user": "[ПОЛЬЗОВАТЕЛЬ]",
+    "assistant": "[АССИСТЕНТ]",
+}
 
-    return os.path.abspath(filename)
+# Заголовки ролей в экспорте Markdown
+MD_ROLE_TITLES = {"system": "System", "user": "User", "assistant": "Assistant"}
 
 
-def export_to_txt(messages, filename=None):
-    """Экспорт чата в формат TXT."""
+def export_filename(format_type, compression=None, filename=None):
+    """Имя файла экспорта: по умолчанию chat_export_<время>.<формат>[.gz|.zst]."""
     if not filename:
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"chat_export_{timestamp}.txt"
+        filename = f"chat_export_{timestamp}.{EXPORT_FORMATS[format_type]}"
+    suffix = COMPRESSIONS[compression] if compression else ""
+    if suffix and not filename.endswith(suffix):
+        filename += suffix
+    return filename
+
+
+def _compressed_stream(raw, compression):
+    """Двоичный поток поверх raw со сжатием или None без сжатия."""
+    if compression == "gz":
+        import gzip
+
+        return gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6)
+    if compression == "zst":
+        try:
+            import zstandard
+        except ImportError as e:
+            raise ValueError("zst compression requires the 'zstandard' package") from e
+        return zstandard.ZstdCompressor().stream_writer(raw, closefd=False)
+    return None
+
+
+def _default_mode():
+    """Права нового файла, как у open(): 0o666 с учетом umask процесса."""
+    # umask можно только прочитать вместе с установкой, поэтому он сразу возвращается
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+@contextmanager
+def atomic_file(filename):
+    """Двоичный файл для записи, который появляется под именем filename только целиком."""
+    directory = os.path.dirname(os.path.abspath(filename))
+    fd, tmp_path = tempfile.mkstemp(
+        prefix=f".{os.path.basename(filename)}.", suffix=".tmp", dir=directory
+    )
+    try:
+        with os.fdopen(fd, "wb") as raw:
+            yield raw
+            raw.flush()
+            os.fsync(raw.fileno())
+        # mkstemp создает файл с правами 0600, а экспорт должен получить обычные
+        os.chmod(tmp_path, _default_mode())
+        os.replace(tmp_path, filename)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+@contextmanager
+def text_writer(raw, compression=None):
+    """Текстовый поток UTF-8 поверх двоичного raw с необязательным сжатием.
+
+    При выходе raw остается открытым; закрытие потока сжатия дописывает его хвост.
+    """
+    if compression and compression not in COMPRESSIONS:
+        raise ValueError(f"Unknown compression: {compression}")
+
+    compressed = _compressed_stream(raw, compression)
+    stream = io.TextIOWrapper(compressed or raw, encoding="utf-8")
+    try:
+        yield stream
+    finally:
+        stream.flush()
+        stream.detach()
+        if compressed is not None:
+            compressed.close()
+
+
+@contextmanager
+def atomic_writer(filename, compression=None):
+    """Текстовый файл для записи, который появляется под именем filename только целиком."""
+    if compression and compression not in COMPRESSIONS:
+        raise ValueError(f"Unknown compression: {compression}")
+
+    with atomic_file(filename) as raw, text_writer(raw, compression) as stream:
+        yield stream
+
+
+def _json_message(message):
+    """Сообщение в JSON с отступами, как в json.dump(indent=2) внутри списка messages.
+
+    Плоские сообщения собираются из json.dumps отдельных значений: кодировщик
+    на C быстрее, чем json.dumps(indent=2), который работает на Python.
+    """
+    if not message or not all(isinstance(value, SCALAR_TYPES) for value in message.values()):
+        return json.dumps(message, indent=2, ensure_ascii=False).replace("\n", "\n    ")
+    fields = ",\n      ".join(
+        f"{json.dumps(str(key), ensure_ascii=False)}: {json.dumps(value, ensure_ascii=False)}"
+        for key, value in message.items()
+    )
+    return f"{{\n      {fields}\n    }}"
+
 
-    chat_text = f"Экспорт чата от {datetime.now().strftime('%d.%m.%Y %H:%M:%S')}\n"
-    chat_text += "=" * 50 + "\n\n"
+def _write_json(f, messages):
+    """Запись чата в JSON по одному сообщению, в том же виде, что json.dump(indent=2)."""
+    f.write("{\n")
+    f.write(f'  "export_date": {json.dumps(datetime.now().isoformat())},\n')
+    f.write('  "messages": [')
+    count = 0
     for message in messages:
+        f.write(f"{',' if count else ''}\n    {_json_message(message)}")
+        count += 1
+    f.write("\n  ],\n" if count else "],\n")
+    f.write(f'  "message_count": {count}\n')
+    f.write("}")
+    return count
+
+
+def _write_jsonl(f, messages):
+    """Запись чата в JSONL: одно сообщение на строку."""
+    count = 0
+    for message in messages:
+        f.write(json.dumps(message, ensure_ascii=False))
+        f.write("\n")
+        count += 1
+    return count
+
+
+def _write_txt(f, messages):
+    """Запись чата в текстовом виде."""
+    f.write(f"Экспорт чата от {datetime.now().strftime('%d.%m.%Y %H:%M:%S')}\n")
+    f.write("=" * 50 + "\n\n")
+    count = 0
+    for message in messages:
+        count += 1
+        label = TXT_ROLE_LABELS.get(message.get("role", "unknown"))
+        if label:
+            f.write(f"{label}: {message.get('content', '')}\n\n")
+    f.write("=" * 50 + "\n")
+    f.write(f"Всего сообщений: {count}\n")
+    return count
+
+
+def _write_markdown(f, messages):
+    """Запись чата в Markdown: раздел на каждое сообщение."""
+    f.write(f"# Chat export {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+    count = 0
+    for message in messages:
+        count += 1
         role = message.get("role", "unknown")
-        content = message.get("content", "")
+        title = MD_ROLE_TITLES.get(role, role.capitalize())
+        f.write(f"\n## {title}\n\n{message.get('content', '')}\n")
+    f.write(f"\n---\n\n*Messages: {count}*\n")
+    return count
+
+
+_WRITERS = {
+    "json": _write_json,
+    "jsonl": _write_jsonl,
+    "txt": _write_txt,
+    "md": _write_markdown,
+}
+
+
+def write_chat(f, messages, format_type):
+    """Запись чата в открытый текстовый поток. Возвращает число сообщений."""
+    if format_type not in _WRITERS:
+        raise ValueError(f"Unknown export format: {format_type}")
+    return _WRITERS[format_type](f, messages)
 
-        if role == "system":
-            chat_text += f"[СИСТЕМА]: {content}\n\n"
-        elif role == "user":
-            chat_text += f"[ПОЛЬЗОВАТЕЛЬ]: {content}\n\n"
-        elif role == "assistant":
-            chat_text += f"[АССИСТЕНТ]: {content}\n\n"
 
-    chat_text += "=" * 50 + "\n"
-    chat_text += f"Всего сообщений: {len(messages)}\n"
+def export_chat(messages, format_type, filename=None, compression=None):
+    """Экспорт чата в формат format_type (json, jsonl, txt, md) с необязательным сжатием."""
+    if format_type not in _WRITERS:
+        raise ValueError(f"Unknown export format: {format_type}")
 
-    with open(filename, "w", encoding="utf-8") as f:
-        f.write(chat_text)
+    filename = export_filename(format_type, compression, filename)
+    with atomic_writer(filename, compression) as f:
+        write_chat(f, messages, format_type)
 
     return os.path.abspath(filename)
+
+
+def export_bytes(messages, format_type, compression=None):
+    """Экспорт чата в память: содержимое файла экспорта в байтах."""
+    buffer = io.BytesIO()
+    with text_writer(buffer, compression) as f:
+        write_chat(f, messages, format_type)
+    return buffer.getvalue()
+
+
+def export_to_json(messages, filename=None, compression=None):
+    """Экспорт чата в формат JSON."""
+    return export_chat(messages, "json", filename, compression)
+
+
+def export_to_jsonl(messages, filename=None, compression=None):
+    """Экспорт чата в формат JSONL."""
+    return export_chat(messages, "jsonl", filename, compression)
+
+
+def export_to_txt(messages, filename=None, compression=None):
+    """Экспорт чата в формат TXT."""
+    return export_chat(messages, "txt", filename, compression)
+
+
+def export_to_markdown(messages, filename=None, compression=None):
+    """Экспорт чата в формат Markdown."""
+    return export_chat(messages, "md", filename, compression)
@@ -0,0 +1,118 @@
+"""
+Модуль для фонового сжатия старой истории чата в краткое содержание.
+"""
+
+import threading
+
+from config.config import (
+    SUMMARY_MODEL_ID,
+    SUMMARY_TRIGGER_TOKENS,
+    SUMMARY_KEEP_MESSAGES,
+)
+from .api_client import send_message
+from .tokens import estimate_messages_tokens
+
+SUMMARY_PROMPT = (
+    "Summarize the conversation below for your own future reference. "
+    "Keep facts, names, numbers, decisions, code identifiers and open questions; "
+    "drop pleasantries. Plain text, at most 200 words, in the conversation's language."
+)
+
+SUMMARY_PREFIX = "Summary of the earlier part of this conversation: "
+
+
+class RollingMemory:
+    """Скользящая память: старые сообщения заменяются кратким содержанием.
+
+    Краткое содержание готовится в фоновом потоке, пока пользователь
+    набирает следующее сообщение. Запрос никогда не ждет этот поток:
+    если сжатие не завершилось, отправляется предыдущее состояние.
+    """
+
+    def __init__(self):
+        """Инициализация."""
+        self.summary_message = None
+        # Индекс в messages, начиная с которого история идет дословно
+        self.covered = 1
+        self._job = None
+        self._result = None
+        self._lock = threading.Lock()
+
+    def _collect(self):
+        """Применение готового результата фонового сжатия."""
+        with self._lock:
+            result, self._result = self._result, None
+        if result:
+            self.summary_message, self.covered = result
+
+    def apply(self, messages):
+        """Сообщения для запроса: системное, краткое содержание и свежая история."""
+        self._collect()
+        if self.summary_message is None:
+            return messages
+        return messages[:1] + [self.summary_message] + messages[self.covered:]
+
+    def maybe_start(self, messages, model_id):
+        """Запуск фонового сжатия, если несжатая история превысила порог."""
+        self._collect()
+        if self._job and self._job.is_alive():
+            return False
+
+        # Дословно оставляем последние сообщения, начиная с вопроса пользователя
+        cut = len(messages) - SUMMARY_KEEP_MESSAGES
+        while cut > self.covered and messages[cut].get("role") != "user":
+            cut -= 1
+        if cut <= self.covered:
+            return False
+
+        if estimate_messages_tokens(messages[self.covered:]) < SUMMARY_TRIGGER_TOKENS:
+            return False
+
+        previous = self.summary_message["content"] if self.summary_message else None
+        chunk = list(messages[self.covered:cut])
+        self._job = threading.Thread(
+            target=self._summarize,
+            args=(previous, chunk, cut, SUMMARY_MODEL_ID or model_id),
+            daemon=True,
+        )
+        self._job.start()
+        return True
+
+    def _summarize(self, previous, chunk, cut, model_id):
+        """Фоновый запрос краткого содержания."""
+        transcript = []
+        if previous:
+            transcript.append(previous)
+        for message in chunk:
+            transcript.append(f"{message.get('role', 'unknown')}: {message.get('content', '')}")
+
+        prompt = [
+            {"role": "system", "content": SUMMARY_PROMPT},
+            {"role": "user", "content": "\n\n".join(transcript)},
+        ]
+
+        import openai
+
+        try:
+            answer, _ = send_message(prompt, model_id)
+        except (
+            openai.OpenAIError,
+            ConnectionError,
+            TimeoutError,
+            AttributeError,
+            ValueError,
+            IndexError,
+        ):
+            # Сжатие необязательно: при ошибке остается прежнее состояние
+            return
+
+        if not answer:
+            return
+
+        message = {"role": "system", "content": SUMMARY_PREFIX + answer.strip()}
+        with self._lock:
+            self._result = (message, cut)
+
+    def stats(self):
+        """Статистика скользящей памяти для команды status."""
+        return {"summarized_messages": self.covered - 1}
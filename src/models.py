@@ -4,7 +4,8 @@
 
 import os
 import json
-from config.config import get_model_id
+import threading
+from config.config import get_model_id, CACHED_INPUT_PRICE_RATIO
 from src.database import update_settings
 from colorama import Fore, Style
 
@@ -12,33 +13,167 @@ from colorama import Fore, Style
 MODELS_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "config", "models.json")
 
 
+class ModelCatalog:
+    """Каталог моделей из models.json, загруженный один раз.
+
+    Модели проиндексированы по ID и по номеру в меню. Перед обращением
+    сверяются время изменения и размер файла (один os.stat), и каталог
+    перечитывается, только если файл изменился. Снимок каталога заменяется
+    целиком, поэтому читать его можно из любых потоков.
+    """
+
+    def __init__(self, path):
+        """Инициализация."""
+        self.path = path
+        # (ключ файла, список моделей, индекс по ID, агрегатор);
+        # False - каталог еще не загружался, None - файла нет
+        self._snapshot = (False, [], {}, "unknown")
+        self._lock = threading.Lock()
+
+    def _file_key(self):
+        """Время изменения и размер файла или None, если файла нет."""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _current(self):
+        """Актуальный снимок каталога."""
+        key = self._file_key()
+        snapshot = self._snapshot
+        if snapshot[0] == key:
+            return snapshot
+
+        with self._lock:
+            if self._snapshot[0] != key:
+                self._snapshot = self._load(key)
+            return self._snapshot
+
+    def _load(self, key):
+        """Чтение models.json в новый снимок."""
+        if key is None:
+            return (key, [], {}, "unknown")
+        try:
+            with open(self.path, "r", encoding="utf-8") as models_file:
+                models_data = json.load(models_file)
+        except (json.JSONDecodeError, IOError):
+            return (key, [], {}, "unknown")
+
+        models = models_data.get("models", [])
+        by_id = {}
+        for model in models:
+            # При повторе ID действует первая запись, как при прежнем поиске по списку
+            by_id.setdefault(model.get("id"), model)
+        return (key, models, by_id, models_data.get("aggregator", "unknown"))
+
+    @property
+    def models(self):
+        """Список моделей в порядке меню. Список общий, изменять его нельзя."""
+        return self._current()[1]
+
+    @property
+    def aggregator(self):
+        """Имя агрегатора."""
+        return self._current()[3]
+
+    def get(self, model_id):
+        """Модель по ID или None."""
+        return self._current()[2].get(model_id)
+
+    def at(self, number):
+        """Модель по номеру в меню (с 1) или None."""
+        models = self._current()[1]
+        if 1 <= number <= len(models):
+            return models[number - 1]
+        return None
+
+    def __len__(self):
+        """Количество моделей."""
+        return len(self._current()[1])
+
+    def info(self, model_id):
+        """Метаданные модели: размер контекста, цены и возможности.
+
+        Цены в models.json задаются в долларах за миллион токенов:
+        "pricing": {"input": 0.5, "output": 1.5, "cached_input": 0.1}.
+        Неизвестные значения - None.
+        """
+        model = self.get(model_id) or {}
+        pricing = model.get("pricing") or {}
+        context_length = model.get("context_length")
+        return {
+            "id": model_id,
+            "name": model.get("name", model_id),
+            "context_length": int(context_length) if context_length else None,
+            "pricing": {
+                kind: pricing.get(kind) for kind in ("input", "output", "cached_input")
+            },
+            "capabilities": tuple(model.get("capabilities", ())),
+        }
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog():
+    """Общий каталог моделей (пересоздается, если изменился MODELS_PATH)."""
+    global _catalog
+
+    catalog = _catalog
+    if catalog is not None and catalog.path == MODELS_PATH:
+        return catalog
+    with _catalog_lock:
+        if _catalog is None or _catalog.path != MODELS_PATH:
+            _catalog = ModelCatalog(MODELS_PATH)
+        return _catalog
+
+
 def load_models():
     """Загрузка списка моделей из файла."""
-    try:
-        with open(MODELS_PATH, "r", encoding="utf-8") as models_file:
-            models_data = json.load(models_file)
-            return models_data.get("models", [])
-    except (json.JSONDecodeError, IOError):
-        return []
+    return get_catalog().models
 
 
 def get_aggregator():
     """Получение имени агрегатора."""
-    try:
-        with open(MODELS_PATH, "r", encoding="utf-8") as models_file:
-            models_data = json.load(models_file)
-            return models_data.get("aggregator", "unknown")
-    except (json.JSONDecodeError, IOError):
-        return "unknown"
+    return get_catalog().aggregator
 
 
 def get_model_by_id(model_id):
     """Получение модели по ID."""
-    models = load_models()
-    for model in models:
-        if model.get("id") == model_id:
-            return model
-    return None
+    return get_catalog().get(model_id)
+
+
+def get_model_by_number(number):
+    """Получение модели по номеру в меню (с 1)."""
+    return get_catalog().at(number)
+
+
+def get_model_info(model_id):
+    """Метаданные модели из каталога."""
+    return get_catalog().info(model_id)
+
+
+def estimate_cost(model_id, input_tokens, output_tokens, cached_tokens=0):
+    """Стоимость токенов в долларах по ценам из каталога: (с учетом кэша, без кэша).
+
+    None, если для модели не указаны цены.
+    """
+    pricing = get_model_info(model_id)["pricing"]
+    if pricing["input"] is None and pricing["output"] is None:
+        return None
+
+    input_price = pricing["input"] or 0
+    cached_price = pricing["cached_input"]
+    if cached_price is None:
+        cached_price = input_price * CACHED_INPUT_PRICE_RATIO
+    output_cost = output_tokens * (pricing["output"] or 0)
+    cost = (input_tokens - cached_tokens) * input_price + cached_tokens * cached_price
+    return (
+        (cost + output_cost) / 1_000_000,
+        (input_tokens * input_price + output_cost) / 1_000_000,
+    )
 
 
 def change_model(model_id):
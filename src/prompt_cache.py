@@ -0,0 +1,90 @@
+"""
+Модуль для кэша префиксов запроса на стороне провайдера.
+
+Провайдеры с кэшированием промтов читают из кэша совпадающее начало
+запроса (системный промт и прежнюю историю), если оно побайтно то же.
+Поэтому сообщения приводятся к одному виду ({"role", "content"}), а для
+моделей с полем "prompt_cache" в models.json передаются подсказки:
+    "prompt_cache": "key"            - prompt_cache_key: запросы одного чата
+                                       попадают на сервер с его кэшем
+    "prompt_cache": "cache_control"  - точки кэша (cache_control) после
+                                       системного промта и прежней истории
+"""
+
+import hashlib
+import json
+
+from config.config import PROMPT_CACHE_HINTS
+from .models import get_model_by_id
+
+# Сколько первых сообщений определяет ключ кэша чата (системный промт и первый вопрос)
+CACHE_KEY_MESSAGES = 2
+
+# Точка кэша для провайдеров с cache_control
+EPHEMERAL = {"type": "ephemeral"}
+
+
+def stable_messages(messages):
+    """Сообщения в одинаковом от хода к ходу виде: только role и content."""
+    return [
+        {"role": message["role"], "content": message.get("content") or ""} for message in messages
+    ]
+
+
+def cache_key(messages):
+    """Ключ кэша чата: хэш первых сообщений, не меняется от хода к ходу."""
+    prefix = json.dumps(
+        stable_messages(messages[:CACHE_KEY_MESSAGES]), ensure_ascii=False, sort_keys=True
+    )
+    return hashlib.sha256(prefix.encode("utf-8")).hexdigest()[:32]
+
+
+def _with_breakpoint(message):
+    """Сообщение с точкой кэша после его текста."""
+    return {
+        "role": message["role"],
+        "content": [{"type": "text", "text": message["content"], "cache_control": EPHEMERAL}],
+    }
+
+
+def prepare_request(messages, model_id):
+    """Сообщения и дополнительные параметры create() для модели.
+
+    Возвращает (messages, kwargs).
+    """
+    messages = stable_messages(messages)
+    hint = None
+    if PROMPT_CACHE_HINTS:
+        hint = (get_model_by_id(model_id) or {}).get("prompt_cache")
+
+    if hint == "key":
+        return messages, {"extra_body": {"prompt_cache_key": cache_key(messages)}}
+
+    if hint == "cache_control":
+        # Точки после системных сообщений и после последнего ответа: следующий
+        # ход читает из кэша всю историю до нового вопроса. Провайдеры
+        # ограничивают число точек, поэтому их не больше двух.
+        breakpoints = set()
+        system = [index for index, message in enumerate(messages) if message["role"] == "system"]
+        if system:
+            breakpoints.add(system[-1])
+        if len(messages) > 2:
+            breakpoints.add(len(messages) - 2)
+        messages = [
+            _with_breakpoint(message) if index in breakpoints else message
+            for index, message in enumerate(messages)
+        ]
+
+    return messages, {}
+
+
+def cached_tokens(usage):
+    """Входные токены из кэша префиксов по данным usage (0, если провайдер не сообщил)."""
+    if usage is None:
+        return 0
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = getattr(details, "cached_tokens", None) if details is not None else None
+    if cached is None:
+        # Провайдеры с полями в стиле Anthropic
+        cached = getattr(usage, "cache_read_input_tokens", None)
+    return cached or 0
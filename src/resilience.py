@@ -0,0 +1,304 @@
+"""
+Модуль для устойчивых запросов к API: повторы, таймауты и размыкатель цепи.
+
+Временные ошибки (429, 408, 409, 5xx, обрыв соединения, таймаут) повторяются
+с экспоненциальной паузой и случайным разбросом, с учетом Retry-After.
+Размыкатель цепи на каждый эндпоинт после серии отказов сразу отклоняет
+запросы, вместо того чтобы каждый раз ждать полного таймаута.
+"""
+
+import random
+import threading
+import time
+from datetime import datetime, timezone
+
+from config.config import (
+    RETRY_MAX_ATTEMPTS,
+    RETRY_BASE_DELAY,
+    RETRY_MAX_DELAY,
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_RESET_TIMEOUT,
+)
+from . import transport
+
+# Коды ответа, при которых запрос имеет смысл повторить
+RETRYABLE_STATUSES = (408, 409, 429)
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+# Счетчики за сессию для команды status
+_stats = {"retries": 0, "backoff_seconds": 0.0, "gave_up": 0, "rejected": 0}
+_stats_lock = threading.Lock()
+
+
+class CircuitOpenError(ConnectionError):
+    """Эндпоинт временно считается недоступным, запрос не выполнялся."""
+
+
+class CircuitBreaker:
+    """Размыкатель цепи для одного эндпоинта.
+
+    closed - запросы идут, отказы подряд считаются (один итог на запрос
+    вместе с его повторами, а не на каждую попытку); open - запросы сразу
+    отклоняются; half_open - по истечении паузы пропускается один пробный
+    запрос, его результат замыкает или снова размыкает цепь.
+    """
+
+    def __init__(
+        self, endpoint, threshold=CIRCUIT_FAILURE_THRESHOLD, reset_timeout=CIRCUIT_RESET_TIMEOUT
+    ):
+        """Инициализация."""
+        self.endpoint = endpoint
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Проверка перед запросом. Бросает CircuitOpenError, если цепь разомкнута."""
+        with self._lock:
+            if self.state == "closed":
+                return
+
+            remaining = self.opened_at + self.reset_timeout - time.monotonic()
+            if self.state == "open" and remaining <= 0:
+                self.state = "half_open"
+            if self.state == "half_open" and not self._trial:
+                self._trial = True
+                return
+
+        with _stats_lock:
+            _stats["rejected"] += 1
+        raise CircuitOpenError(
+            f"{self.endpoint} is unavailable after {self.failures} consecutive failures; "
+            f"next attempt in {max(remaining, 0):.0f} s"
+        )
+
+    def after_call(self, failed):
+        """Учет результата запроса. failed=None - результат ничего не говорит об эндпоинте."""
+        with self._lock:
+            trial, self._trial = self._trial, False
+            if failed is None:
+                return
+            if not failed:
+                self.state = "closed"
+                self.failures = 0
+                return
+
+            self.failures += 1
+            if trial or self.failures >= self.threshold:
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+
+def get_breaker(endpoint):
+    """Размыкатель цепи для эндпоинта."""
+    with _breakers_lock:
+        breaker = _breakers.get(endpoint)
+        if breaker is None:
+            breaker = CircuitBreaker(endpoint)
+            _breakers[endpoint] = breaker
+        return breaker
+
+
+def client_timeout(settings=None):
+    """Таймауты по фазам запроса для клиента OpenAI из настроек транспорта."""
+    return transport.timeout(settings)
+
+
+def request_deadline(settings=None):
+    """Момент (time.monotonic()), после которого повторы не начинаются, или None.
+
+    settings - снимок настроек транспорта; без него настройки читаются из базы.
+    """
+    total = settings["total_timeout"] if settings else transport.total_timeout()
+    return time.monotonic() + total if total else None
+
+
+def attempt_timeout(deadline, settings=None):
+    """Таймауты одной попытки: из настроек транспорта, но не дольше остатка срока.
+
+    Без такого ограничения попытка, начатая до срока, могла бы идти после
+    него: таймаут чтения отсчитывается для каждого фрагмента ответа заново.
+    """
+    timeout = transport.timeout(settings)
+    if deadline is None:
+        return timeout
+    remaining = max(deadline - time.monotonic(), 0.001)
+
+    def cap(value):
+        return remaining if value is None else min(value, remaining)
+
+    return transport.http_library().Timeout(
+        connect=cap(timeout.connect),
+        read=cap(timeout.read),
+        write=cap(timeout.write),
+        pool=cap(timeout.pool),
+    )
+
+
+def classify(error):
+    """Классификация ошибки: (можно ли повторить, отказ ли это эндпоинта).
+
+    Отказ эндпоинта - обрыв соединения, таймаут или 5xx. Ответы 4xx
+    означают, что эндпоинт работает; прерывание пользователем и прочие
+    ошибки не учитываются вовсе (None).
+    """
+    import openai
+
+    if isinstance(error, openai.APIConnectionError):
+        return True, True
+    if isinstance(error, openai.APIStatusError):
+        if error.status_code >= 500:
+            return True, True
+        return error.status_code in RETRYABLE_STATUSES, False
+    return False, None
+
+
+def retry_after(error):
+    """Пауза в секундах из заголовков Retry-After / retry-after-ms или None."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return max(float(value) / 1000, 0.0)
+        except ValueError:
+            pass
+
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    # Дата HTTP в Retry-After встречается редко; email.utils не замедляет запуск
+    from email.utils import parsedate_to_datetime  # pylint: disable=import-outside-toplevel
+
+    try:
+        moment = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return max((moment - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+def backoff_delay(attempt, server_delay=None):
+    """Пауза перед повтором: Retry-After или экспонента с полным разбросом.
+
+    Возвращает None, если сервер просит ждать дольше RETRY_MAX_DELAY.
+    """
+    if server_delay is not None:
+        if server_delay > RETRY_MAX_DELAY:
+            return None
+        return server_delay + random.uniform(0, RETRY_BASE_DELAY)
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+
+
+def _on_error(breaker, error, attempt, deadline=None):
+    """Учет ошибки попытки. Возвращает паузу перед повтором или None.
+
+    deadline - общий срок запроса: повтор, который начался бы позже, не выполняется.
+    Размыкатель получает один итог на запрос: ошибка учитывается в нем, только
+    когда повторов больше не будет.
+    """
+    retryable, failed = classify(error)
+    delay = None
+    if retryable and attempt < RETRY_MAX_ATTEMPTS:
+        delay = backoff_delay(attempt, retry_after(error))
+    if delay is not None and deadline is not None and time.monotonic() + delay >= deadline:
+        delay = None
+    if delay is None:
+        breaker.after_call(failed)
+    if not retryable:
+        return None
+
+    with _stats_lock:
+        if delay is None:
+            _stats["gave_up"] += 1
+        else:
+            _stats["retries"] += 1
+            _stats["backoff_seconds"] += delay
+    return delay
+
+
+def _count_retry(trace):
+    """Учет повтора в сведениях о запросе (см. api_client.new_trace)."""
+    if trace is not None:
+        trace["retries"] += 1
+
+
+def call_with_retry(func, endpoint, trace=None):
+    """Вызов func(timeout) с повторами при временных ошибках и размыкателем цепи.
+
+    timeout - таймауты попытки (httpx.Timeout), ограниченные общим сроком
+    запроса; func передает их в запрос к API. trace - необязательный словарь
+    со счетчиком "retries" этого запроса.
+    """
+    breaker = get_breaker(endpoint)
+    settings = transport.get_settings()
+    deadline = request_deadline(settings)
+    # Размыкатель проверяется один раз на запрос, повторы идут без проверки
+    breaker.before_call()
+    attempt = 0
+    while True:
+        try:
+            result = func(attempt_timeout(deadline, settings))
+        except BaseException as e:
+            delay = _on_error(breaker, e, attempt, deadline)
+            if delay is None:
+                raise
+            _count_retry(trace)
+            time.sleep(delay)
+            attempt += 1
+        else:
+            breaker.after_call(False)
+            return result
+
+
+async def call_with_retry_async(func, endpoint, trace=None, settings=None):
+    """Асинхронный вариант call_with_retry: func(timeout) возвращает корутину.
+
+    settings - снимок настроек транспорта для общего срока запроса.
+    """
+    # asyncio нужен только асинхронному движку и не замедляет запуск чата
+    import asyncio  # pylint: disable=import-outside-toplevel
+
+    breaker = get_breaker(endpoint)
+    deadline = request_deadline(settings)
+    breaker.before_call()
+    attempt = 0
+    while True:
+        try:
+            result = await func(attempt_timeout(deadline, settings))
+        except BaseException as e:
+            delay = _on_error(breaker, e, attempt, deadline)
+            if delay is None:
+                raise
+            _count_retry(trace)
+            await asyncio.sleep(delay)
+            attempt += 1
+        else:
+            breaker.after_call(False)
+            return result
+
+
+def get_stats():
+    """Статистика повторов за сессию и состояние эндпоинтов для команды status."""
+    with _stats_lock:
+        stats = dict(_stats)
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    stats["circuits"] = {
+        breaker.endpoint: breaker.state for breaker in breakers if breaker.state != "closed"
+    }
+    return stats
@@ -0,0 +1,69 @@
+"""
+Модуль для кэширования ответов модели по точному совпадению запроса.
+"""
+
+import hashlib
+import json
+
+from config.config import (
+    RESPONSE_CACHE,
+    RESPONSE_CACHE_TTL,
+    RESPONSE_CACHE_MAX_BYTES,
+)
+from .database import (
+    get_cached_response,
+    store_cached_response,
+    get_response_cache_stats,
+)
+
+
+def is_enabled():
+    """Включен ли кэш ответов."""
+    return RESPONSE_CACHE
+
+
+def _normalize_messages(messages):
+    """Сообщения без служебных полей и различий в пробелах по краям и переводах строк."""
+    return [
+        [
+            message.get("role", ""),
+            (message.get("content") or "").replace("\r\n", "\n").strip(),
+        ]
+        for message in messages
+    ]
+
+
+def make_key(model_id, endpoint, messages, params=None):
+    """Ключ кэша: SHA-256 от модели, эндпоинта, сообщений и параметров генерации."""
+    payload = json.dumps(
+        [model_id, endpoint, _normalize_messages(messages), params or {}],
+        ensure_ascii=False,
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def lookup(key):
+    """Поиск ответа в кэше. Возвращает словарь с answer и токенами или None."""
+    return get_cached_response(key, RESPONSE_CACHE_TTL)
+
+
+def store(key, model_id, answer, input_tokens, output_tokens):
+    """Сохранение ответа в кэш."""
+    if not answer:
+        return
+    store_cached_response(
+        key,
+        model_id,
+        answer,
+        input_tokens or 0,
+        output_tokens or 0,
+        RESPONSE_CACHE_TTL,
+        RESPONSE_CACHE_MAX_BYTES,
+    )
+
+
+def get_stats():
+    """Статистика кэша для команды status."""
+    return get_response_cache_stats()
@@ -0,0 +1,106 @@
+"""
+Модуль для выбора модели запроса: запасные модели и дублирующие запросы.
+
+Поля записи модели в models.json:
+    "fallback": ["model-b", "model-c"]  - цепочка запасных моделей
+    "hedge": "model-b"                  - модель для дублирующего запроса
+    "endpoint": "https://..."           - эндпоинт модели, если не из настроек
+"""
+
+from config.config import MODEL_FALLBACK, HEDGE_REQUESTS
+from .database import get_endpoint
+from .models import get_model_by_id
+from .resilience import CircuitOpenError
+from .stats import record_routing
+
+# Фрагменты текста ошибки, по которым display_error сообщает, что модель не найдена
+MODEL_NOT_FOUND_MARKERS = ("model not found", "does not support chat completions api")
+
+
+def model_endpoint(model_id, default=None):
+    """Эндпоинт модели: поле endpoint из models.json, иначе default или эндпоинт из настроек."""
+    model = get_model_by_id(model_id) or {}
+    return model.get("endpoint") or default or get_endpoint()
+
+
+def model_chain(model_id):
+    """Модель и ее запасные модели в порядке перехода."""
+    chain = [model_id]
+    if MODEL_FALLBACK:
+        model = get_model_by_id(model_id) or {}
+        for fallback in model.get("fallback", []):
+            if fallback not in chain:
+                chain.append(fallback)
+    return chain
+
+
+def hedge_model(model_id):
+    """Модель для дублирующего запроса или None, если дублирование выключено."""
+    if not HEDGE_REQUESTS:
+        return None
+    model = get_model_by_id(model_id) or {}
+    backup = model.get("hedge") or next(iter(model.get("fallback", [])), None)
+    return backup if backup != model_id else None
+
+
+def should_fall_back(error):
+    """Нужно ли переходить на запасную модель после этой ошибки."""
+    import openai
+
+    if isinstance(error, (CircuitOpenError, openai.NotFoundError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        if error.status_code >= 500:
+            return True
+        message = str(error).lower()
+        return any(marker in message for marker in MODEL_NOT_FOUND_MARKERS)
+    return False
+
+
+def can_fall_back(chain, index, error):
+    """Учет отказа модели. True - можно перейти к следующей модели цепочки."""
+    if not should_fall_back(error):
+        return False
+    record_routing(chain[index], "failures")
+    return index < len(chain) - 1
+
+
+def with_fallback(model_id, request):
+    """Вызов request(model, endpoint) по цепочке моделей до первого успеха.
+
+    Возвращает (результат, модель, которая ответила).
+    """
+    import openai
+
+    chain = model_chain(model_id)
+    for index, model in enumerate(chain):
+        try:
+            result = request(model, model_endpoint(model))
+        except (openai.APIError, CircuitOpenError) as e:
+            if not can_fall_back(chain, index, e):
+                raise
+            continue
+        if index:
+            record_routing(model, "fallbacks")
+        return result, model
+
+
+async def with_fallback_async(model_id, request, endpoint=None):
+    """Асинхронный вариант with_fallback: request(model, endpoint) - корутина.
+
+    endpoint - эндпоинт по умолчанию из снимка настроек, чтобы не читать
+    настройки из базы в цикле событий.
+    """
+    import openai
+
+    chain = model_chain(model_id)
+    for index, model in enumerate(chain):
+        try:
+            result = await request(model, model_endpoint(model, endpoint))
+        except (openai.APIError, CircuitOpenError) as e:
+            if not can_fall_back(chain, index, e):
+                raise
+            continue
+        if index:
+            record_routing(model, "fallbacks")
+        return result, model
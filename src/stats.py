@@ -2,8 +2,155 @@
 Модуль для отслеживания статистики использования токенов и запросов.
 """
 
-from .database import init_database, update_usage, get_today_stats, get_all_time_stats
+import time
+from datetime import date, datetime
 
-init_database()
+from . import database
+from .database import USAGE_COUNTERS
+from .models import estimate_cost
+from .usage_recorder import recorder
 
-__all__ = ['update_usage', 'get_today_stats', 'get_all_time_stats']
+__all__ = [
+    'update_usage',
+    'record_routing',
+    'log_request',
+    'flush_usage',
+    'get_today_stats',
+    'get_all_time_stats',
+    'get_range_stats',
+    'get_latency_stats',
+]
+
+
+def update_usage(input_tokens, output_tokens, model_id, cached_tokens=0):
+    """Учет использования без ожидания записи в базу данных.
+
+    cached_tokens - часть input_tokens, прочитанная из кэша префиксов провайдера.
+    """
+    recorder.record(input_tokens, output_tokens, model_id, cached_tokens=cached_tokens)
+
+
+def record_routing(model_id, counter):
+    """Учет дублирующего запроса, запасной модели или отказа модели."""
+    recorder.record_routing(model_id, counter)
+
+
+def log_request(
+    model_id,
+    endpoint,
+    latency,
+    input_tokens=0,
+    output_tokens=0,
+    ttft=None,
+    retries=0,
+    cache_hit=False,
+    error=None,
+    cached_tokens=0,
+):
+    """Запись запроса в журнал. Времена в секундах, запись в БД пачками в фоне."""
+    recorder.log_request(
+        (
+            time.time(),
+            model_id,
+            endpoint,
+            input_tokens or 0,
+            output_tokens or 0,
+            latency * 1000,
+            ttft * 1000 if ttft is not None else None,
+            retries,
+            int(cache_hit),
+            error,
+            cached_tokens or 0,
+        )
+    )
+
+
+def flush_usage():
+    """Принудительная запись накопленной статистики."""
+    return recorder.flush()
+
+
+def usage_failure():
+    """Ошибка записи статистики, о которой еще не сообщалось, или None."""
+    return recorder.take_failure()
+
+
+def _merge_pending(stats, pending):
+    """Добавление незаписанных счетчиков к статистике из базы данных."""
+    for (_, model_id), counters in pending.items():
+        values = dict(zip(USAGE_COUNTERS, counters))
+        model_stats = stats["models"].setdefault(model_id, dict.fromkeys(USAGE_COUNTERS, 0))
+        for counter, value in values.items():
+            model_stats[counter] = model_stats.get(counter, 0) + value
+            if counter in stats:
+                stats[counter] += value
+        stats["total_tokens"] += values["input_tokens"] + values["output_tokens"]
+
+    return _add_costs(stats)
+
+
+def _add_costs(stats):
+    """Стоимость по ценам из каталога моделей: cost и экономия кэша префиксов.
+
+    Модели без цен в стоимость не входят; если цен нет ни у одной модели,
+    cost и cache_savings - None.
+    """
+    cost = savings = None
+    for model_id, model_stats in stats["models"].items():
+        prices = estimate_cost(
+            model_id,
+            model_stats["input_tokens"],
+            model_stats["output_tokens"],
+            model_stats.get("cached_tokens", 0),
+        )
+        if prices is None:
+            continue
+        model_stats["cost"], uncached_cost = prices
+        cost = (cost or 0) + model_stats["cost"]
+        savings = (savings or 0) + uncached_cost - model_stats["cost"]
+
+    stats["cost"] = cost
+    stats["cache_savings"] = savings
+    return stats
+
+
+def get_today_stats():
+    """Получение статистики за сегодня с учетом незаписанных счетчиков."""
+    today = date.today().isoformat()
+
+    with recorder.flush_lock:
+        stats = database.get_today_stats()
+        pending = {key: value for key, value in recorder.pending().items() if key[0] == today}
+
+    return _merge_pending(stats, pending)
+
+
+def get_all_time_stats():
+    """Получение статистики за все время с учетом незаписанных счетчиков."""
+    with recorder.flush_lock:
+        stats = database.get_all_time_stats()
+        pending = recorder.pending()
+
+    return _merge_pending(stats, pending)
+
+
+def get_range_stats(start, end):
+    """Статистика за даты с start по end включительно с учетом незаписанных счетчиков."""
+    start, end = str(start), str(end)
+
+    with recorder.flush_lock:
+        stats = database.get_usage_range(start, end)
+        pending = {
+            key: value for key, value in recorder.pending().items() if start <= key[0] <= end
+        }
+
+    return _merge_pending(stats, pending)
+
+
+def get_latency_stats(since=None):
+    """Перцентили задержки и скорость по моделям с момента since (по умолчанию - за сегодня)."""
+    if since is None:
+        since = datetime.combine(date.today(), datetime.min.time()).timestamp()
+    # Журнал не объединяется с незаписанными строками, поэтому сначала сброс
+    recorder.flush()
+    return database.get_latency_stats(since)
@@ -0,0 +1,26 @@
+"""
+Модуль для приблизительной оценки количества токенов.
+"""
+
+# Среднее число символов на токен для BPE-токенизаторов
+CHARS_PER_TOKEN = 4
+
+# Служебные токены, которые провайдеры добавляют на каждое сообщение
+TOKENS_PER_MESSAGE = 4
+
+
+def estimate_tokens(text):
+    """Оценка количества токенов в тексте."""
+    if not text:
+        return 0
+    return max(1, (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN)
+
+
+def estimate_message_tokens(message):
+    """Оценка количества токенов в одном сообщении."""
+    return TOKENS_PER_MESSAGE + estimate_tokens(message.get("content") or "")
+
+
+def estimate_messages_tokens(messages):
+    """Оценка количества токенов в списке сообщений."""
+    return sum(estimate_message_tokens(message) for message in messages)
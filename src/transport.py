@@ -0,0 +1,205 @@
+"""
+Модуль общего HTTP-транспорта для клиентов OpenAI.
+
+Все синхронные клиенты используют один httpx.Client (пул соединений на
+каждый эндпоинт внутри него), асинхронные - один httpx.AsyncClient на цикл
+событий. Клиенты создаются из той же библиотеки, что и у openai: httpx2
+для openai 3.x или httpx. Протокол, размер пула, время жизни соединений, таймауты и прокси
+хранятся в таблице transport_settings и меняются в меню настроек; после
+изменения транспорт создается заново при следующем запросе. Прежний клиент
+не закрывается: начатые через него запросы (потоковый ответ, сводка памяти,
+дублирующий запрос) завершаются, после чего его освобождает сборщик мусора.
+"""
+
+import threading
+
+from config.config import (
+    HTTP2,
+    MAX_CONNECTIONS,
+    MAX_KEEPALIVE_CONNECTIONS,
+    KEEPALIVE_EXPIRY,
+    CONNECT_TIMEOUT,
+    READ_TIMEOUT,
+    WRITE_TIMEOUT,
+    POOL_TIMEOUT,
+    TOTAL_TIMEOUT,
+    PROXY,
+)
+from .database import TRANSPORT_FIELDS, get_transport_settings, update_transport_settings
+
+# Значения по умолчанию, пока настройки транспорта не сохранялись
+DEFAULT_TRANSPORT = {
+    "http2": HTTP2,
+    "max_connections": MAX_CONNECTIONS,
+    "max_keepalive_connections": MAX_KEEPALIVE_CONNECTIONS,
+    "keepalive_expiry": KEEPALIVE_EXPIRY,
+    "connect_timeout": CONNECT_TIMEOUT,
+    "read_timeout": READ_TIMEOUT,
+    "total_timeout": TOTAL_TIMEOUT,
+    "proxy": PROXY,
+}
+
+# Типы полей для проверки ввода в меню настроек
+FIELD_TYPES = {
+    "http2": bool,
+    "max_connections": int,
+    "max_keepalive_connections": int,
+    "keepalive_expiry": float,
+    "connect_timeout": float,
+    "read_timeout": float,
+    "total_timeout": float,
+    "proxy": str,
+}
+
+# Общий синхронный клиент и настройки, с которыми он создан
+_client = None
+_client_settings = None
+_client_lock = threading.Lock()
+
+# Асинхронные клиенты: цикл событий -> (настройки, httpx.AsyncClient);
+# записи закрытых циклов удаляются при следующем обращении
+_async_clients = {}
+
+
+def http_library():
+    """Модуль HTTP-клиента: httpx2, на котором построен openai 3.x, или httpx."""
+    try:
+        import httpx2
+
+        return httpx2
+    except ImportError:
+        import httpx
+
+        return httpx
+
+
+def get_settings():
+    """Текущие настройки транспорта: сохраненные или значения по умолчанию."""
+    settings = dict(DEFAULT_TRANSPORT)
+    settings.update(get_transport_settings() or {})
+    settings["http2"] = bool(settings["http2"])
+    return settings
+
+
+def parse_value(field, text):
+    """Значение поля из ввода пользователя. Бросает ValueError при неверном вводе."""
+    text = text.strip()
+    kind = FIELD_TYPES[field]
+    if kind is bool:
+        if text.lower() in ("1", "on", "yes", "true"):
+            return True
+        if text.lower() in ("0", "off", "no", "false"):
+            return False
+        raise ValueError("expected on or off")
+    if kind is str:
+        return "" if text == "-" else text
+    value = kind(text)
+    if value < 0:
+        raise ValueError("value must not be negative")
+    return value
+
+
+def save_settings(settings):
+    """Сохранение настроек транспорта. Бросает ValueError, если HTTP/2 недоступен."""
+    if settings["http2"]:
+        check_http2()
+    update_transport_settings({field: settings[field] for field in TRANSPORT_FIELDS})
+
+
+def check_http2():
+    """Проверка, что пакет h2 для HTTP/2 установлен."""
+    try:
+        import h2  # pylint: disable=unused-import
+    except ImportError as e:
+        raise ValueError("HTTP/2 requires the 'h2' package (pip install h2)") from e
+
+
+def timeout(settings=None):
+    """Таймауты по фазам запроса (httpx.Timeout) для клиентов OpenAI."""
+    httpx = http_library()
+    settings = settings or get_settings()
+    return httpx.Timeout(
+        settings["read_timeout"],
+        connect=settings["connect_timeout"],
+        read=settings["read_timeout"],
+        write=WRITE_TIMEOUT,
+        pool=POOL_TIMEOUT,
+    )
+
+
+def total_timeout():
+    """Общий срок запроса вместе с повторами в секундах или None."""
+    return get_settings()["total_timeout"] or None
+
+
+def _client_options(settings):
+    """Параметры httpx.Client/AsyncClient по настройкам транспорта."""
+    httpx = http_library()
+    if settings["http2"]:
+        check_http2()
+    return {
+        "http2": settings["http2"],
+        "limits": httpx.Limits(
+            max_connections=settings["max_connections"] or None,
+            max_keepalive_connections=settings["max_keepalive_connections"] or None,
+            keepalive_expiry=settings["keepalive_expiry"],
+        ),
+        "timeout": timeout(settings),
+        "proxy": settings["proxy"] or None,
+        "follow_redirects": True,
+    }
+
+
+def get_http_client():
+    """Общий httpx.Client; пересоздается после изменения настроек транспорта."""
+    global _client, _client_settings
+
+    httpx = http_library()
+    settings = get_settings()
+    with _client_lock:
+        if _client is None or settings != _client_settings:
+            # Прежний клиент не закрывается: им могут пользоваться начатые запросы
+            _client = httpx.Client(**_client_options(settings))
+            _client_settings = settings
+        return _client
+
+
+def close_http_client():
+    """Закрытие общего клиента вместе с его соединениями."""
+    global _client, _client_settings
+
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+        _client = None
+        _client_settings = None
+
+
+def get_async_http_client(settings=None):
+    """httpx.AsyncClient текущего цикла событий.
+
+    settings - снимок настроек транспорта; без него настройки читаются из базы.
+    """
+    import asyncio  # pylint: disable=import-outside-toplevel
+
+    httpx = http_library()
+    loop = asyncio.get_running_loop()
+    settings = settings or get_settings()
+    for closed in [key for key in _async_clients if key.is_closed()]:
+        del _async_clients[closed]
+    current = _async_clients.get(loop)
+    if current is None or current[0] != settings:
+        # Клиент с прежними настройками не закрывается: его дожидаются начатые запросы
+        client = httpx.AsyncClient(**_client_options(settings))
+        _async_clients[loop] = (settings, client)
+        return client
+    return current[1]
+
+
+async def close_async_http_client():
+    """Закрытие асинхронного клиента текущего цикла событий."""
+    import asyncio  # pylint: disable=import-outside-toplevel
+
+    current = _async_clients.pop(asyncio.get_running_loop(), None)
+    if current is not None:
+        await current[1].aclose()
@@ -52,9 +52,11 @@ def display_main_menu():
     clear_screen()
     print(f"\n{Fore.CYAN}=== ChatAI CLI ==={Style.RESET_ALL}")
     print(f"{Fore.LIGHTBLACK_EX}1. New chat{Style.RESET_ALL}")
-    print(f"{Fore.LIGHTBLACK_EX}2. Settings{Style.RESET_ALL}")
-    print(f"{Fore.LIGHTBLACK_EX}3. Exit{Style.RESET_ALL}")
-    return input(f"\n{Fore.LIGHTBLACK_EX}Select an option (1-3): {Style.RESET_ALL}")
+    print(f"{Fore.LIGHTBLACK_EX}2. Chat history{Style.RESET_ALL}")
+    print(f"{Fore.LIGHTBLACK_EX}3. Search history{Style.RESET_ALL}")
+    print(f"{Fore.LIGHTBLACK_EX}4. Settings{Style.RESET_ALL}")
+    print(f"{Fore.LIGHTBLACK_EX}5. Exit{Style.RESET_ALL}")
+    return input(f"\n{Fore.LIGHTBLACK_EX}Select an option (1-5): {Style.RESET_ALL}")
 
 
 def display_settings_menu():
@@ -64,8 +66,52 @@ def display_settings_menu():
     print(f"{Fore.LIGHTBLACK_EX}1. Change model{Style.RESET_ALL}")
     print(f"{Fore.LIGHTBLACK_EX}2. Change API key{Style.RESET_ALL}")
     print(f"{Fore.LIGHTBLACK_EX}3. Change endpoint{Style.RESET_ALL}")
+    print(f"{Fore.LIGHTBLACK_EX}4. Transport (HTTP/2, pool, timeouts, proxy){Style.RESET_ALL}")
     print(f"{Fore.LIGHTBLACK_EX}0. Back to main menu{Style.RESET_ALL}")
-    return input(f"\n{Fore.LIGHTBLACK_EX}Select an option (0-3): {Style.RESET_ALL}")
+    return input(f"\n{Fore.LIGHTBLACK_EX}Select an option (0-4): {Style.RESET_ALL}")
+
+
+# Поля настроек транспорта в меню: (поле, название, единицы)
+TRANSPORT_MENU = (
+    ("http2", "HTTP/2", ""),
+    ("max_connections", "Max connections", ""),
+    ("max_keepalive_connections", "Max keep-alive connections", ""),
+    ("keepalive_expiry", "Keep-alive expiry", "s"),
+    ("connect_timeout", "Connect timeout", "s"),
+    ("read_timeout", "Read timeout", "s"),
+    ("total_timeout", "Total timeout (with retries)", "s"),
+    ("proxy", "Proxy", ""),
+)
+
+
+def format_transport_value(field, value):
+    """Значение настройки транспорта для меню."""
+    if field == "http2":
+        return "on" if value else "off"
+    if field in ("max_connections", "max_keepalive_connections", "total_timeout") and not value:
+        return "no limit"
+    if field == "proxy":
+        return value or "from environment"
+    return f"{value:g}" if isinstance(value, float) else str(value)
+
+
+def display_transport_settings(settings):
+    """Отображение меню настроек транспорта."""
+    clear_screen()
+    print(f"\n{Fore.CYAN}=== Transport Settings ==={Style.RESET_ALL}\n")
+    for number, (field, label, unit) in enumerate(TRANSPORT_MENU, 1):
+        value = format_transport_value(field, settings[field])
+        if unit and settings[field]:
+            value += f" {unit}"
+        print(
+            f"{Fore.LIGHTBLACK_EX}{number}. {label}:{Style.RESET_ALL} "
+            f"{Fore.YELLOW}{value}{Style.RESET_ALL}"
+        )
+    print(f"{Fore.LIGHTBLACK_EX}0. Back{Style.RESET_ALL}")
+    return input(
+        f"\n{Fore.LIGHTBLACK_EX}Select a setting to change (0-{len(TRANSPORT_MENU)}): "
+        f"{Style.RESET_ALL}"
+    )
 
 
 def display_chat_start():
@@ -73,21 +119,143 @@ def display_chat_start():
     clear_screen()
     print(f"\n{Fore.GREEN}New chat started. For exit: type 'exit'{Style.RESET_ALL}")
     print(
-        f"{Fore.LIGHTBLACK_EX}Available commands: status, export, model, help{Style.RESET_ALL}\n"
+        f"{Fore.LIGHTBLACK_EX}Available commands: status, export, model, search, help{Style.RESET_ALL}\n"
     )
 
 
-def display_assistant_response(answer, tokens_used=None):
-    """Отображение ответа ассистента."""
+def display_conversations(conversations, page, has_next):
+    """Отображение страницы сохраненных чатов."""
+    clear_screen()
+    print(f"\n{Fore.CYAN}=== Chat History (page {page}) ==={Style.RESET_ALL}\n")
+
+    if not conversations:
+        print(f"{Fore.LIGHTBLACK_EX}No saved chats yet.{Style.RESET_ALL}")
+
+    for i, conversation in enumerate(conversations, 1):
+        print(
+            f"{Fore.LIGHTBLACK_EX}{i}. {conversation['title'][:60]}{Style.RESET_ALL} "
+            f"{Fore.LIGHTBLACK_EX}[{conversation['updated_at'].replace('T', ' ')} | "
+            f"{conversation['message_count']} msg | {conversation['model_id']}]{Style.RESET_ALL}"
+        )
+
+    hints = ["number - resume"]
+    if has_next:
+        hints.append("n - next page")
+    if page > 1:
+        hints.append("p - previous page")
+    hints.append("0 - back")
+    return input(f"\n{Fore.LIGHTBLACK_EX}{', '.join(hints)}: {Style.RESET_ALL}").strip()
+
+
+def display_search_results(query, results, elapsed_ms, allow_resume=False):
+    """Отображение результатов поиска по истории."""
+    clear_screen()
+    print(f"\n{Fore.CYAN}=== Search: {query} ==={Style.RESET_ALL}\n")
+
+    if not results:
+        print(f"{Fore.LIGHTBLACK_EX}Nothing found.{Style.RESET_ALL}")
+
+    for i, result in enumerate(results, 1):
+        print(
+            f"{Fore.YELLOW}{i}. {result['title'][:50]}{Style.RESET_ALL} "
+            f"{Fore.LIGHTBLACK_EX}[chat #{result['conversation_id']} | "
+            f"{result['updated_at'].replace('T', ' ')} | {result['role']}]{Style.RESET_ALL}"
+        )
+        print(f"   {result['snippet']}")
+
+    print(f"\n{Fore.LIGHTBLACK_EX}{len(results)} results in {elapsed_ms:.1f} ms{Style.RESET_ALL}")
+
+    if allow_resume and results:
+        return input(
+            f"{Fore.LIGHTBLACK_EX}Enter result number to resume its chat or '0' to go back: "
+            f"{Style.RESET_ALL}"
+        ).strip()
+
+    input(f"\n{Fore.LIGHTBLACK_EX}Press Enter to continue...{Style.RESET_ALL}")
+    return "0"
+
+
+def display_resumed_chat(messages, limit=10):
+    """Отображение последних сообщений возобновленного чата."""
+    clear_screen()
+    print(f"\n{Fore.GREEN}Chat resumed. For exit: type 'exit'{Style.RESET_ALL}")
+    print(
+        f"{Fore.LIGHTBLACK_EX}Available commands: status, export, model, search, help{Style.RESET_ALL}"
+    )
+
+    history = [message for message in messages if message.get("role") != "system"]
+    if len(history) > limit:
+        print(
+            f"{Fore.LIGHTBLACK_EX}... {len(history) - limit} earlier messages{Style.RESET_ALL}"
+        )
+    for message in history[-limit:]:
+        if message["role"] == "user":
+            print(f"\n{Fore.LIGHTBLACK_EX}You:{Style.RESET_ALL} {message['content']}")
+        else:
+            print(f"\n{Fore.LIGHTBLACK_EX}Assistant:{Style.RESET_ALL} {message['content']}")
+    print()
+
+
+def display_assistant_response(answer, tokens_used=None, loader=None, saved_tokens=0):
+    """Отображение ответа ассистента.
+
+    answer может быть строкой или потоковым ответом (StreamedResponse),
+    тогда фрагменты выводятся по мере поступления, а лоадер
+    останавливается при получении первого из них. saved_tokens - экономия
+    входных токенов за ход благодаря сжатому системному промту.
+    """
+    if not isinstance(answer, str):
+        display_streamed_response(answer, loader, saved_tokens)
+        return
+
     if tokens_used is not None:
+        saved = f" | {format_saved_tokens(saved_tokens)}" if saved_tokens > 0 else ""
         print(
             f"\n{Fore.LIGHTBLACK_EX}Assistant:{Style.RESET_ALL} {answer} "
-            f"\n{Fore.LIGHTBLACK_EX}⌬  Tokens used: {tokens_used}{Style.RESET_ALL}\n"
+            f"\n{Fore.LIGHTBLACK_EX}⌬  Tokens used: {tokens_used}{saved}{Style.RESET_ALL}\n"
         )
     else:
         print(f"\n{Fore.LIGHTBLACK_EX}Assistant:{Style.RESET_ALL} {answer}\n")
 
 
+def format_saved_tokens(saved_tokens):
+    """Строка об экономии входных токенов за ход."""
+    return f"~{saved_tokens} prompt tokens saved"
+
+
+def display_streamed_response(response, loader=None, saved_tokens=0):
+    """Отображение потокового ответа ассистента."""
+    started = False
+    for delta in response:
+        if not started:
+            if loader:
+                loader.stop()
+            sys.stdout.write(f"\n{Fore.LIGHTBLACK_EX}Assistant:{Style.RESET_ALL} ")
+            started = True
+        sys.stdout.write(delta)
+        sys.stdout.flush()
+
+    if loader:
+        loader.stop()
+    if not started:
+        sys.stdout.write(f"\n{Fore.LIGHTBLACK_EX}Assistant:{Style.RESET_ALL} ")
+
+    details = [f"Tokens used: {response.tokens_used}"]
+    if getattr(response, "cached_tokens", 0):
+        details.append(f"{response.cached_tokens} input tokens from prompt cache")
+    if getattr(response, "served_model", None) and response.served_model != response.model_id:
+        details.append(f"via {response.served_model}")
+    if response.ttft is not None:
+        details.append(f"TTFT: {response.ttft:.2f}s")
+    if response.tokens_per_sec is not None:
+        details.append(f"{response.tokens_per_sec:.1f} tok/s")
+    if saved_tokens > 0:
+        details.append(format_saved_tokens(saved_tokens))
+    print(
+        f" \n{Fore.LIGHTBLACK_EX}⌬  {' | '.join(details)}{Style.RESET_ALL}\n"
+    )
+
+
 def display_error(error_type, error_message):
     """Отображение ошибки."""
     if error_type == "api":
@@ -103,6 +271,16 @@ def display_error(error_type, error_message):
         print("\nOperation cancelled by user.\n")
     elif error_type == "processing":
         print(f"Data processing error: {error_message}\n")
+    elif error_type == "stats":
+        print(
+            f"{Fore.YELLOW}Warning:{Style.RESET_ALL} a batch of usage statistics "
+            f"could not be saved and was dropped ({error_message})\n"
+        )
+    elif error_type == "storage":
+        print(
+            f"{Fore.YELLOW}Warning:{Style.RESET_ALL} the chat could not be saved "
+            f"to history and will be retried after the next reply ({error_message})\n"
+        )
 
 
 def display_goodbye():
@@ -121,39 +299,155 @@ def get_user_input():
     return input(f"{Fore.LIGHTBLACK_EX}You:{Style.RESET_ALL} ")
 
 
-def display_status(today_stats, all_time_stats):
-    """Отображение статистики использования."""
-    clear_screen()
-    print(f"\n{Fore.CYAN}=== Usage Statistics ==={Style.RESET_ALL}\n")
-
-    print(f"{Fore.YELLOW}Today ({today_stats['date']}):{Style.RESET_ALL}")
+def format_routing(model_stats):
+    """Счетчики дублирующих запросов и запасных моделей для строки модели."""
+    parts = []
+    if model_stats.get("hedged"):
+        parts.append(f"hedged {model_stats['hedged']}")
+    if model_stats.get("hedge_wins"):
+        parts.append(f"hedge wins {model_stats['hedge_wins']}")
+    if model_stats.get("fallbacks"):
+        parts.append(f"served as fallback {model_stats['fallbacks']}")
+    if model_stats.get("failures"):
+        parts.append(f"failed {model_stats['failures']}")
+    return "".join(f" | {part}" for part in parts)
+
+
+def format_cached(stats):
+    """Доля входных токенов из кэша префиксов провайдера для строки статистики."""
+    cached = stats.get("cached_tokens") or 0
+    if not cached or not stats["input_tokens"]:
+        return ""
+    return f" ({cached} cached, {cached / stats['input_tokens']:.0%})"
+
+
+def format_ms(value):
+    """Время в мс или секундах для строки статистики."""
+    if value is None:
+        return "-"
+    if value >= 1000:
+        return f"{value / 1000:.2f}s"
+    return f"{value:.0f}ms"
+
+
+def display_latency(label, latency_stats):
+    """Перцентили задержки и скорость генерации по моделям за период."""
+    print(f"\n{Fore.YELLOW}Latency ({label}):{Style.RESET_ALL}")
+    if not latency_stats:
+        print(f"  {Fore.LIGHTBLACK_EX}No requests{Style.RESET_ALL}")
+        return
+
+    for model_id, stats in latency_stats.items():
+        details = [
+            f"{stats['requests']} req",
+            f"p50 {format_ms(stats['p50'])}",
+            f"p95 {format_ms(stats['p95'])}",
+            f"p99 {format_ms(stats['p99'])}",
+        ]
+        if stats["ttft"] is not None:
+            details.append(f"avg TTFT {format_ms(stats['ttft'])}")
+        if stats.get("ttft_cached") is not None and stats.get("ttft_uncached") is not None:
+            details.append(
+                f"TTFT cached prefix {format_ms(stats['ttft_cached'])} "
+                f"vs {format_ms(stats['ttft_uncached'])}"
+            )
+        if stats["tokens_per_sec"] is not None:
+            details.append(f"{stats['tokens_per_sec']:.1f} tok/s")
+        if stats["errors"]:
+            details.append(f"{Fore.RED}errors {stats['errors']}{Style.RESET_ALL}")
+        print(f"  {model_id}: {' | '.join(details)}")
+
+
+def display_usage(title, stats, first=True):
+    """Итоги использования за период и разбивка по моделям."""
+    if not first:
+        print()
+    print(f"{Fore.YELLOW}{title}:{Style.RESET_ALL}")
     print(
-        f"  Requests: {today_stats['requests']} | ↑⌬: {today_stats['input_tokens']} | "
-        f"↓⌬: {today_stats['output_tokens']} | Σ⌬: {today_stats['total_tokens']}"
+        f"  Requests: {stats['requests']} | ↑⌬: {stats['input_tokens']}"
+        f"{format_cached(stats)} | "
+        f"↓⌬: {stats['output_tokens']} | Σ⌬: {stats['total_tokens']}"
     )
+    if stats.get("cost") is not None:
+        print(
+            f"  Cost: ${stats['cost']:.4f} | "
+            f"Saved by prompt cache: ${stats['cache_savings']:.4f}"
+        )
 
-    if today_stats["models"]:
+    if stats["models"]:
         print(f"\n{Fore.LIGHTBLACK_EX}By models:{Style.RESET_ALL}")
-        for model_id, model_stats in today_stats["models"].items():
+        for model_id, model_stats in stats["models"].items():
+            cost = f" | ${model_stats['cost']:.4f}" if "cost" in model_stats else ""
             print(
                 f"  {model_id}: {model_stats['requests']} req | "
-                f"↑{model_stats['input_tokens']} | ↓{model_stats['output_tokens']}"
+                f"↑{model_stats['input_tokens']}{format_cached(model_stats)} | "
+                f"↓{model_stats['output_tokens']}{cost}"
+                f"{format_routing(model_stats)}"
             )
 
-    print(f"\n{Fore.YELLOW}All time:{Style.RESET_ALL}")
-    print(
-        f"  Requests: {all_time_stats['requests']} | ↑⌬: {all_time_stats['input_tokens']} | "
-        f"↓⌬: {all_time_stats['output_tokens']} | Σ⌬: {all_time_stats['total_tokens']}"
-    )
 
-    if all_time_stats["models"]:
-        print(f"\n{Fore.LIGHTBLACK_EX}By models:{Style.RESET_ALL}")
-        for model_id, model_stats in all_time_stats["models"].items():
+def display_status(
+    today_stats,
+    all_time_stats,
+    context_stats=None,
+    cache_stats=None,
+    retry_stats=None,
+    latency_stats=None,
+    range_stats=None,
+):
+    """Отображение статистики использования.
+
+    range_stats - необязательная пара (подпись, статистика за диапазон дат).
+    """
+    clear_screen()
+    print(f"\n{Fore.CYAN}=== Usage Statistics ==={Style.RESET_ALL}\n")
+
+    display_usage(f"Today ({today_stats['date']})", today_stats)
+    if range_stats:
+        label, period_stats = range_stats
+        display_usage(
+            f"{label} ({period_stats['start']} - {period_stats['end']})", period_stats, first=False
+        )
+    display_usage("All time", all_time_stats, first=False)
+
+    if cache_stats:
+        print(
+            f"\n{Fore.YELLOW}Response cache ({cache_stats['entries']} entries, "
+            f"{cache_stats['size'] / 1024 / 1024:.1f} MB):{Style.RESET_ALL}"
+        )
+        for label, period in (("Today", "today"), ("All time", "all_time")):
+            period_stats = cache_stats[period]
             print(
-                f"  {model_id}: {model_stats['requests']} req | "
-                f"↑{model_stats['input_tokens']} | ↓{model_stats['output_tokens']}"
+                f"  {label}: hit rate {period_stats['hit_rate']:.0%} "
+                f"({period_stats['hits']}/{period_stats['hits'] + period_stats['misses']}) | "
+                f"Saved: {period_stats['tokens_saved']}⌬"
             )
 
+    for label, period_stats in latency_stats or ():
+        display_latency(label, period_stats)
+
+    if retry_stats:
+        print(f"\n{Fore.YELLOW}API retries (this session):{Style.RESET_ALL}")
+        print(
+            f"  Retries: {retry_stats['retries']} | "
+            f"Backoff: {retry_stats['backoff_seconds']:.1f} s | "
+            f"Failed after retries: {retry_stats['gave_up']} | "
+            f"Rejected by circuit breaker: {retry_stats['rejected']}"
+        )
+        for endpoint, state in retry_stats["circuits"].items():
+            print(f"  {Fore.RED}{endpoint}: circuit {state.replace('_', '-')}{Style.RESET_ALL}")
+
+    if context_stats:
+        print(f"\n{Fore.YELLOW}Current chat context:{Style.RESET_ALL}")
+        print(
+            f"  History: {context_stats['history_tokens']}⌬ | "
+            f"Last request: {context_stats['sent_tokens']}⌬ | "
+            f"Trimmed messages: {context_stats['trimmed_messages']} | "
+            f"Saved: {context_stats['tokens_saved']}⌬"
+        )
+        if "summarized_messages" in context_stats:
+            print(f"  Summarized messages: {context_stats['summarized_messages']}")
+
     input(f"\n{Fore.LIGHTBLACK_EX}Press Enter to continue...{Style.RESET_ALL}")
 
 
@@ -187,17 +481,21 @@ def display_help():
             "description": "End the current chat and return to main menu",
         },
         {
-            "command": "status",
-            "description": "Show detailed token usage and request statistics",
+            "command": "status [30m|6h|7d|month]",
+            "description": "Show token usage, request statistics and latency (today and the given window)",
         },
         {
-            "command": "export [json|txt]",
-            "description": "Export current chat to JSON or TXT file",
+            "command": "export [json|jsonl|txt|md] [gz|zst]",
+            "description": "Export current chat to JSON, JSONL, TXT or Markdown, optionally compressed",
         },
         {
             "command": "model [number]",
             "description": "Show available models or select model by number (e.g., 'model 3')",
         },
+        {
+            "command": "search <query>",
+            "description": "Full-text search across all saved chats",
+        },
         {"command": "help", "description": "Show this help"},
     ]
 
@@ -0,0 +1,172 @@
+"""
+Модуль для отложенной записи статистики использования.
+
+Счетчики копятся в памяти и сбрасываются в базу данных фоновым потоком
+пачками, поэтому запись статистики не задерживает вывод ответа.
+"""
+
+import atexit
+import sqlite3
+import threading
+import time
+from datetime import date
+
+from .database import add_usage_batch, ROUTING_COUNTERS, USAGE_COUNTERS
+
+# Интервал фонового сброса в секундах
+FLUSH_INTERVAL = 2.0
+
+# Количество событий, после которого сброс запускается досрочно
+FLUSH_THRESHOLD = 50
+
+# Счетчики на (date, model_id) в порядке USAGE_COUNTERS
+COUNTERS = len(USAGE_COUNTERS)
+
+# Позиции счетчиков в списке
+REQUESTS, INPUT_TOKENS, OUTPUT_TOKENS, CACHED_TOKENS = (
+    USAGE_COUNTERS.index(counter)
+    for counter in ("requests", "input_tokens", "output_tokens", "cached_tokens")
+)
+
+
+class UsageRecorder:
+    """Накопитель счетчиков использования с фоновым сбросом в БД."""
+
+    def __init__(self, flush_interval=FLUSH_INTERVAL, flush_threshold=FLUSH_THRESHOLD):
+        """Инициализация."""
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        # (date, model_id) -> список из COUNTERS счетчиков
+        self._pending = {}
+        # Строки журнала запросов (request_log), ожидающие записи
+        self._log = []
+        self._events = 0
+        # Короткая блокировка для накопителя: запись события никогда
+        # не ждет медленного сброса в базу данных
+        self._lock = threading.Lock()
+        # Удерживается на время сброса, чтобы чтение статистики не видело
+        # пачку ни дважды, ни ни разу
+        self.flush_lock = threading.RLock()
+        self._wake = threading.Event()
+        self._thread = None
+        # Описание ошибки последней отброшенной пачки, пока о ней не сообщили
+        self._failure = None
+
+    def record(self, input_tokens, output_tokens, model_id, timestamp=None, cached_tokens=0):
+        """Постановка события использования в очередь."""
+        self._add(
+            model_id,
+            timestamp,
+            {
+                REQUESTS: 1,
+                INPUT_TOKENS: input_tokens or 0,
+                OUTPUT_TOKENS: output_tokens or 0,
+                CACHED_TOKENS: cached_tokens or 0,
+            },
+        )
+
+    def record_routing(self, model_id, counter, timestamp=None):
+        """Учет события маршрутизации (см. ROUTING_COUNTERS) для модели."""
+        if counter not in ROUTING_COUNTERS:
+            raise ValueError(f"Unknown routing counter: {counter}")
+        self._add(model_id, timestamp, {USAGE_COUNTERS.index(counter): 1})
+
+    def log_request(self, row):
+        """Постановка строки журнала запросов в очередь."""
+        with self._lock:
+            self._log.append(row)
+            self._events += 1
+            events = self._events
+            self._ensure_thread()
+
+        if events >= self.flush_threshold:
+            self._wake.set()
+
+    def _ensure_thread(self):
+        """Запуск потока фонового сброса при первом событии."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def _add(self, model_id, timestamp, increments):
+        """Прибавление {индекс счетчика: значение} к накопителю."""
+        day = date.fromtimestamp(timestamp or time.time()).isoformat()
+
+        with self._lock:
+            counters = self._pending.setdefault((day, model_id), [0] * COUNTERS)
+            for index, value in increments.items():
+                counters[index] += value
+            self._events += 1
+            events = self._events
+            self._ensure_thread()
+
+        if events >= self.flush_threshold:
+            self._wake.set()
+
+    def pending(self):
+        """Копия еще не записанных счетчиков."""
+        with self._lock:
+            return {key: list(counters) for key, counters in self._pending.items()}
+
+    def flush(self):
+        """Запись накопленных счетчиков одной транзакцией.
+
+        Если база занята или недоступна, пачка возвращается в накопитель и
+        возвращается False. Пачка, которую нельзя записать (ошибка в данных),
+        отбрасывается: ошибка сохраняется для take_failure(), возвращается False.
+        """
+        with self.flush_lock:
+            with self._lock:
+                batch = self._pending
+                log_rows = self._log
+                self._pending = {}
+                self._log = []
+                self._events = 0
+
+            if not batch and not log_rows:
+                return True
+
+            rows = [(day, model_id, *counters) for (day, model_id), counters in batch.items()]
+            try:
+                add_usage_batch(rows, log_rows)
+            except sqlite3.OperationalError:
+                # База недоступна - возвращаем счетчики, повторим при следующем сбросе
+                self._restore(batch, log_rows)
+                return False
+            except Exception as e:  # pylint: disable=broad-except
+                # Повтор такой пачки бесполезен и только растил бы очередь
+                with self._lock:
+                    self._failure = f"{type(e).__name__}: {e}"
+                return False
+
+            return True
+
+    def take_failure(self):
+        """Ошибка отброшенной пачки (один раз) или None."""
+        with self._lock:
+            failure, self._failure = self._failure, None
+        return failure
+
+    def _restore(self, batch, log_rows):
+        """Возврат несохраненной пачки в накопитель."""
+        with self._lock:
+            self._log[:0] = log_rows
+            self._events += len(log_rows)
+            for key, restored in batch.items():
+                counters = self._pending.setdefault(key, [0] * COUNTERS)
+                for index, value in enumerate(restored):
+                    counters[index] += value
+                self._events += 1
+
+    def _run(self):
+        """Цикл фонового сброса."""
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+
+recorder = UsageRecorder()
+
+# Сброс остатка при любом штатном завершении процесса
+atexit.register(recorder.flush)